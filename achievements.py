@@ -0,0 +1,184 @@
+import datetime
+from collections import Counter, defaultdict
+
+
+class Rule:
+    """One achievement: the events it listens to, its counters and when it is earned.
+
+    ``id`` and ``description`` may use event fields (``'chaos_chicken_{challenge_type}'``).
+    ``grants`` lists the ``(stats list, value)`` pairs added when it is earned, the
+    first of which marks it as earned; a value of None stands for the id.
+    """
+
+    events = ()
+
+    def __init__(self, id, title, description, grants=(('achievements', None),)):
+        self.id = id
+        self.title = title
+        self.description = description
+        self.grants = grants
+
+    def initial(self, data, user):
+        """Counters as of the current document (called when the engine rebuilds)."""
+        return None
+
+    def count(self, state, event):
+        """Fold one event into the counters."""
+
+    def met(self, state, event):
+        return False
+
+
+class When(Rule):
+    """Earned the first time ``test(event)`` holds for one of ``on``'s events."""
+
+    def __init__(self, id, title, description, on, test, **kwargs):
+        super().__init__(id, title, description, **kwargs)
+        self.events = (on,) if isinstance(on, str) else tuple(on)
+        self.test = test
+
+    def met(self, state, event):
+        return self.test(event)
+
+
+class HighTierRun(Rule):
+    """Earned after ``length`` completed sessions of ``tier`` or above in a row."""
+
+    events = ('session_completed', 'session_aborted')
+
+    def __init__(self, id, title, description, tier, length, **kwargs):
+        super().__init__(id, title, description, **kwargs)
+        self.tier = tier
+        self.length = length
+
+    def initial(self, data, user):
+        # Only the tail of the list matters: walk back to the first break
+        run = 0
+        for session in reversed(data["users"][user]["sessions"]):
+            if session.get("completed", False) and session["tier"] >= self.tier:
+                run += 1
+            elif session.get("completed", False) or session.get("aborted", False):
+                break
+        return {'run': run}
+
+    def count(self, state, event):
+        if event['type'] == 'session_completed' and event['tier'] >= self.tier:
+            state['run'] += 1
+        else:
+            state['run'] = 0
+
+    def met(self, state, event):
+        return state['run'] >= self.length
+
+
+class FullDays(Rule):
+    """Earned at the end of a cycle with ``per_day`` completed sessions on ``days`` days."""
+
+    events = ('session_completed', 'cycle_ended')
+
+    def __init__(self, id, title, description, per_day, days, **kwargs):
+        super().__init__(id, title, description, **kwargs)
+        self.per_day = per_day
+        self.days = days
+
+    def initial(self, data, user):
+        per_day = Counter(datetime.datetime.fromisoformat(s["timestamp"]).date()
+                          for s in data["users"][user]["sessions"] if s.get("completed", False))
+        return {'per_day': per_day, 'full': sum(1 for n in per_day.values() if n >= self.per_day)}
+
+    def count(self, state, event):
+        if event['type'] == 'session_completed':
+            state['per_day'][event['day']] += 1
+            if state['per_day'][event['day']] == self.per_day:
+                state['full'] += 1
+
+    def met(self, state, event):
+        return event['type'] == 'cycle_ended' and state['full'] >= self.days
+
+
+class _UserAchievements:
+    """Rule counters and owned-item sets for one user."""
+
+    def __init__(self, data, user, rules):
+        self.sessions = data["users"][user]["sessions"]
+        self.state = {rule: rule.initial(data, user) for rule in rules}
+        self.owned = {}  # stats list name -> (list, set of its items)
+
+
+class AchievementEngine:
+    """Achievement rules evaluated incrementally from typed events.
+
+    Handlers call ``publish()`` after they have applied an event to the
+    document (``session_completed``, ``session_aborted``, ``cycle_ended``,
+    ``chaos_completed``); only the rules subscribed to that event type run,
+    and each updates its own counters in O(1). Counters cover the sessions
+    still in the live document, so they start over when a cycle is archived,
+    and like the other indexes they are rebuilt from the document when the
+    store loads a new one or folds in another process's changes. Owned
+    achievements, skins and themes are checked against sets kept beside the
+    stored lists.
+    """
+
+    def __init__(self, store, rules):
+        self.store = store
+        self.rules = rules
+        self._by_event = defaultdict(list)
+        for rule in rules:
+            for event in rule.events:
+                self._by_event[event].append(rule)
+        self._doc = None
+        self._generation = None
+        self._users = {}
+
+    def publish(self, data, user, event_type, **fields):
+        """Feed one event to the rules that listen for it; return what it earned.
+
+        Earned items are added to the user's stats; the result is a list of
+        ``{'id', 'title', 'description'}`` for notifications.
+        """
+        rules = self._by_event.get(event_type)
+        if not rules:
+            return []
+        entry, rebuilt = self._entry(data, user)
+        stats = data["users"][user]["stats"]
+        event = dict(fields, type=event_type, user=user, stats=stats)
+        earned = []
+        for rule in rules:
+            key = rule.id.format(**event)
+            grants = [(name, key if value is None else value) for name, value in rule.grants]
+            name, value = grants[0]
+            if value in self._owned(entry, stats, name):
+                continue
+            state = entry.state[rule]
+            # A rebuilt entry was read from a document that already includes this event
+            if not rebuilt:
+                rule.count(state, event)
+            if not rule.met(state, event):
+                continue
+            for name, value in grants:
+                owned = self._owned(entry, stats, name)
+                if value not in owned:
+                    stats[name].append(value)
+                    owned.add(value)
+            earned.append({"id": key, "title": rule.title, "description": rule.description.format(**event)})
+        return earned
+
+    def _entry(self, data, user):
+        if data is not self._doc or self.store.generation != self._generation:
+            self._doc = data
+            self._generation = self.store.generation
+            self._users = {}
+        entry = self._users.get(user)
+        if entry is None or entry.sessions is not data["users"][user]["sessions"]:
+            entry = self._users[user] = _UserAchievements(data, user, self.rules)
+            return entry, True
+        return entry, False
+
+    @staticmethod
+    def _owned(entry, stats, name):
+        items = stats[name]
+        cached = entry.owned.get(name)
+        # The lists hold no duplicates, so a size mismatch means someone else appended
+        if cached is None or cached[0] is not items or len(cached[1]) != len(items):
+            cached = entry.owned[name] = (items, set(items))
+        return cached[1]
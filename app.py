@@ -6,26 +6,46 @@ import time
 import logging
 import eventlet
 import psutil
-import gc
+import math
+import io
+import hashlib
+import hmac
 eventlet.monkey_patch()
-from flask import Flask, render_template, request, jsonify, send_file
-from flask_socketio import SocketIO, emit
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import numpy as np
+from flask import Flask, render_template, request, jsonify
+from flask_socketio import SocketIO, emit, join_room, leave_room, rooms
 import random
-from collections import deque
 import uuid
+from state_store import StateStore
+from persistence import JournaledDocument
+from sqlite_store import SQLiteDocument
+from shared_state import create_backend, SharedDict, SharedList
+from timer_scheduler import TimerScheduler
+from state_sync import StateSync
+from session_index import SessionIndex
+from inventory_index import InventoryIndex
+from points_engine import PointsEngine
+from achievements import AchievementEngine, When, HighTierRun, FullDays
+from cycle_archive import CycleArchive
+from event_log import EventLog
+from locks import MutationLanes, GLOBAL
+from fanout import FanoutBatcher
+from memory_manager import MemoryManager
+import wire
+from market_engine import MarketEngine
+from logging_setup import setup_logging, parse_sampling, logger_levels
+from instrumentation import Metrics
+from health import Heartbeats, CachedSample
+from flask.json.provider import DefaultJSONProvider
 
-# Set up logging with rotation
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('app.log', maxBytes=1024*1024, backupCount=5)
-    ]
+# Set up logging: records go through a queue to a listener thread that writes
+# the console and a rotating JSON file (LOG_FILE, default app.log). The
+# engine.io/socket.io packet logs keep one record in LOG_SAMPLE's N.
+log_listener = setup_logging(
+    level=os.environ.get('LOG_LEVEL', 'INFO').upper(),
+    log_file=os.environ.get('LOG_FILE', 'app.log'),
+    max_bytes=1024*1024,
+    backup_count=5,
+    sampling=parse_sampling(os.environ.get('LOG_SAMPLE', 'engineio.server=100,socketio.server=100'))
 )
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -38,7 +58,17 @@ if os.path.exists('render.env') and not os.environ.get('RENDER'):
                 key, value = line.strip().split('=', 1)
                 os.environ[key] = value
 
+# Latency of every handler and route plus the hot sections, served at /metrics
+metrics = Metrics('chicfocus')
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider with response encoding timed as 'http_json_encode'."""
+    def dumps(self, obj, **kwargs):
+        with metrics.timer('http_json_encode'):
+            return super().dumps(obj, **kwargs)
+
 app = Flask(__name__)
+app.json = TimedJSONProvider(app)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'chicfocus_secret_key')
 
 # Socket.IO configuration with improved settings for 24/7 operation
@@ -46,98 +76,275 @@ socketio = SocketIO(
     app,
     cors_allowed_origins="*",
     async_mode='eventlet',
-    logger=True,
-    engineio_logger=True,
+    json=metrics.timed_json('socketio_json_encode'),
+    logger=logging.getLogger('socketio.server'),
+    engineio_logger=logging.getLogger('engineio.server'),
     ping_timeout=300,  # Increased timeout
     ping_interval=30,  # Reduced ping frequency
     max_http_buffer_size=1e8,  # Increased buffer size
     reconnection=True,
     reconnection_attempts=5,
     reconnection_delay=1000,
-    reconnection_delay_max=5000
+    reconnection_delay_max=5000,
+    # With more than one worker, emits must go through a message queue
+    # (e.g. redis://... or any kombu URL) so every client receives them
+    message_queue=os.environ.get('SOCKETIO_MESSAGE_QUEUE')
 )
 
+# State that must be identical across gunicorn workers; 'local' keeps it in
+# this process, 'sqlite:///data/shared.db' shares it between workers on the node
+SHARED_STATE_URL = os.environ.get('CHICFOCUS_SHARED_STATE', 'local')
+shared_state = create_backend(SHARED_STATE_URL)
+WORKER_ID = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
 # Data storage
 DATA_FILE = 'data/chickens.json'
 BARNS_FILE = 'data/barns.json'
+ANIMALS_FILE = 'data/animals.json'
+ARCHIVE_DIR = 'data/archive'
+# Compacted journals are kept here so history can be replayed (event_log.py);
+# LOG_SEGMENTS caps how many are kept per document, LOG_CHANGES the rows of
+# change history kept per document with CHICFOCUS_STORAGE=sqlite
+LOG_DIR = 'data/log'
+LOG_SEGMENTS = int(os.environ.get('LOG_SEGMENTS', 64))
+LOG_CHANGES = int(os.environ.get('LOG_CHANGES', 10000))
+# 'json' (snapshot + journal files) or 'sqlite' (rows in SQLITE_FILE, see migrate_to_sqlite.py)
+STORAGE = os.environ.get('CHICFOCUS_STORAGE', 'json')
+SQLITE_FILE = os.environ.get('CHICFOCUS_SQLITE_PATH', 'data/chicfocus.db')
 USERS = ['luu', '4keni']
 
-def load_barns():
-    """Load the barns data file, or initialize if missing/corrupt."""
-    if not os.path.exists(BARNS_FILE):
-        # Initialize structure with default barns
-        barns = {
-            "users": {
-                u: {
-                    "barns": [
-                        {"id": "default", "name": "Main Barn", "description": "Your main focus barn"},
-                        {"id": "special", "name": "Special Projects", "description": "For important tasks"}
-                    ]
-                } for u in USERS
-            }
+def partner_of(user):
+    """The other player."""
+    return "luu" if user == "4keni" else "4keni"
+
+# Handlers that mutate game state hold their user's lane, and take GLOBAL only
+# around code touching duels, the chaos chicken or the cycle, so one user's
+# events run in order while the other's proceed. With several workers the
+# lanes are shared-state leases, and pending saves are flushed before one
+# is handed to another worker.
+lanes = MutationLanes(shared_state, WORKER_ID, before_release=lambda: flush_game_state(), users=USERS)
+
+# Sockets join their player's room and the pair's room once they identify,
+# and game events go only to the sockets that show them. SOCKET_BATCH_MS > 0
+# coalesces bursts to the same room into one 'batch' frame.
+identified_users = {}  # sid -> user
+client_encodings = {}  # sid -> wire encoding negotiated on identify
+
+# Every socket is in CLIENTS_ROOM; each room exists once per wire encoding
+# ('<room>/json', '<room>/compact') so a payload is encoded once per audience
+CLIENTS_ROOM = 'clients'
+
+def user_room(user):
+    return f'user:{user}'
+
+def pair_room(user):
+    return 'pair:' + ':'.join(sorted([user, partner_of(user)]))
+
+def client_encoding():
+    return client_encodings.get(request.sid, 'json')
+
+def encoded_room(room):
+    """The requesting socket's copy of ``room``."""
+    return f'{room}/{client_encoding()}'
+
+def emit_encoded(event, payload, to):
+    """Send ``payload`` to every encoding's copy of room ``to``."""
+    for encoding in wire.ENCODINGS:
+        socketio.emit(event, wire.encode_for(encoding, payload), to=f'{to}/{encoding}')
+
+def reply(event, payload):
+    """Send ``payload`` to the requesting socket in its wire encoding."""
+    emit(event, wire.encode_for(client_encoding(), payload))
+
+fanout = FanoutBatcher(emit_encoded, window=float(os.environ.get('SOCKET_BATCH_MS', 0)) / 1000)
+
+def emit_to_user(user, event, payload):
+    """Send an event only to the sockets of ``user`` (effects, eggs, achievements)."""
+    fanout.emit(event, payload, to=user_room(user))
+
+def emit_to_pair(user, event, payload):
+    """Send an event to both players of ``user``'s pair (timers, duels, barns)."""
+    fanout.emit(event, payload, to=pair_room(user))
+
+def identify(user, encoding='json', schema=None):
+    """Put the requesting socket in ``user``'s rooms (none for None) in its wire encoding.
+
+    'compact' is only granted when the client's decoder speaks
+    ``wire.SCHEMA``; the reply tells the client what it got, and every
+    payload after it uses that encoding.
+    """
+    if encoding not in wire.ENCODINGS or (encoding != 'json' and schema != wire.SCHEMA):
+        encoding = 'json'
+    identified_users.pop(request.sid, None)
+    # Keep the socket's other rooms (e.g. the market), moved to the new encoding
+    bases = {CLIENTS_ROOM}
+    for room in rooms():
+        if '/' in room:
+            leave_room(room)
+            if not room.startswith(('user:', 'pair:')):
+                bases.add(room.rsplit('/', 1)[0])
+    if user in USERS:
+        identified_users[request.sid] = user
+        bases.update([user_room(user), pair_room(user)])
+    client_encodings[request.sid] = encoding
+    for room in bases:
+        join_room(f'{room}/{encoding}')
+    emit('identified', {'user': identified_users.get(request.sid), 'encoding': encoding, 'schema': wire.SCHEMA,
+                        'keys': wire.KEYS if encoding == 'compact' else None,
+                        'time_keys': sorted(wire.TIME_KEYS) if encoding == 'compact' else None})
+
+def default_barns():
+    """Build the initial barns document."""
+    return {
+        "users": {
+            u: {
+                "barns": [
+                    {"id": "default", "name": "Main Barn", "description": "Your main focus barn"},
+                    {"id": "special", "name": "Special Projects", "description": "For important tasks"}
+                ]
+            } for u in USERS
         }
-        save_barns(barns)
-        return barns
-    try:
-        with open(BARNS_FILE, 'r') as f:
-            return json.load(f)
-    except Exception:
-        # If file is corrupt, reinitialize
-        os.rename(BARNS_FILE, BARNS_FILE + '.bak')
-        return load_barns()
+    }
+
+def default_data():
+    """Build the initial main data document."""
+    return {
+        "users": {u: {"points": 0, "sessions": [], "stats": {
+            "streak": 0,
+            "momentum_multiplier": 1.0,
+            "mystery_egg_used_date": None,
+            "mystery_egg_effect": None,
+            "lifetime_tier3_count": 0,
+            "longest_streak": 0,
+            "weekly_tier3_count": 0,
+            "weekly_chickens": 0,
+            "unlocked_skins": ["default"],
+            "current_skin": "default",
+            "unlocked_themes": ["default"],
+            "current_theme": "default",
+            "achievements": []
+        }} for u in USERS},
+        "cycle_start": datetime.datetime.now().isoformat(),
+        "winner": None,
+        "weekly_chaos_chicken": {
+            "offered": False,
+            "offered_to": None,
+            "offered_date": None,
+            "completed": False,
+            "completion_date": None,
+            "completed_by": None,
+            "challenge_type": None,
+            "challenge_params": None
+        }
+    }
+
+def default_animals():
+    """Build the initial animals (inventory) document."""
+    return {u: {"inventory": [], "cash": 0} for u in USERS}
+
+def open_document(path, default_factory):
+    """Storage backend for one document, per CHICFOCUS_STORAGE."""
+    if STORAGE == 'sqlite':
+        name = os.path.splitext(os.path.basename(path))[0]
+        return SQLiteDocument(SQLITE_FILE, name, default_factory, shared=shared_state.shared,
+                              retain_changes=LOG_CHANGES)
+    return JournaledDocument(path, default_factory, shared=shared_state.shared, log_dir=LOG_DIR,
+                             log_segments=LOG_SEGMENTS)
+
+# Parsed documents are kept in memory; saves are coalesced in the background and
+# either appended to a write-ahead journal that is periodically compacted into
+# the snapshot, or written as the changed rows of the SQLite tables
+data_store = StateStore(open_document(DATA_FILE, default_data))
+# Typed events recorded with data_store.record(), read back from the journal
+# segments (or the SQLite changes table)
+data_events = data_store.backend if STORAGE == 'sqlite' else EventLog(DATA_FILE, LOG_DIR)
+session_index = SessionIndex(data_store)
+# Finished cycles live in per-cycle segments outside the live document
+cycle_archive = CycleArchive(ARCHIVE_DIR)
+barns_store = StateStore(open_document(BARNS_FILE, default_barns))
+animals_store = StateStore(open_document(ANIMALS_FILE, default_animals))
+
+def load_barns():
+    """Return the cached barns document (loaded from disk on first use)."""
+    return barns_store.get()
 
 def save_barns(barns):
-    """Save the barns data file."""
-    with open(BARNS_FILE, 'w') as f:
-        json.dump(barns, f, indent=2, default=str)
+    """Mark the barns document dirty; it is written by the background flusher."""
+    barns_store.save(barns)
+
+inventory_index = InventoryIndex(animals_store)
+
+def flush_game_state():
+    """Persist pending changes now (before another worker may take a lane)."""
+    for store in (data_store, barns_store, animals_store):
+        store.flush()
+
+def load_animals():
+    """Return the cached animals document (loaded from disk on first use)."""
+    return animals_store.get()
+
+def save_animals(animals_data):
+    """Mark the animals document dirty; it is written by the background flusher."""
+    animals_store.save(animals_data)
 
 def load_data():
-    """Load the main data file, or initialize if missing/corrupt."""
-    if not os.path.exists(DATA_FILE):
-        # Initialize structure
-        data = {
-            "users": {u: {"points": 0, "sessions": [], "stats": {
-                "streak": 0,
-                "momentum_multiplier": 1.0,
-                "mystery_egg_used_date": None,
-                "mystery_egg_effect": None,
-                "lifetime_tier3_count": 0,
-                "longest_streak": 0,
-                "weekly_tier3_count": 0,
-                "weekly_chickens": 0,
-                "unlocked_skins": ["default"],
-                "current_skin": "default",
-                "unlocked_themes": ["default"],
-                "current_theme": "default",
-                "achievements": []
-            }} for u in USERS},
-            "cycle_start": datetime.datetime.now().isoformat(),
-            "winner": None,
-            "weekly_chaos_chicken": {
-                "offered": False,
-                "offered_to": None,
-                "offered_date": None,
-                "completed": False,
-                "completion_date": None,
-                "completed_by": None,
-                "challenge_type": None,
-                "challenge_params": None
-            }
-        }
-        save_data(data)
-        return data
-    try:
-        with open(DATA_FILE, 'r') as f:
-            return json.load(f)
-    except Exception:
-        # If file is corrupt, reinitialize
-        os.rename(DATA_FILE, DATA_FILE + '.bak')
-        return load_data()
+    """Return the cached main data document (loaded from disk on first use)."""
+    with metrics.timer('load_data'):
+        return data_store.get()
 
 def save_data(data):
-    """Save the main data file."""
-    with open(DATA_FILE, 'w') as f:
-        json.dump(data, f, indent=2, default=str)
+    """Mark the main data document dirty; it is written by the background flusher."""
+    with metrics.timer('save_data'):
+        data_store.save(data)
+    # Handlers hold the lanes of the users they mutate; without one, anything may have changed
+    state_sync.touch(*[lane for lane in lanes.held() if lane != GLOBAL])
+
+def build_client_state(data, users=None):
+    """Return a shallow copy of data with the derived fields clients display.
+
+    The cached document is shared by every handler, so per-request values
+    like current_points and days_remaining must not be written into it.
+    Only ``users`` (default all) are included under "users".
+    """
+    state = dict(data)
+    state["users"] = {}
+    today = datetime.date.today()
+    for user in (USERS if users is None else users):
+        user_state = dict(data["users"][user])
+        user_state["current_points"] = calculate_points(user, data)
+        user_state["sessions_today"] = session_index.count_on(data, user, today)
+        state["users"][user] = user_state
+    cycle_start = datetime.datetime.fromisoformat(data["cycle_start"])
+    days_remaining = 7 - (datetime.datetime.now() - cycle_start).days
+    state["days_remaining"] = max(0, days_remaining)
+    return state
+
+# Clients get a full snapshot on connect and compact patches afterwards
+state_sync = StateSync(lambda users: build_client_state(load_data(), users), partition="users",
+                       generation=lambda: data_store.generation)
+
+def broadcast_state():
+    """Send every client the changes since the last broadcast as one patch."""
+    patch = state_sync.publish()
+    if patch:
+        emit_encoded('state_patch', patch, CLIENTS_ROOM)
+    return patch
+
+def state_snapshot():
+    """Return the current client state with its sequence number attached."""
+    broadcast_state()
+    seq, view = state_sync.snapshot()
+    return dict(view, state_seq=seq)
+
+def send_state(since=None):
+    """Bring the requesting client up to date from ``since`` (patches or a snapshot)."""
+    broadcast_state()
+    patches = state_sync.patches_since(since) if since is not None else None
+    if patches is None:
+        reply('full_update', state_snapshot())
+    else:
+        for patch in patches:
+            reply('state_patch', patch)
 
 # Livestock types configuration
 CHICKEN_TYPES = {
@@ -150,11 +357,109 @@ CHICKEN_TYPES = {
     6: {"label": "Horse", "intensity": "intense focus", "time": 90, "points": 6}
 }
 
-# Active timers for each user
-active_timers = {}
+# Session scores are tallied incrementally; Cow and Horse count as boss tiers
+points_engine = PointsEngine(data_store, CHICKEN_TYPES, boss_tier=5)
+
+def calculate_points(user, data):
+    """Total points for a user: scored sessions plus bonus points."""
+    return points_engine.total(data, user)
+
+# Achievements (Focus Flex Moments); each rule only runs for the events it names
+ACHIEVEMENT_RULES = [
+    When("weekly_5_chickens", "WeekWarrior", "Completed 5 sessions in a week",
+         on='session_completed', test=lambda e: e['stats']['weekly_chickens'] == 5),
+    HighTierRun("three_tier3_streak", "Boss Mode", "Completed 3 high-tier sessions (Cow/Horse) in a row",
+                tier=5, length=3),
+    When("gold_chicken_unlock", "Gold Standard", "Unlocked Gold skin",
+         on='session_completed', test=lambda e: e['stats']['lifetime_tier3_count'] == 20,
+         grants=(('unlocked_skins', 'gold_chicken'),)),
+    When("cycle_winner", "Cycle Champion", "Won a full 7-day cycle",
+         on='cycle_ended', test=lambda e: e['winner'] == e['user']),
+    When("tier3_master", "Tier 3 Master", "Completed 5+ Tier 3 chickens in a single cycle",
+         on='cycle_ended', test=lambda e: e['tier3_count'] >= 5),
+    FullDays("perfect_week", "Perfect Week", "Completed 5+ chickens on 5+ days in a single cycle",
+             per_day=5, days=5, grants=(('achievements', None), ('unlocked_themes', 'perfect_week_theme'))),
+    When("chaos_chicken_{challenge_type}", "Chaos Conqueror", "Completed the {challenge_type} chaos chicken challenge!",
+         on='chaos_completed', test=lambda e: e['success']),
+]
+achievement_engine = AchievementEngine(data_store, ACHIEVEMENT_RULES)
+
+# Active timers for each user, shared by every worker. This record is the
+# authority: the scheduler that armed a timer only ticks and fires it while
+# the record still carries its token and is not paused, so any worker can
+# pause or reset it by updating the record. Resuming re-arms the timer on
+# the resuming worker under a new token.
+active_timers = SharedDict(shared_state, 'active_timers')
+
+# Seconds between timer_update emits for running timers
+TIMER_TICK_SECONDS = float(os.environ.get('TIMER_TICK_SECONDS', 1))
+
+def _timer_is_current(record, token):
+    return record is not None and record.get('token') == token and not record.get('paused')
+
+def emit_timer_updates(running):
+    """Send the remaining time of every running timer to the clients."""
+    shared = dict(active_timers.items())
+    for user, info in running.items():
+        if not _timer_is_current(shared.get(user), info['token']):
+            # Paused, reset or taken over by another worker
+            timer_scheduler.cancel(user, info['token'])
+            continue
+        minutes, seconds = divmod(int(math.ceil(info['remaining'])), 60)
+        emit_to_pair(user, 'timer_update', {
+            'user': user,
+            'time': f"{minutes:02d}:{seconds:02d}",
+            'is_break': info['is_break']
+        })
+
+def handle_timer_expired(user, is_break, token):
+    """Scheduler callback: a focus session or break ran out."""
+    with lanes.hold(user):
+        # A stale deadline must not complete whatever the user started since
+        if not _timer_is_current(active_timers.get(user), token):
+            return
+        active_timers.pop(user)
+        complete_timer(user, is_break)
+
+# Expiries run in their own green thread: they wait on the user's lane and
+# save, and must not stall the other timers' ticks and deadlines
+timer_scheduler = TimerScheduler(emit_timer_updates, handle_timer_expired, tick_interval=TIMER_TICK_SECONDS,
+                                 spawn=eventlet.spawn)
+
+def _arm_timer(user, remaining, is_break, duration):
+    token = uuid.uuid4().hex
+    active_timers[user] = {'duration': duration, 'is_break': is_break, 'paused': False,
+                           'deadline': time.time() + remaining, 'token': token}
+    timer_scheduler.start(user, remaining, is_break, token)
+
+def start_user_timer(user, duration, is_break=False):
+    """Start the user's focus or break timer on this worker's scheduler."""
+    _arm_timer(user, duration, is_break, duration)
+
+def pause_user_timer(user):
+    """Freeze the user's timer, wherever it runs; returns False if it is not running."""
+    record = active_timers.get(user)
+    if record is None or record['paused']:
+        return False
+    timer_scheduler.cancel(user, record['token'])
+    active_timers[user] = dict(record, paused=True, remaining=max(0.0, record['deadline'] - time.time()))
+    return True
+
+def resume_user_timer(user):
+    """Continue a paused timer on this worker; returns False if there is nothing to resume."""
+    record = active_timers.get(user)
+    if record is None or not record['paused']:
+        return False
+    _arm_timer(user, record['remaining'], record['is_break'], record['duration'])
+    return True
+
+def stop_user_timer(user):
+    """Cancel the user's timer, if any."""
+    active_timers.pop(user)
+    timer_scheduler.cancel(user)
 
 # Track current session per user (in memory)
-current_sessions = {user: None for user in USERS}
+current_sessions = SharedDict(shared_state, 'current_sessions')
 
 AVAILABLE_ANIMALS = [
     {"name": "Chicken", "duration": 15, "base_price": [5, 10]},
@@ -165,9 +470,43 @@ AVAILABLE_ANIMALS = [
     {"name": "Horse", "duration": 90, "base_price": [60, 100]}
 ]
 
+def get_available_animals():
+    """Return the animals that can be raised, with their price ranges."""
+    return [dict(animal) for animal in AVAILABLE_ANIMALS]
+
+# --- Market Prices ---
+# Prices depend only on MARKET_SEED and the tick number, so every worker
+# computes the same series without sharing it
+MARKET_TICK_SECONDS = float(os.environ.get('MARKET_TICK_SECONDS', 10))
+MARKET_HISTORY_TICKS = int(24 * 3600 // MARKET_TICK_SECONDS)
+market_engine = MarketEngine(AVAILABLE_ANIMALS, tick_seconds=MARKET_TICK_SECONDS,
+                             capacity=MARKET_HISTORY_TICKS, seed=int(os.environ.get('MARKET_SEED', 2024)))
+
+def sync_market_events():
+    """Apply any event shocks the engine has not seen yet."""
+    for e in EVENT_POINTS:
+        if 'start_tick' in e:
+            market_engine.add_event(e['time'], e['animal'], e['effect'], e['start_tick'], e['end_tick'])
+
+# Background loops check in here every iteration; /readyz fails if one goes quiet
+heartbeats = Heartbeats()
+heartbeats.register('market-tick', 3 * MARKET_TICK_SECONDS + 5)
+heartbeats.register('market-trades', 120)
+heartbeats.register('market-events', 400)
+
+def market_tick_thread():
+    """Advance the price engine once per tick."""
+    while True:
+        heartbeats.beat('market-tick')
+        try:
+            sync_market_events()
+            market_engine.advance()
+        except Exception:
+            logger.error("Market tick failed", exc_info=True)
+        time.sleep(MARKET_TICK_SECONDS - time.time() % MARKET_TICK_SECONDS)
+
 # --- Market Event System ---
-MARKET_EVENTS = deque(maxlen=10)  # Store last 10 events
-CURRENT_EVENT = None
+MARKET_EVENTS = SharedList(shared_state, 'market_events', maxlen=10)  # Store last 10 events
 EVENT_EFFECTS = {
     'Chicken': [
         {'name': 'Bird Flu Scare', 'emoji': '🐔', 'effect': -0.3, 'desc': 'Chicken prices drop 30%'},
@@ -196,10 +535,27 @@ EVENT_EFFECTS = {
 }
 
 # Store event-affected points for chart annotation
-EVENT_POINTS = deque(maxlen=10)
+EVENT_POINTS = SharedList(shared_state, 'event_points', maxlen=10)
 
 # --- Market Feed System ---
-MARKET_FEED = deque(maxlen=30)  # Last 30 feed items
+MARKET_FEED = SharedList(shared_state, 'market_feed', maxlen=30)  # Last 30 feed items
+
+# Market events and feed items are pushed to clients in this room as they
+# happen; the seq ids let a reconnecting client fetch only what it missed
+MARKET_ROOM = 'market'
+
+def publish_market_item(items, event, item):
+    """Stamp ``item`` with the next market seq, store it and push it to the market room."""
+    item['seq'] = shared_state.incr('market_seq')
+    items.push(item)
+    emit_encoded(event, item, MARKET_ROOM)
+
+def market_items_since(items):
+    """Items newer than the request's ``?since=`` seq (all of them without it)."""
+    since = request.args.get('since', type=int)
+    if since is None:
+        return list(items)
+    return [item for item in items if item.get('seq', 0) > since]
 
 def add_fake_trade_to_feed():
     users = ['luu', '4keni', 'guest']
@@ -214,7 +570,7 @@ def add_fake_trade_to_feed():
     a = random.choice(animals)
     p = random.randint(50, 500)
     msg = random.choice(actions)(u, a, p)
-    MARKET_FEED.appendleft({
+    publish_market_item(MARKET_FEED, 'market_feed_item', {
         'id': str(uuid.uuid4()),
         'type': 'trade',
         'msg': msg,
@@ -223,25 +579,43 @@ def add_fake_trade_to_feed():
 
 def add_event_to_feed(event):
     msg = f"<span class='neon-event'>{event['emoji']} {event['name']}</span> – {event['desc']}"
-    MARKET_FEED.appendleft({
+    publish_market_item(MARKET_FEED, 'market_feed_item', {
         'id': str(uuid.uuid4()),
         'type': 'event',
         'msg': msg,
         'time': event['time']
     })
 
+def get_current_event():
+    """Return the market event currently in effect, if any."""
+    return shared_state.get('current_event')
+
+# Only one worker produces market data; the lease outlives the longest sleep
+# below, so the holder keeps renewing it and another worker takes over if it dies
+MARKET_LEASE_TTL = 600
+
 # Periodically add fake trades for demo
-threading.Thread(target=lambda: [time.sleep(random.randint(20, 40)) or add_fake_trade_to_feed() for _ in iter(int, 1)], daemon=True).start()
+def fake_trade_thread():
+    while True:
+        heartbeats.beat('market-trades')
+        time.sleep(random.randint(20, 40))
+        if shared_state.acquire_lease('market_producer', WORKER_ID, MARKET_LEASE_TTL):
+            add_fake_trade_to_feed()
 
 # Hook: when a new event is created, add to feed
 def market_event_thread():
-    global CURRENT_EVENT
     while True:
+        heartbeats.beat('market-events')
         # Wait 1-3 minutes between events
         time.sleep(random.randint(60, 180))
+        if not shared_state.acquire_lease('market_producer', WORKER_ID, MARKET_LEASE_TTL):
+            continue
         animal = random.choice(list(EVENT_EFFECTS.keys()))
         event = random.choice(EVENT_EFFECTS[animal])
         event_time = datetime.datetime.now().isoformat()
+        # Event lasts for 1-2 minutes
+        lifetime = random.randint(60, 120)
+        start_tick = market_engine.current_tick()
         event_obj = {
             'animal': animal,
             'name': event['name'],
@@ -250,20 +624,28 @@ def market_event_thread():
             'desc': event['desc'],
             'time': event_time
         }
-        MARKET_EVENTS.appendleft(event_obj)
-        CURRENT_EVENT = event_obj
-        # Store for chart annotation
-        EVENT_POINTS.append({'animal': animal, 'effect': event['effect'], 'time': event_time, 'desc': event['desc'], 'emoji': event['emoji']})
+        shared_state.set('current_event', event_obj)
+        # Store for chart annotation and as the price shock every worker's engine applies
+        EVENT_POINTS.push({'animal': animal, 'effect': event['effect'], 'time': event_time, 'desc': event['desc'], 'emoji': event['emoji'],
+                           'start_tick': start_tick, 'end_tick': start_tick + math.ceil(lifetime / MARKET_TICK_SECONDS)})
+        sync_market_events()
+        shared_state.set('market_version', shared_state.get('market_version', 0) + 1)
+        if MARKET_GRAPH_PNG:
+            market_graph_wakeup.set()
+        publish_market_item(MARKET_EVENTS, 'market_event', event_obj)
         # Add to feed
         add_event_to_feed(event_obj)
-        # Event lasts for 1-2 minutes
-        time.sleep(random.randint(60, 120))
-        CURRENT_EVENT = None
+        time.sleep(lifetime)
+        shared_state.set('current_event', None)
+
+def chaos_chicken_due(data):
+    """True if no weekly chaos chicken has been offered or completed yet."""
+    return not (data["weekly_chaos_chicken"]["offered"] or data["weekly_chaos_chicken"]["completed"])
 
 def check_and_create_chaos_chicken(data):
     """Check if a weekly chaos chicken challenge should be created and offer it to a user."""
     # If a challenge is already offered or completed, don't create a new one
-    if data["weekly_chaos_chicken"]["offered"] or data["weekly_chaos_chicken"]["completed"]:
+    if not chaos_chicken_due(data):
         return data
         
     # Randomly select a user to offer the challenge to
@@ -307,37 +689,76 @@ def check_and_create_chaos_chicken(data):
     return data
 
 @app.route('/')
+@metrics.instrumented('http')
 def index():
-    data = load_data()
-    
-    # Check for weekly chaos chicken
-    data = check_and_create_chaos_chicken(data)
-    save_data(data)
+    # Check for weekly chaos chicken; lock and save only when one is due
+    if chaos_chicken_due(load_data()):
+        with lanes.hold(GLOBAL):
+            data = load_data()
+            if chaos_chicken_due(data):
+                data = check_and_create_chaos_chicken(data)
+                save_data(data)
     
     return render_template('index.html', users=USERS, chicken_types=CHICKEN_TYPES)
 
+# Health checks, cheapest first:
+#   /healthz  liveness: the worker answers requests; no I/O at all
+#   /readyz   readiness: stores flushing, timer loop and background threads alive
+#             (heartbeat timestamps only); this is Render's healthCheckPath
+#   /status   diagnostics for humans, with a psutil sample refreshed every
+#             HEALTH_SAMPLE_SECONDS rather than per request
+STORE_MAX_LAG = float(os.environ.get('STORE_MAX_LAG_SECONDS', 30))
+
+def readiness():
+    """(ready, {check: details}) from in-memory state only."""
+    checks = {'background_threads': {'ok': background_threads_started}}
+    for name, store in (('data_store', data_store), ('barns_store', barns_store), ('animals_store', animals_store)):
+        lag = store.lag()
+        checks[name] = {'ok': store.last_error is None and lag <= STORE_MAX_LAG,
+                        'lag': round(lag, 1), 'error': store.last_error}
+    checks['timer_scheduler'] = {'ok': timer_scheduler.healthy(), 'timers': len(timer_scheduler)}
+    if background_threads_started:
+        beat = memory_manager.heartbeat
+        age = None if beat is None else time.monotonic() - beat
+        checks['memory_manager'] = {'ok': age is not None and age <= 2 * memory_manager.check_interval + 5,
+                                    'age': None if age is None else round(age, 1)}
+        checks.update(heartbeats.check())
+    return all(check['ok'] for check in checks.values()), checks
+
+@app.route('/healthz')
+@metrics.instrumented('http')
+def healthz():
+    return jsonify({"status": "ok"})
+
+@app.route('/readyz')
+@metrics.instrumented('http')
+def readyz():
+    ready, checks = readiness()
+    return jsonify({"status": "ok" if ready else "unavailable", "checks": checks}), 200 if ready else 503
+
 @app.route('/status')
+@metrics.instrumented('http')
 def status():
-    logger.info("Status endpoint called")
     try:
-        data = load_data()
-        health = get_system_health()
+        health = system_health.get()
+        ready, checks = readiness()
         
         # Check critical components
         status = {
-            "status": "ok",
+            "status": "ok" if ready else "degraded",
             "users": USERS,
             "chicken_types": CHICKEN_TYPES,
             "system_health": health,
+            "checks": checks,
             "active_connections": len(socketio.server.manager.rooms.get('/', {}).get('', set())),
             "active_timers": len(active_timers),
+            "gc": memory_manager.stats(),
             "timestamp": datetime.datetime.now().isoformat()
         }
         
-        # Add warning if memory usage is high
-        if health['memory_usage'] > 500:  # 500MB threshold
+        # Add warning if memory usage is high; the memory manager collects on its own
+        if health['memory_usage'] > memory_manager.rss_limit_mb:
             status['warnings'] = ['High memory usage detected']
-            cleanup_memory()
             
         return jsonify(status)
     except Exception as e:
@@ -349,6 +770,7 @@ def status():
         }), 500
 
 @app.route('/debug/emit/<event>')
+@metrics.instrumented('http')
 def debug_emit(event):
     logger.debug("Debug emit endpoint called for event: %s", event)
     try:
@@ -358,52 +780,74 @@ def debug_emit(event):
         logger.error("Error in debug_emit: %s", str(e))
         return jsonify({"status": "error", "message": str(e)})
 
+# Not instrumented itself: scrapes would only measure rendering the metrics
+@app.route('/metrics')
+def metrics_endpoint():
+    """Handler latency, call and error counts and section timings (Prometheus text format)."""
+    return app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/debug/log_level', methods=['GET', 'POST'])
+@metrics.instrumented('http')
+def debug_log_level():
+    """Show logger levels, or change one: POST {"logger": "engineio.server", "level": "DEBUG"}.
+
+    Requires the LOG_ADMIN_TOKEN value in an X-Admin-Token header; without
+    LOG_ADMIN_TOKEN set the route is disabled.
+    """
+    token = os.environ.get('LOG_ADMIN_TOKEN')
+    if not token:
+        return jsonify({"status": "error", "message": "Disabled: LOG_ADMIN_TOKEN is not set"}), 403
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), token):
+        return jsonify({"status": "error", "message": "Forbidden"}), 403
+    if request.method == 'POST':
+        body = request.get_json(silent=True) or {}
+        level = str(body.get('level', '')).upper()
+        if not isinstance(logging.getLevelName(level), int):
+            return jsonify({"status": "error", "message": f"Unknown level: {level}"}), 400
+        name = body.get('logger') or ''
+        logging.getLogger(name if name != 'root' else '').setLevel(level)
+        logger.warning("Log level of %s set to %s", name or 'root', level)
+    return jsonify(logger_levels(['engineio.server', 'socketio.server', 'werkzeug', __name__]))
+
 @socketio.on('connect')
-def handle_connect():
+@metrics.instrumented('socket', 'connect')
+def handle_connect(auth=None):
     logger.info("Client connected: %s", request.sid)
     try:
-        data = load_data()
-        
-        # Check if 7-day cycle has passed
-        cycle_start = datetime.datetime.fromisoformat(data["cycle_start"])
-        if (datetime.datetime.now() - cycle_start).days >= 7:
-            data = end_cycle(data)
-            save_data(data)
+        # Check if 7-day cycle has passed; only a due rollover takes the lanes
+        if cycle_expired(load_data()):
+            with lanes.hold(GLOBAL, *USERS):
+                data = load_data()
+                if cycle_expired(data):
+                    data = end_cycle(data)
+                    save_data(data)
         
         # Send confirmation of connection first
         emit('server_connected', {"status": "Connected to server"})
+        auth = auth or {}
+        identify(auth.get('user'), auth.get('encoding', 'json'), auth.get('schema'))
         
-        # Calculate and add the necessary data
-        for user in USERS:
-            points = calculate_points(user, data)
-            data["users"][user]["current_points"] = points
-            
-            # Get today's sessions
-            sessions_today = len([s for s in data["users"][user]["sessions"] 
-                               if datetime.datetime.fromisoformat(s["timestamp"]).date() == datetime.date.today()])
-            data["users"][user]["sessions_today"] = sessions_today
-        
-        # Calculate days remaining
-        cycle_start = datetime.datetime.fromisoformat(data["cycle_start"])
-        days_remaining = 7 - (datetime.datetime.now() - cycle_start).days
-        data["days_remaining"] = max(0, days_remaining)
-        
-        # Send only to the client that just connected
-        emit('full_update', data)
-        
-        # Cleanup memory after heavy operation
-        cleanup_memory()
+        # Send only to the client that just connected: the patches it missed
+        # if it is reconnecting with a recent state_seq, otherwise a snapshot
+        send_state((auth or {}).get('state_seq'))
         
     except Exception as e:
         logger.error("Error in connect handler: %s", str(e), exc_info=True)
         emit('error', {'message': f'Connection error: {str(e)}'})
-        # Attempt recovery
-        try:
-            cleanup_memory()
-        except:
-            pass
+
+@socketio.on('identify')
+@metrics.instrumented('socket', 'identify')
+def handle_identify(json_data=None):
+    json_data = json_data or {}
+    identify(json_data.get('user'), json_data.get('encoding', 'json'), json_data.get('schema'))
+
+@socketio.on('request_state')
+@metrics.instrumented('socket', 'request_state')
+def handle_request_state(json_data=None):
+    send_state((json_data or {}).get('since'))
 
 @socketio.on('disconnect')
+@metrics.instrumented('socket', 'disconnect')
 def handle_disconnect():
     logger.info("Client disconnected: %s", request.sid)
     
@@ -416,40 +860,43 @@ def handle_disconnect():
             # Clean up the timer
             del active_timers[request.sid]
             
-        # Notify other clients about the disconnect
-        socketio.emit('user_disconnected', {
-            'sid': request.sid,
-            'timestamp': datetime.datetime.now().isoformat()
-        })
-        
-        # Cleanup memory
-        cleanup_memory()
+        # Notify the pair about the disconnect
+        user = identified_users.pop(request.sid, None)
+        client_encodings.pop(request.sid, None)
+        if user:
+            emit_to_pair(user, 'user_disconnected', {
+                'sid': request.sid,
+                'user': user,
+                'timestamp': datetime.datetime.now().isoformat()
+            })
         
     except Exception as e:
         logger.error("Error in disconnect handler: %s", str(e), exc_info=True)
 
 @socketio.on('start_chicken')
+@metrics.instrumented('socket', 'start_chicken')
+@lanes.serialized(related=lambda user: [partner_of(user)])
 def handle_start_chicken(json_data):
-    print(f"Received start_chicken event with data: {json_data}")
+    logger.debug("Received start_chicken event with data: %s", json_data)
     
     # Validate input data
     if 'user' not in json_data or not json_data['user']:
-        print("Error: Missing user in start_chicken data")
+        logger.warning("Missing user in start_chicken data")
         emit('error', {'message': 'Missing user data'})
         return
         
     if 'task_name' not in json_data or not json_data['task_name']:
-        print("Error: Missing task_name in start_chicken data")
+        logger.warning("Missing task_name in start_chicken data")
         emit('error', {'message': 'Missing task name'})
         return
         
     if 'tier' not in json_data:
-        print("Error: Missing tier in start_chicken data")
+        logger.warning("Missing tier in start_chicken data")
         emit('error', {'message': 'Missing animal type data'})
         return
         
     if 'current_user' not in json_data or not json_data['current_user']:
-        print("Error: Missing current_user in start_chicken data")
+        logger.warning("Missing current_user in start_chicken data")
         emit('error', {'message': 'Missing current user data'})
         return
     
@@ -469,25 +916,24 @@ def handle_start_chicken(json_data):
         
         # Check that user is only controlling their own side
         if user != current_user:
-            print(f"Error: User {current_user} tried to control {user}'s timer")
+            logger.warning("User %s tried to control %s's timer", current_user, user)
             emit('error', {'message': f'You can only control your own timer'})
             return
         
         if user not in USERS:
-            print(f"Error: Invalid user '{user}'")
+            logger.warning("Invalid user '%s'", user)
             emit('error', {'message': f'Invalid user: {user}'})
             return
             
         if tier not in CHICKEN_TYPES:
-            print(f"Error: Invalid animal type '{tier}'")
+            logger.warning("Invalid animal type '%s'", tier)
             emit('error', {'message': f'Invalid animal type: {tier}'})
             return
         
         data = load_data()
         
         # Check daily limit
-        sessions_today = len([s for s in data["users"][user]["sessions"] 
-                          if datetime.datetime.fromisoformat(s["timestamp"]).date() == datetime.date.today()])
+        sessions_today = session_index.count_on(data, user, datetime.date.today())
         
         if sessions_today >= 5:
             emit('error', {'message': 'Daily limit reached (5 sessions per day)'})
@@ -502,7 +948,7 @@ def handle_start_chicken(json_data):
 
         # Store current session for user
         current_sessions[user] = {
-            'animal': animal_data,
+            'animal': dict(animal_data),
             'task_name': task_name,
             'start_time': datetime.datetime.now().isoformat(),
             'chicken_name': chicken_name,
@@ -521,7 +967,7 @@ def handle_start_chicken(json_data):
             "user": user,
             "task_name": task_name,
             "tier": tier,
-            "animal": animal_data,
+            "animal": dict(animal_data),
             "timestamp": current_sessions[user]['start_time'],
             "start_time": current_sessions[user]['start_time'],
             "pauses": [],
@@ -545,7 +991,7 @@ def handle_start_chicken(json_data):
             upgraded_animal = CHICKEN_TYPES[tier + 1]["label"]
             
             # Notify the user
-            socketio.emit('effect_used', {
+            emit_to_user(user, 'effect_used', {
                 'user': user,
                 'effect_type': 'tier_upgrade',
                 'message': f'Tier Upgrade used! Your {original_animal} session is now a {upgraded_animal} with the same time.'
@@ -556,49 +1002,53 @@ def handle_start_chicken(json_data):
         
         # Check for SNIPE MODE (duel) opportunity
         partner = "luu" if user == "4keni" else "4keni"
-        partner_recent_sessions = [s for s in data["users"][partner]["sessions"] 
-                                if not s.get("completed", False) and s["tier"] == tier]
+        partner_recent_sessions = session_index.active_of_tier(data, partner, tier)
         
         # If partner has an active session of the same tier, check if it's within 2 minutes
         if partner_recent_sessions:
             partner_session = partner_recent_sessions[0]
-            partner_start_time = datetime.datetime.fromisoformat(partner_session["timestamp"])
+            partner_start_time = session_index.started_at(data, partner, partner_session)
             current_time_dt = datetime.datetime.now()
             
             # If started within 2 minutes, create a duel
-            if (current_time_dt - partner_start_time).total_seconds() < 120:  # 2 minutes = 120 seconds
-                animal_type = CHICKEN_TYPES[tier]["label"]
-                duel = {
-                    "id": f"duel_{int(time.time())}",
-                    "user1": partner,
-                    "user2": user,
-                    "tier": tier,
-                    "start_time": current_time_dt.isoformat(),
-                    "user1_completed": False,
-                    "user2_completed": False,
-                    "user1_time": None,
-                    "user2_time": None
-                }
-                data.setdefault("active_duels", []).append(duel)
-                
-                # Mark sessions as part of a duel
-                partner_session["duel_id"] = duel["id"]
-                session["duel_id"] = duel["id"]
-                
-                # Notify both users of the duel
-                socketio.emit('duel_started', {
-                    'user1': partner,
-                    'user2': user,
-                    'tier': tier,
-                    'animal_type': animal_type
-                })
+            # Duels are shared between the players
+            with lanes.hold(GLOBAL):
+                if (current_time_dt - partner_start_time).total_seconds() < 120:  # 2 minutes = 120 seconds
+                    animal_type = CHICKEN_TYPES[tier]["label"]
+                    duel = {
+                        "id": f"duel_{int(time.time())}",
+                        "user1": partner,
+                        "user2": user,
+                        "tier": tier,
+                        "start_time": current_time_dt.isoformat(),
+                        "user1_completed": False,
+                        "user2_completed": False,
+                        "user1_time": None,
+                        "user2_time": None
+                    }
+                    data.setdefault("active_duels", []).append(duel)
+                    data_store.record('duel_started', duel=duel["id"], users=[partner, user], tier=tier)
+                    
+                    # Mark sessions as part of a duel
+                    partner_session["duel_id"] = duel["id"]
+                    session["duel_id"] = duel["id"]
+                    
+                    # Notify both users of the duel
+                    emit_to_pair(user, 'duel_started', {
+                        'user1': partner,
+                        'user2': user,
+                        'tier': tier,
+                        'animal_type': animal_type
+                    })
         
         # Add to user's sessions
         data["users"][user]["sessions"].append(session)
+        session_index.add(data, user, session)
+        data_store.record('session_started', user=user, session=session["id"], tier=tier, task=task_name)
         save_data(data)
         
         # Emit chicken_started event to all clients
-        socketio.emit('chicken_started', {
+        emit_to_pair(user, 'chicken_started', {
             'user': user,
             'task_name': task_name,
             'tier': tier
@@ -606,36 +1056,33 @@ def handle_start_chicken(json_data):
         
         # Use animal duration for timer
         duration = animal_data["duration"] * 60
-        timer_thread = threading.Thread(target=timer_worker, args=(user, duration))
-        timer_thread.daemon = True
-        timer_thread.start()
+        start_user_timer(user, duration)
         
     except Exception as e:
-        print(f"Error in start_chicken: {str(e)}")
+        logger.error("Error in start_chicken: %s", e, exc_info=True)
         emit('error', {'message': f'Error starting session: {str(e)}'})
 
 @socketio.on('pause_timer')
+@metrics.instrumented('socket', 'pause_timer')
+@lanes.serialized()
 def handle_pause_timer(json_data):
     user = json_data.get('user')
     current_user = json_data.get('current_user')
     
     # Check that user is only controlling their own side
     if user != current_user:
-        print(f"Error: User {current_user} tried to control {user}'s timer")
+        logger.warning("User %s tried to control %s's timer", current_user, user)
         emit('error', {'message': f'You can only control your own timer'})
         return
         
     if user in active_timers:
+        pause_user_timer(user)
+        
         # Record pause time for precision mode calculations
         data = load_data()
         
         # Find the active session
-        active_session = None
-        for session in data["users"][user]["sessions"]:
-            if not session.get("completed", False) and not session.get("aborted", False):
-                active_session = session
-                break
-                
+        active_session = session_index.active(data, user)
         if active_session:
             # Record pause start time
             pause_info = {
@@ -643,11 +1090,14 @@ def handle_pause_timer(json_data):
                 "pause_end": None
             }
             active_session.setdefault("pauses", []).append(pause_info)
+            data_store.record('session_paused', user=user, session=active_session["id"])
             save_data(data)
         
-        socketio.emit('timer_paused', {'user': user})
+        emit_to_pair(user, 'timer_paused', {'user': user})
 
 @socketio.on('resume_timer')
+@metrics.instrumented('socket', 'resume_timer')
+@lanes.serialized()
 def handle_resume_timer(json_data):
     user = json_data.get('user')
     current_user = json_data.get('current_user')
@@ -655,22 +1105,19 @@ def handle_resume_timer(json_data):
     
     # Check that user is only controlling their own side
     if user != current_user:
-        print(f"Error: User {current_user} tried to control {user}'s timer")
+        logger.warning("User %s tried to control %s's timer", current_user, user)
         emit('error', {'message': f'You can only control your own timer'})
         return
         
     if user in active_timers:
+        resume_user_timer(user)
+        
         # Record resume time for precision mode calculations
         if not is_break:  # Only track pauses for main timer, not break timer
             data = load_data()
             
             # Find the active session
-            active_session = None
-            for session in data["users"][user]["sessions"]:
-                if not session.get("completed", False) and not session.get("aborted", False):
-                    active_session = session
-                    break
-                    
+            active_session = session_index.active(data, user)
             if active_session and "pauses" in active_session and active_session["pauses"]:
                 # Update the last pause with end time
                 last_pause = active_session["pauses"][-1]
@@ -684,24 +1131,27 @@ def handle_resume_timer(json_data):
                     
                     # Update total pause duration
                     active_session["total_pause_duration"] = active_session.get("total_pause_duration", 0) + pause_duration
+                    data_store.record('session_resumed', user=user, session=active_session["id"], paused_for=pause_duration)
                     
                     save_data(data)
         
-        socketio.emit('timer_resumed', {'user': user, 'is_break': is_break})
+        emit_to_pair(user, 'timer_resumed', {'user': user, 'is_break': is_break})
 
 @socketio.on('reset_timer')
+@metrics.instrumented('socket', 'reset_timer')
+@lanes.serialized()
 def handle_reset_timer(json_data):
     user = json_data.get('user')
     current_user = json_data.get('current_user')
     
     # Check that user is only controlling their own side
     if user != current_user:
-        print(f"Error: User {current_user} tried to control {user}'s timer")
+        logger.warning("User %s tried to control %s's timer", current_user, user)
         emit('error', {'message': f'You can only control your own timer'})
         return
         
     if user in active_timers:
-        active_timers[user]['stop'] = True
+        stop_user_timer(user)
         
         # Update user's streak and momentum multiplier
         data = load_data()
@@ -716,28 +1166,32 @@ def handle_reset_timer(json_data):
         else:
             # Clear the effect after it's used
             data["users"][user]["stats"]["mystery_egg_effect"] = None
-            socketio.emit('effect_used', {
+            emit_to_user(user, 'effect_used', {
                 'user': user,
                 'effect_type': 'combo_extender',
                 'message': 'Combo Extender used! Your streak is preserved.'
             })
         
-        # Check for any active sessions that need to be marked as incomplete
-        for session in data["users"][user]["sessions"]:
-            if not session.get("completed", False):
-                session["completed"] = False
-                session["aborted"] = True
-                session["abort_time"] = datetime.datetime.now().isoformat()
-                
-                # Check if this session was part of a duel
-                if "duel_id" in session:
+        # Mark the active session as aborted
+        session = session_index.active(data, user)
+        if session:
+            session["completed"] = False
+            session["aborted"] = True
+            session["abort_time"] = datetime.datetime.now().isoformat()
+            session_index.finish(data, user, session)
+            data_store.record('session_aborted', user=user, session=session["id"], streak_kept=has_combo_extender)
+            achievement_engine.publish(data, user, 'session_aborted', tier=session["tier"])
+            
+            # Check if this session was part of a duel
+            if "duel_id" in session:
+                with lanes.hold(GLOBAL):
                     for duel in data.get("active_duels", [])[:]:  # Make a copy to allow removal
                         if duel["id"] == session["duel_id"]:
                             # Mark this user as forfeiting the duel
                             partner = duel["user1"] if duel["user2"] == user else duel["user2"]
                             
                             # Emit duel forfeit event
-                            socketio.emit('duel_forfeit', {
+                            emit_to_pair(user, 'duel_forfeit', {
                                 'winner': partner,
                                 'loser': user,
                                 'tier': duel["tier"]
@@ -745,151 +1199,162 @@ def handle_reset_timer(json_data):
                             
                             # Remove the duel
                             data["active_duels"].remove(duel)
-                
-                break
+                            data_store.record('duel_forfeited', duel=duel["id"], winner=partner, loser=user)
         
         save_data(data)
-        socketio.emit('timer_reset', {'user': user})
+        emit_to_pair(user, 'timer_reset', {'user': user})
 
 @socketio.on('timer_complete')
+@metrics.instrumented('socket', 'timer_complete')
+@lanes.serialized()
 def handle_timer_complete(json_data):
     user = json_data.get('user')
     is_break = json_data.get('is_break', False)
     
     try:
-        if is_break:
-            # Break complete, redirect to main timer reset
-            socketio.emit('timer_reset', {'user': user})
-            return
+        complete_timer(user, is_break)
+    except Exception as e:
+        logger.error("Error in timer_complete: %s", e, exc_info=True)
+        emit('error', {'message': f'Error completing timer: {str(e)}'})
+
+def complete_timer(user, is_break=False):
+    """Finish the user's focus session or break; called by the client or the scheduler."""
+    # A client-reported completion supersedes the scheduled one
+    stop_user_timer(user)
+    
+    if is_break:
+        # Break complete, redirect to main timer reset
+        emit_to_pair(user, 'timer_reset', {'user': user})
+        return
+    
+    data = load_data()
+    
+    # Find the active session for this user
+    active_session = session_index.active(data, user)
+    if active_session:
+        # Mark the session as completed
+        active_session["completed"] = True
+        active_session["completion_time"] = datetime.datetime.now().isoformat()
+        session_index.finish(data, user, active_session)
+        
+        # Update momentum multiplier
+        streak = data["users"][user]["stats"]["streak"] + 1
+        data["users"][user]["stats"]["streak"] = streak
+        
+        # Update longest streak if applicable
+        if streak > data["users"][user]["stats"]["longest_streak"]:
+            data["users"][user]["stats"]["longest_streak"] = streak
+        
+        # Set momentum multiplier based on streak
+        if streak == 1:
+            data["users"][user]["stats"]["momentum_multiplier"] = 1.0
+        elif streak == 2:
+            data["users"][user]["stats"]["momentum_multiplier"] = 1.2
+        elif streak == 3:
+            data["users"][user]["stats"]["momentum_multiplier"] = 1.5
+        else:  # 4 or more
+            data["users"][user]["stats"]["momentum_multiplier"] = 2.0
+        data_store.record('session_completed', user=user, session=active_session["id"], tier=active_session["tier"],
+                          streak=streak, momentum=data["users"][user]["stats"]["momentum_multiplier"])
+            
+        # Update session counts
+        data["users"][user]["stats"]["weekly_chickens"] += 1
+        if active_session["tier"] >= 5:  # Cow or Horse (high tier sessions)
+            data["users"][user]["stats"]["lifetime_tier3_count"] += 1
+            data["users"][user]["stats"]["weekly_tier3_count"] += 1
         
-        data = load_data()
+        # Check for Mystery Egg (only once per day, after first session)
+        today = datetime.date.today().isoformat()
+        mystery_egg_used_date = data["users"][user]["stats"]["mystery_egg_used_date"]
+        sessions_today = session_index.count_on(data, user, datetime.date.today(), completed=True)
         
-        # Find the active session for this user
-        active_session = None
-        for session in data["users"][user]["sessions"]:
-            if not session.get("completed", False):
-                active_session = session
-                break
-                
-        if active_session:
-            # Mark the session as completed
-            active_session["completed"] = True
-            active_session["completion_time"] = datetime.datetime.now().isoformat()
-            
-            # Update momentum multiplier
-            streak = data["users"][user]["stats"]["streak"] + 1
-            data["users"][user]["stats"]["streak"] = streak
-            
-            # Update longest streak if applicable
-            if streak > data["users"][user]["stats"]["longest_streak"]:
-                data["users"][user]["stats"]["longest_streak"] = streak
+        # Check if this is the user's first session today and they haven't used the mystery egg yet
+        if sessions_today == 1 and (mystery_egg_used_date is None or mystery_egg_used_date != today):
+            # Activate mystery egg
+            data["users"][user]["stats"]["mystery_egg_used_date"] = today
             
-            # Set momentum multiplier based on streak
-            if streak == 1:
-                data["users"][user]["stats"]["momentum_multiplier"] = 1.0
-            elif streak == 2:
-                data["users"][user]["stats"]["momentum_multiplier"] = 1.2
-            elif streak == 3:
-                data["users"][user]["stats"]["momentum_multiplier"] = 1.5
-            else:  # 4 or more
-                data["users"][user]["stats"]["momentum_multiplier"] = 2.0
-                
-            # Update session counts
-            data["users"][user]["stats"]["weekly_chickens"] += 1
-            if active_session["tier"] >= 5:  # Cow or Horse (high tier sessions)
-                data["users"][user]["stats"]["lifetime_tier3_count"] += 1
-                data["users"][user]["stats"]["weekly_tier3_count"] += 1
-            
-            # Check for Mystery Egg (only once per day, after first session)
-            today = datetime.date.today().isoformat()
-            mystery_egg_used_date = data["users"][user]["stats"]["mystery_egg_used_date"]
-            sessions_today = len([s for s in data["users"][user]["sessions"] 
-                               if datetime.datetime.fromisoformat(s["timestamp"]).date() == datetime.date.today() 
-                               and s.get("completed", False)])
+            # Choose a random effect (0-7 for more variety)
+            effect_id = random.randint(0, 7)
             
-            # Check if this is the user's first session today and they haven't used the mystery egg yet
-            if sessions_today == 1 and (mystery_egg_used_date is None or mystery_egg_used_date != today):
-                # Activate mystery egg
-                data["users"][user]["stats"]["mystery_egg_used_date"] = today
-                
-                # Choose a random effect (0-7 for more variety)
-                effect_id = random.randint(0, 7)
+            if effect_id == 0:  # +1 bonus point
+                data["users"][user]["points"] += 1
+                mystery_effect = {
+                    "type": "bonus_point",
+                    "description": "+1 bonus point added!"
+                }
+            elif effect_id == 1:  # Skip next break
+                mystery_effect = {
+                    "type": "skip_break",
+                    "description": "Next break will be skipped!"
+                }
+            elif effect_id == 2:  # Double points on next session
+                mystery_effect = {
+                    "type": "double_points",
+                    "description": "Double points on your next session!"
+                }
+            elif effect_id == 3:  # Mirror mode
+                # Find partner's last completed session
+                partner = "luu" if user == "4keni" else "4keni"
+                partner_sessions = [s for s in data["users"][partner]["sessions"] if s.get("completed", False)]
+                partner_session = partner_sessions[-1] if partner_sessions else None
                 
-                if effect_id == 0:  # +1 bonus point
-                    data["users"][user]["points"] += 1
-                    mystery_effect = {
-                        "type": "bonus_point",
-                        "description": "+1 bonus point added!"
-                    }
-                elif effect_id == 1:  # Skip next break
-                    mystery_effect = {
-                        "type": "skip_break",
-                        "description": "Next break will be skipped!"
-                    }
-                elif effect_id == 2:  # Double points on next session
-                    mystery_effect = {
-                        "type": "double_points",
-                        "description": "Double points on your next session!"
-                    }
-                elif effect_id == 3:  # Mirror mode
-                    # Find partner's last completed session
-                    partner = "luu" if user == "4keni" else "4keni"
-                    partner_sessions = [s for s in data["users"][partner]["sessions"] if s.get("completed", False)]
-                    partner_session = partner_sessions[-1] if partner_sessions else None
-                    
-                    if partner_session:
-                        # Get animal type name
-                        animal_type = CHICKEN_TYPES[partner_session["tier"]]["label"]
-                        mystery_effect = {
-                            "type": "mirror_mode",
-                            "description": f"Revealed {partner}'s last task: {partner_session['task_name']} ({animal_type})"
-                        }
-                    else:
-                        mystery_effect = {
-                            "type": "bonus_point",
-                            "description": "+1 bonus point (partner has no tasks yet)"
-                        }
-                        data["users"][user]["points"] += 1
-                elif effect_id == 4:  # Next tier upgrade without penalty
-                    mystery_effect = {
-                        "type": "tier_upgrade",
-                        "description": "Your next session can be upgraded one tier without additional time!"
-                    }
-                elif effect_id == 5:  # Combo extender
-                    mystery_effect = {
-                        "type": "combo_extender",
-                        "description": "Your momentum multiplier will persist even if you reset your next session!"
-                    }
-                elif effect_id == 6:  # Dual challenge
+                if partner_session:
+                    # Get animal type name
+                    animal_type = CHICKEN_TYPES[partner_session["tier"]]["label"]
                     mystery_effect = {
-                        "type": "dual_challenge",
-                        "description": "Complete two sessions in a row for a 3-point bonus!"
+                        "type": "mirror_mode",
+                        "description": f"Revealed {partner}'s last task: {partner_session['task_name']} ({animal_type})"
                     }
-                elif effect_id == 7:  # Theme swap
-                    partner = "luu" if user == "4keni" else "4keni"
+                else:
                     mystery_effect = {
-                        "type": "theme_swap",
-                        "description": f"You can use {partner}'s theme for one day!"
+                        "type": "bonus_point",
+                        "description": "+1 bonus point (partner has no tasks yet)"
                     }
-                    # Add the partner's theme to unlocked themes temporarily
-                    partner_theme = f"{partner}_theme"
-                    if partner_theme not in data["users"][user]["stats"]["unlocked_themes"]:
-                        data["users"][user]["stats"]["unlocked_themes"].append(partner_theme)
-                        data["users"][user]["stats"]["temp_theme_unlock_date"] = today
-                
-                # Store the effect information
-                data["users"][user]["stats"]["mystery_egg_effect"] = mystery_effect["type"]
-                if mystery_effect["type"] == "double_points":
-                    # Mark next session as the target for double points
-                    data["users"][user]["stats"]["mystery_egg_target_session"] = None
-                
-                # Send the mystery egg event
-                socketio.emit('mystery_egg_activated', {
-                    'user': user,
-                    'effect': mystery_effect
-                })
+                    data["users"][user]["points"] += 1
+            elif effect_id == 4:  # Next tier upgrade without penalty
+                mystery_effect = {
+                    "type": "tier_upgrade",
+                    "description": "Your next session can be upgraded one tier without additional time!"
+                }
+            elif effect_id == 5:  # Combo extender
+                mystery_effect = {
+                    "type": "combo_extender",
+                    "description": "Your momentum multiplier will persist even if you reset your next session!"
+                }
+            elif effect_id == 6:  # Dual challenge
+                mystery_effect = {
+                    "type": "dual_challenge",
+                    "description": "Complete two sessions in a row for a 3-point bonus!"
+                }
+            elif effect_id == 7:  # Theme swap
+                partner = "luu" if user == "4keni" else "4keni"
+                mystery_effect = {
+                    "type": "theme_swap",
+                    "description": f"You can use {partner}'s theme for one day!"
+                }
+                # Add the partner's theme to unlocked themes temporarily
+                partner_theme = f"{partner}_theme"
+                if partner_theme not in data["users"][user]["stats"]["unlocked_themes"]:
+                    data["users"][user]["stats"]["unlocked_themes"].append(partner_theme)
+                    data["users"][user]["stats"]["temp_theme_unlock_date"] = today
+            
+            # Store the effect information
+            data["users"][user]["stats"]["mystery_egg_effect"] = mystery_effect["type"]
+            data_store.record('mystery_egg', user=user, effect=mystery_effect["type"])
+            if mystery_effect["type"] == "double_points":
+                # Mark next session as the target for double points
+                data["users"][user]["stats"]["mystery_egg_target_session"] = None
             
-            # Check for Duel completion if this session was part of a duel
+            # Send the mystery egg event
+            emit_to_user(user, 'mystery_egg_activated', {
+                'user': user,
+                'effect': mystery_effect
+            })
+        
+        # Check for Duel completion if this session was part of a duel
+        # Only the players' start_chicken adds duels, and it holds this lane, so checking needs no GLOBAL
+        in_duel = any(user in (duel["user1"], duel["user2"]) for duel in data.get("active_duels", []))
+        with lanes.hold(GLOBAL if in_duel else None):
             for duel in data.get("active_duels", [])[:]:  # Make a copy to allow removal
                 if duel["user1"] == user or duel["user2"] == user:
                     # This user completed their part of the duel
@@ -917,7 +1382,7 @@ def handle_timer_complete(json_data):
                         animal_type = CHICKEN_TYPES[duel["tier"]]["label"]
                         
                         # Emit duel result event
-                        socketio.emit('duel_complete', {
+                        emit_to_pair(user, 'duel_complete', {
                             'winner': winner,
                             'loser': loser,
                             'tier': duel["tier"],
@@ -926,138 +1391,93 @@ def handle_timer_complete(json_data):
                         
                         # Remove the completed duel
                         data["active_duels"].remove(duel)
+                        data_store.record('duel_completed', duel=duel["id"], winner=winner, loser=loser)
                     
                     # Only one user has completed so far, just save the state
                     break
+        
+        # Check for achievements (Focus Flex Moments)
+        achievements = achievement_engine.publish(
+            data, user, 'session_completed', tier=active_session["tier"],
+            day=session_index.started_at(data, user, active_session).date())
+        
+        # Emit achievements if any were earned
+        if achievements:
+            emit_to_user(user, 'achievements_earned', {
+                'user': user,
+                'achievements': achievements
+            })
             
-            # Check for achievements (Focus Flex Moments)
-            achievements = []
-            
-            # Achievement: 5 sessions in a week
-            if data["users"][user]["stats"]["weekly_chickens"] == 5 and "weekly_5_chickens" not in data["users"][user]["stats"]["achievements"]:
-                achievements.append({
-                    "id": "weekly_5_chickens",
-                    "title": "WeekWarrior",
-                    "description": "Completed 5 sessions in a week"
-                })
-                data["users"][user]["stats"]["achievements"].append("weekly_5_chickens")
-            
-            # Achievement: 3 high tier sessions in a row (Cow or Horse)
-            if streak >= 3:
-                last_three = data["users"][user]["sessions"][-3:]
-                if all(s["tier"] >= 5 for s in last_three) and "three_tier3_streak" not in data["users"][user]["stats"]["achievements"]:
-                    achievements.append({
-                        "id": "three_tier3_streak",
-                        "title": "Boss Mode",
-                        "description": "Completed 3 high-tier sessions (Cow/Horse) in a row"
-                    })
-                    data["users"][user]["stats"]["achievements"].append("three_tier3_streak")
-            
-            # Achievement: Gold unlock (20 lifetime high-tier sessions)
-            if data["users"][user]["stats"]["lifetime_tier3_count"] == 20 and "gold_chicken" not in data["users"][user]["stats"]["unlocked_skins"]:
-                data["users"][user]["stats"]["unlocked_skins"].append("gold_chicken")
-                achievements.append({
-                    "id": "gold_chicken_unlock",
-                    "title": "Gold Standard",
-                    "description": "Unlocked Gold skin"
-                })
-            
-            # Emit achievements if any were earned
-            if achievements:
-                socketio.emit('achievements_earned', {
-                    'user': user,
-                    'achievements': achievements
-                })
-                
-                # Send flex notification to the partner
-                partner = "luu" if user == "4keni" else "4keni"
-                flex_message = f"{user} just earned: {', '.join(a['title'] for a in achievements)}"
-                
-                socketio.emit('focus_flex', {
-                    'user': user,
-                    'partner': partner,
-                    'message': flex_message
-                })
+            # Send flex notification to the partner
+            partner = "luu" if user == "4keni" else "4keni"
+            flex_message = f"{user} just earned: {', '.join(a['title'] for a in achievements)}"
             
+            emit_to_pair(user, 'focus_flex', {
+                'user': user,
+                'partner': partner,
+                'message': flex_message
+            })
+        
+        save_data(data)
+        
+        # Determine if user should skip break (mystery egg effect)
+        skip_break = False
+        if data["users"][user]["stats"].get("mystery_egg_effect") == "skip_break":
+            skip_break = True
+            # Clear the effect after it's used
+            data["users"][user]["stats"]["mystery_egg_effect"] = None
             save_data(data)
+        
+        if not skip_break:
+            # Start a break timer (5 minutes)
+            break_duration = 5 * 60  # 5 minutes in seconds
+            emit_to_pair(user, 'break_started', {'user': user})
             
-            # Determine if user should skip break (mystery egg effect)
-            skip_break = False
-            if data["users"][user]["stats"].get("mystery_egg_effect") == "skip_break":
-                skip_break = True
-                # Clear the effect after it's used
-                data["users"][user]["stats"]["mystery_egg_effect"] = None
-                save_data(data)
-            
-            if not skip_break:
-                # Start a break timer (5 minutes)
-                break_duration = 5 * 60  # 5 minutes in seconds
-                socketio.emit('break_started', {'user': user})
-                
-                timer_thread = threading.Thread(target=timer_worker, args=(user, break_duration, True))
-                timer_thread.daemon = True
-                timer_thread.start()
-            else:
-                # Skip break and reset timer directly
-                socketio.emit('break_skipped', {'user': user})
-                socketio.emit('timer_reset', {'user': user})
-            
-            # Calculate updated data
-            for u in USERS:
-                points = calculate_points(u, data)
-                data["users"][u]["current_points"] = points
-                
-                # Get today's sessions
-                sessions_today = len([s for s in data["users"][u]["sessions"] 
-                                   if datetime.datetime.fromisoformat(s["timestamp"]).date() == datetime.date.today()])
-                data["users"][u]["sessions_today"] = sessions_today
-            
-            # Calculate days remaining
-            cycle_start = datetime.datetime.fromisoformat(data["cycle_start"])
-            days_remaining = 7 - (datetime.datetime.now() - cycle_start).days
-            data["days_remaining"] = max(0, days_remaining)
-            
-            # Send a full update to all clients
-            socketio.emit('full_update', data)
-            
-            # Emit session_complete event
-            socketio.emit('session_complete', {'user': user})
-
-            # Add animal to inventory in animals.json with barn and name
-            try:
-                with open('data/animals.json', 'r') as f:
-                    animals_data = json.load(f)
-            except Exception:
-                animals_data = {u: {"inventory": [], "cash": 0} for u in USERS}
+            start_user_timer(user, break_duration, is_break=True)
+        else:
+            # Skip break and reset timer directly
+            emit_to_user(user, 'break_skipped', {'user': user})
+            emit_to_pair(user, 'timer_reset', {'user': user})
+        
+        # Send the state changes to all clients
+        broadcast_state()
+        
+        # Emit session_complete event
+        emit_to_pair(user, 'session_complete', {'user': user})
+
+        # Add animal to inventory in animals.json with barn and name
+        animals_data = load_animals()
+        animal_to_add = dict(active_session["animal"]) if active_session.get("animal") else None
+        if animal_to_add:
+            animals_data.setdefault(user, {"inventory": [], "cash": 0})
+            # Add barn and name information to the animal
+            animal_to_add.update({
+                "barn_id": active_session.get("barn_id", "default"),
+                "name": active_session.get("chicken_name", ""),
+                "timestamp": datetime.datetime.now().isoformat()
+            })
+            animals_data[user]["inventory"].append(animal_to_add)
+            save_animals(animals_data)
                 
-            animal_to_add = active_session.get("animal")
-            if animal_to_add:
-                animals_data.setdefault(user, {"inventory": [], "cash": 0})
-                # Add barn and name information to the animal
-                animal_to_add.update({
-                    "barn_id": active_session.get("barn_id", "default"),
-                    "name": active_session.get("chicken_name", ""),
-                    "timestamp": datetime.datetime.now().isoformat()
-                })
-                animals_data[user]["inventory"].append(animal_to_add)
-                with open('data/animals.json', 'w') as f:
-                    json.dump(animals_data, f, indent=2)
-                    
-            # Clear current session
-            current_sessions[user] = None
-    except Exception as e:
-        print(f"Error in timer_complete: {str(e)}")
-        emit('error', {'message': f'Error completing timer: {str(e)}'})
+        # Clear current session
+        current_sessions[user] = None
 
 @socketio.on('end_cycle')
+@metrics.instrumented('socket', 'end_cycle')
 def handle_end_cycle():
-    data = load_data()
-    data = end_cycle(data)
-    save_data(data)
+    with lanes.hold(GLOBAL, *USERS):
+        data = load_data()
+        data = end_cycle(data)
+        save_data(data)
     
-    # Emit full data update to all clients
-    socketio.emit('full_update', data)
-    socketio.emit('cycle_ended', {'winner': data["winner"]})
+    # Emit the state changes to all clients
+    broadcast_state()
+    emit_to_pair(USERS[0], 'cycle_ended', {'winner': data["winner"]})
+
+def cycle_expired(data):
+    """True once the current 7-day cycle has run out."""
+    cycle_start = datetime.datetime.fromisoformat(data["cycle_start"])
+    return (datetime.datetime.now() - cycle_start).days >= 7
 
 def end_cycle(data):
     """End the current 7-day cycle and determine winner"""
@@ -1086,64 +1506,21 @@ def end_cycle(data):
             winner = "Tie"
     
     # Archive cycle data
-    cycle_archive = {
+    cycle_archive_summary = {
         "start_date": data["cycle_start"],
         "end_date": datetime.datetime.now().isoformat(),
         "results": cycle_results,
         "winner": winner
     }
     
-    # Add cycle archive to data
-    data.setdefault("cycle_history", []).append(cycle_archive)
-    
     # Create achievements based on cycle results
     for user in USERS:
-        user_achievements = []
-        
-        # Achievement: Won a cycle
-        if winner == user and "cycle_winner" not in data["users"][user]["stats"]["achievements"]:
-            data["users"][user]["stats"]["achievements"].append("cycle_winner")
-            user_achievements.append({
-                "id": "cycle_winner",
-                "title": "Cycle Champion",
-                "description": "Won a full 7-day cycle"
-            })
-        
-        # Achievement: Tier 3 Master (completed at least 5 tier 3 chickens in a week)
-        if cycle_results[user]["tier3_count"] >= 5 and "tier3_master" not in data["users"][user]["stats"]["achievements"]:
-            data["users"][user]["stats"]["achievements"].append("tier3_master")
-            user_achievements.append({
-                "id": "tier3_master",
-                "title": "Tier 3 Master",
-                "description": "Completed 5+ Tier 3 chickens in a single cycle"
-            })
-        
-        # Achievement: Perfect Week (completed at least 5 chickens on 5 different days)
-        sessions_by_day = {}
-        for session in data["users"][user]["sessions"]:
-            if session.get("completed", False):
-                day = datetime.datetime.fromisoformat(session["timestamp"]).date().isoformat()
-                sessions_by_day.setdefault(day, 0)
-                sessions_by_day[day] += 1
-        
-        days_with_5_chickens = sum(1 for count in sessions_by_day.values() if count >= 5)
-        
-        if days_with_5_chickens >= 5 and "perfect_week" not in data["users"][user]["stats"]["achievements"]:
-            data["users"][user]["stats"]["achievements"].append("perfect_week")
-            user_achievements.append({
-                "id": "perfect_week",
-                "title": "Perfect Week",
-                "description": "Completed 5+ chickens on 5+ days in a single cycle"
-            })
-            
-            # Unlock special theme for Perfect Week achievement
-            special_theme = "perfect_week_theme"
-            if special_theme not in data["users"][user]["stats"]["unlocked_themes"]:
-                data["users"][user]["stats"]["unlocked_themes"].append(special_theme)
+        user_achievements = achievement_engine.publish(data, user, 'cycle_ended', winner=winner,
+                                                       tier3_count=cycle_results[user]["tier3_count"])
         
         # Emit achievements if any were earned
         if user_achievements:
-            socketio.emit('achievements_earned', {
+            emit_to_user(user, 'achievements_earned', {
                 'user': user,
                 'achievements': user_achievements
             })
@@ -1159,56 +1536,88 @@ def end_cycle(data):
         data["users"][user]["stats"]["streak"] = 0
         data["users"][user]["stats"]["momentum_multiplier"] = 1.0
     
-    # Keep sessions from this week as historical data, but reset active state
-    # Optionally, you could archive old sessions to a separate data structure
+    # Move this cycle's finished sessions out of the live document
+    archive_cycle(data, cycle_archive_summary)
     
     # Reset active duels
     data["active_duels"] = []
     
     return data
 
+def cycle_id_for(start_date):
+    """Archive id of the cycle that started at ``start_date``."""
+    return datetime.datetime.fromisoformat(start_date).strftime('%Y%m%d-%H%M%S')
+
+def archive_cycle(data, summary):
+    """Move completed and aborted sessions into the cycle's archive segment.
+
+    In-progress sessions stay in the document, and the bonus points of the
+    archived cycle are recorded in its results and reset.
+    """
+    # Summaries that used to accumulate in the document move to the archive index
+    legacy = data.pop("cycle_history", None)
+    if legacy:
+        cycle_archive.add_summaries([dict(c, id=cycle_id_for(c["start_date"])) for c in legacy])
+    archived = {}
+    for user in USERS:
+        sessions = data["users"][user]["sessions"]
+        archived[user] = [s for s in sessions if s.get("completed", False) or s.get("aborted", False)]
+        data["users"][user]["sessions"] = [s for s in sessions if not (s.get("completed", False) or s.get("aborted", False))]
+        data["users"][user]["points"] = 0
+    # The segment is written before the document is saved; if we crash in
+    # between, the next rollover rewrites the same cycle id
+    cycle_archive.archive(cycle_id_for(summary["start_date"]), summary, archived)
+    data_store.record('cycle_ended', cycle=cycle_id_for(summary["start_date"]), winner=summary["winner"])
+
 @socketio.on('start_chaos_chicken')
+@metrics.instrumented('socket', 'start_chaos_chicken')
+@lanes.serialized()
 def handle_start_chaos_chicken(json_data):
     user = json_data.get('user')
     current_user = json_data.get('current_user')
     
     # Check that user is only controlling their own side
     if user != current_user:
-        print(f"Error: User {current_user} tried to control {user}'s timer")
+        logger.warning("User %s tried to control %s's timer", current_user, user)
         emit('error', {'message': f'You can only control your own timer'})
         return
     
-    try:
-        data = load_data()
-        
-        # Check if chaos chicken is offered to this user
-        if not data["weekly_chaos_chicken"]["offered"] or data["weekly_chaos_chicken"]["offered_to"] != user:
-            emit('error', {'message': 'No chaos chicken challenge available for you'})
-            return
-        
-        # Get challenge data
-        challenge_type = data["weekly_chaos_chicken"]["challenge_type"]
-        challenge_params = data["weekly_chaos_chicken"]["challenge_params"]
-        
-        # Mark that the user has accepted the challenge
-        data["weekly_chaos_chicken"]["accepted"] = True
-        data["weekly_chaos_chicken"]["accepted_date"] = datetime.datetime.now().isoformat()
-        
-        # Save the updated data
-        save_data(data)
-        
-        # Emit an event to let the user know the challenge has begun
-        socketio.emit('chaos_chicken_started', {
-            'user': user,
-            'challenge_type': challenge_type,
-            'challenge_params': challenge_params
-        })
-        
-    except Exception as e:
-        print(f"Error in start_chaos_chicken: {str(e)}")
-        emit('error', {'message': f'Error starting chaos chicken: {str(e)}'})
+    # Every accepted call reads and writes weekly_chaos_chicken
+    with lanes.hold(GLOBAL):
+        try:
+            data = load_data()
+            
+            # Check if chaos chicken is offered to this user
+            if not data["weekly_chaos_chicken"]["offered"] or data["weekly_chaos_chicken"]["offered_to"] != user:
+                emit('error', {'message': 'No chaos chicken challenge available for you'})
+                return
+            
+            # Get challenge data
+            challenge_type = data["weekly_chaos_chicken"]["challenge_type"]
+            challenge_params = data["weekly_chaos_chicken"]["challenge_params"]
+            
+            # Mark that the user has accepted the challenge
+            data["weekly_chaos_chicken"]["accepted"] = True
+            data["weekly_chaos_chicken"]["accepted_date"] = datetime.datetime.now().isoformat()
+            data_store.record('chaos_chicken_accepted', user=user, challenge=challenge_type)
+            
+            # Save the updated data
+            save_data(data)
+            
+            # Emit an event to let the user know the challenge has begun
+            emit_to_pair(user, 'chaos_chicken_started', {
+                'user': user,
+                'challenge_type': challenge_type,
+                'challenge_params': challenge_params
+            })
+            
+        except Exception as e:
+            logger.error("Error in start_chaos_chicken: %s", e, exc_info=True)
+            emit('error', {'message': f'Error starting chaos chicken: {str(e)}'})
 
 @socketio.on('complete_chaos_chicken')
+@metrics.instrumented('socket', 'complete_chaos_chicken')
+@lanes.serialized()
 def handle_complete_chaos_chicken(json_data):
     user = json_data.get('user')
     current_user = json_data.get('current_user')
@@ -1216,129 +1625,200 @@ def handle_complete_chaos_chicken(json_data):
     
     # Check that user is only controlling their own side
     if user != current_user:
-        print(f"Error: User {current_user} tried to control {user}'s timer")
+        logger.warning("User %s tried to control %s's timer", current_user, user)
         emit('error', {'message': f'You can only control your own timer'})
         return
     
-    try:
-        data = load_data()
-        
-        # Check if chaos chicken is active for this user
-        if not data["weekly_chaos_chicken"].get("accepted", False) or data["weekly_chaos_chicken"]["offered_to"] != user:
-            emit('error', {'message': 'No active chaos chicken challenge'})
-            return
-        
-        # Mark the challenge as completed
-        data["weekly_chaos_chicken"]["completed"] = success
-        data["weekly_chaos_chicken"]["completion_date"] = datetime.datetime.now().isoformat()
-        data["weekly_chaos_chicken"]["completed_by"] = user
-        
-        # Award points if successful
-        if success:
-            # Award 5 bonus points for completing the chaos chicken
-            data["users"][user]["points"] += 5
+    # Every accepted call reads and writes weekly_chaos_chicken
+    with lanes.hold(GLOBAL):
+        try:
+            data = load_data()
             
-            # Create a special achievement
-            achievement = {
-                "id": f"chaos_chicken_{data['weekly_chaos_chicken']['challenge_type']}",
-                "title": "Chaos Conqueror",
-                "description": f"Completed the {data['weekly_chaos_chicken']['challenge_type']} chaos chicken challenge!"
-            }
+            # Check if chaos chicken is active for this user
+            if not data["weekly_chaos_chicken"].get("accepted", False) or data["weekly_chaos_chicken"]["offered_to"] != user:
+                emit('error', {'message': 'No active chaos chicken challenge'})
+                return
             
-            # Add to user's achievements if not already there
-            if achievement["id"] not in data["users"][user]["stats"]["achievements"]:
-                data["users"][user]["stats"]["achievements"].append(achievement["id"])
-                
+            # Mark the challenge as completed
+            data["weekly_chaos_chicken"]["completed"] = success
+            data["weekly_chaos_chicken"]["completion_date"] = datetime.datetime.now().isoformat()
+            data["weekly_chaos_chicken"]["completed_by"] = user
+            data_store.record('chaos_chicken_completed', user=user, success=success)
+            
+            # Award points if successful
+            if success:
+                # Award 5 bonus points for completing the chaos chicken
+                data["users"][user]["points"] += 5
+            
+            # Create a special achievement (once per challenge type)
+            achievements = achievement_engine.publish(data, user, 'chaos_completed', success=success,
+                                                      challenge_type=data['weekly_chaos_chicken']['challenge_type'])
+            if achievements:
                 # Emit achievement notification
-                socketio.emit('achievements_earned', {
+                emit_to_user(user, 'achievements_earned', {
                     'user': user,
-                    'achievements': [achievement]
+                    'achievements': achievements
                 })
                 
                 # Send flex notification to the partner
                 partner = "luu" if user == "4keni" else "4keni"
                 flex_message = f"{user} just conquered the chaos chicken challenge!"
                 
-                socketio.emit('focus_flex', {
+                emit_to_pair(user, 'focus_flex', {
                     'user': user,
                     'partner': partner,
                     'message': flex_message
                 })
-        
-        # Reset the weekly chaos chicken
-        data["weekly_chaos_chicken"]["offered"] = False
-        data["weekly_chaos_chicken"]["accepted"] = False
-        
-        # Save the updated data
-        save_data(data)
-        
-        # Emit a completion event
-        socketio.emit('chaos_chicken_completed', {
-            'user': user,
-            'success': success,
-            'points_earned': 5 if success else 0
-        })
-        
-    except Exception as e:
-        print(f"Error in complete_chaos_chicken: {str(e)}")
-        emit('error', {'message': f'Error completing chaos chicken: {str(e)}'})
+            
+            # Reset the weekly chaos chicken
+            data["weekly_chaos_chicken"]["offered"] = False
+            data["weekly_chaos_chicken"]["accepted"] = False
+            
+            # Save the updated data
+            save_data(data)
+            
+            # Emit a completion event
+            emit_to_pair(user, 'chaos_chicken_completed', {
+                'user': user,
+                'success': success,
+                'points_earned': 5 if success else 0
+            })
+            
+        except Exception as e:
+            logger.error("Error in complete_chaos_chicken: %s", e, exc_info=True)
+            emit('error', {'message': f'Error completing chaos chicken: {str(e)}'})
+
+@app.route('/api/cycles')
+@metrics.instrumented('http')
+def api_cycles():
+    """Summaries of archived cycles, newest first."""
+    return jsonify(list(reversed(cycle_archive.cycles())))
+
+@app.route('/api/cycles/<cycle_id>')
+@metrics.instrumented('http')
+def api_cycle(cycle_id):
+    """One archived cycle with its sessions (``?user=`` for a single user's)."""
+    segment = cycle_archive.load(cycle_id)
+    if segment is None:
+        return jsonify({"error": "Unknown cycle"}), 404
+    user = request.args.get('user')
+    if user and segment["sessions"] is not None:
+        segment = dict(segment, sessions={user: segment["sessions"].get(user, [])})
+    return jsonify(segment)
+
+@app.route('/api/events')
+@metrics.instrumented('http')
+def api_events():
+    """Recorded game events after ``?since=<seq>``, oldest first.
+
+    ``?type=a,b`` and ``?user=`` filter them and ``?limit=`` caps the page;
+    pass the returned ``next_since`` to continue.
+    """
+    since = request.args.get('since', 0, type=int)
+    types = set(request.args['type'].split(',')) if request.args.get('type') else None
+    user = request.args.get('user')
+    limit = max(1, min(request.args.get('limit', 200, type=int), 1000))
+    events = []
+    for event in data_events.events(types, since):
+        if user and event.get('user') != user and user not in event.get('users', ()):
+            continue
+        # Stop between records, so next_since does not skip the rest of one
+        if len(events) >= limit and event['seq'] != events[-1]['seq']:
+            break
+        events.append(event)
+    return jsonify({"events": events, "next_since": events[-1]['seq'] if events else since})
+
+def available_animals_with_prices():
+    """The raisable animals with each one's current market price."""
+    market_engine.advance()
+    latest = market_engine.latest()
+    animals = get_available_animals()
+    for animal in animals:
+        animal['price'] = round(latest[animal['name']], 2)
+    return animals
 
 @app.route('/api/available_animals')
+@metrics.instrumented('http')
 def api_available_animals():
-    return jsonify(get_available_animals())
+    return jsonify(available_animals_with_prices())
+
+USER_ANIMALS_PAGE_SIZE = 50
+
+def current_animal_of(user):
+    """The animal the user is raising right now (with barn and name), or None."""
+    session = current_sessions.get(user)
+    if not session or not session['animal']:
+        return None
+    current_animal = dict(session['animal'])
+    current_animal.update({
+        'barn_id': session.get('barn_id', 'default'),
+        'name': session.get('chicken_name', '')
+    })
+    return current_animal
+
+def user_animals_version(user, animals_data, barns, *page_args):
+    """ETag fragment covering everything ``user_animals_summary`` returns.
+
+    Built from the saved version of the animals document, so every worker
+    gives the same data the same ETag.
+    """
+    seq, size = inventory_index.version(animals_data, user)
+    if seq is None:
+        # Unsaved changes have no version yet: make sure nobody reuses this answer
+        seq = 'unsaved-' + uuid.uuid4().hex[:8]
+    extra = json.dumps([animals_data.get(user, {}).get('cash', 0), barns['users'].get(user, {}).get('barns', []),
+                        current_animal_of(user), datetime.date.today().isoformat(), page_args],
+                       sort_keys=True, default=str)
+    return '%s-%s-%s-%s' % (user, seq, size, hashlib.sha1(extra.encode()).hexdigest()[:16])
+
+def user_animals_summary(user, animals_data, barns, barn_id=None, cursor=None, limit=USER_ANIMALS_PAGE_SIZE):
+    """A user's cash, per-barn counts, current animal and one page of animals (newest first)."""
+    user_data = animals_data.get(user, {"inventory": [], "cash": 0})
+    user_barns = barns['users'].get(user, {"barns": []})
+    barn_ids = {barn['id'] for barn in user_barns['barns']}
+    page, next_cursor = inventory_index.page(animals_data, user, barn_ids, barn_id, cursor, limit)
+    counts = inventory_index.barn_counts(animals_data, user, barn_ids)
+    return {
+        "inventory": page,
+        "next_cursor": next_cursor,
+        "cash": user_data.get('cash', 0),
+        "today_count": inventory_index.count_on(animals_data, user, datetime.date.today()),
+        "current_animal": current_animal_of(user),
+        "barns": {barn['id']: {'barn_info': barn, 'count': counts.get(barn['id'], 0)}
+                  for barn in user_barns['barns']}
+    }
+
+def conditional_json(etag, build):
+    """Answer with 304 when the client has ``etag``, otherwise with ``build()`` as JSON."""
+    if request.if_none_match.contains(etag.strip('"')):
+        response = app.response_class(status=304)
+    else:
+        response = jsonify(build())
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 @app.route('/api/user_animals/<user>')
+@metrics.instrumented('http')
 def api_user_animals(user):
+    """One user's animals; see ``user_animals_summary``.
+
+    ``?barn=<id>`` limits the page to one barn and ``?cursor=`` continues
+    from the previous page's ``next_cursor``; ``?limit=`` sets the page size.
+    """
     try:
-        with open('data/animals.json', 'r') as f:
-            animals_data = json.load(f)
-        user_data = animals_data.get(user, {"inventory": [], "cash": 0})
-        
-        # Load barns data
+        animals_data = load_animals()
         barns = load_barns()
-        user_barns = barns['users'].get(user, {"barns": []})
-        
-        # Count animals raised today
-        today = datetime.date.today().isoformat()
-        today_count = sum(1 for a in user_data.get('inventory', []) if a.get('timestamp', '').startswith(today))
-        
-        # Get current animal (if any)
-        current_animal = None
-        if user in current_sessions and current_sessions[user]:
-            current_animal = current_sessions[user]['animal']
-            if current_animal:
-                current_animal.update({
-                    'barn_id': current_sessions[user].get('barn_id', 'default'),
-                    'name': current_sessions[user].get('chicken_name', '')
-                })
-        
-        # Organize animals by barn
-        animals_by_barn = {}
-        for barn in user_barns['barns']:
-            barn_id = barn['id']
-            animals_by_barn[barn_id] = {
-                'barn_info': barn,
-                'animals': []
-            }
-        
-        # Add animals to their respective barns
-        for animal in user_data.get('inventory', []):
-            barn_id = animal.get('barn_id', 'default')
-            if barn_id not in animals_by_barn:
-                # If barn was deleted, put animals in default barn
-                barn_id = 'default'
-            animals_by_barn[barn_id]['animals'].append(animal)
-        
-        return jsonify({
-            "inventory": user_data.get('inventory', []),
-            "cash": user_data.get('cash', 0),
-            "today_count": today_count,
-            "current_animal": current_animal,
-            "barns": animals_by_barn
-        })
+        barn_id = request.args.get('barn')
+        cursor = request.args.get('cursor', type=int)
+        limit = max(1, min(request.args.get('limit', USER_ANIMALS_PAGE_SIZE, type=int), 500))
+        # Everything the response depends on, so unchanged polls are answered with a 304
+        etag = '"animals-%s"' % user_animals_version(user, animals_data, barns, barn_id, cursor, limit)
+        return conditional_json(etag, lambda: user_animals_summary(user, animals_data, barns, barn_id, cursor, limit))
     except Exception as e:
         return jsonify({
             "inventory": [],
+            "next_cursor": None,
             "cash": 0,
             "today_count": 0,
             "current_animal": None,
@@ -1346,69 +1826,126 @@ def api_user_animals(user):
             "error": str(e)
         })
 
+@app.route('/api/dashboard')
+@metrics.instrumented('http')
+def api_dashboard():
+    """Barns, animal summaries and available animals for ``?users=a,b`` in one response.
+
+    Replaces the per-user /api/user_animals, /api/barns and
+    /api/available_animals requests the page made on every refresh.
+    """
+    users = [u for u in request.args.get('users', ','.join(USERS)).split(',') if u in USERS]
+    try:
+        animals_data = load_animals()
+        barns = load_barns()
+        versions = [user_animals_version(user, animals_data, barns) for user in users]
+        # No prices here (they change every market tick; see /api/available_animals),
+        # so the ETag only moves when the barns do
+        etag = '"dashboard-%s"' % '-'.join(versions)
+        return conditional_json(etag, lambda: {
+            "users": {user: user_animals_summary(user, animals_data, barns) for user in users},
+            "available_animals": get_available_animals()
+        })
+    except Exception as e:
+        return jsonify({"users": {}, "available_animals": [], "error": str(e)}), 500
+
 @app.route('/api/market_events')
+@metrics.instrumented('http')
 def api_market_events():
-    return jsonify(list(MARKET_EVENTS))
+    return jsonify(market_items_since(MARKET_EVENTS))
 
 @app.route('/api/market_feed')
+@metrics.instrumented('http')
 def api_market_feed():
-    return jsonify(list(MARKET_FEED))
+    return jsonify(market_items_since(MARKET_FEED))
 
-@app.route('/static/market_graph.png')
-def market_graph():
-    # Mock price data for each animal
+@socketio.on('join_market')
+@metrics.instrumented('socket', 'join_market')
+def handle_join_market():
+    join_room(encoded_room(MARKET_ROOM))
+
+@socketio.on('leave_market')
+@metrics.instrumented('socket', 'leave_market')
+def handle_leave_market():
+    leave_room(encoded_room(MARKET_ROOM))
+
+# The chart shows MARKET_CHART_POINTS prices, MARKET_CHART_STEP ticks apart
+MARKET_CHART_POINTS = 24
+MARKET_CHART_STEP = int(os.environ.get('MARKET_CHART_STEP', 6))
+MARKET_COLORS = {
+    'Chicken': '#FFD700',  # Gold
+    'Goat': '#8FBC8F',     # Dark Sea Green
+    'Sheep': '#87CEEB',    # Sky Blue
+    'Pig': '#FF69B4',      # Hot Pink
+    'Cow': '#A0522D',      # Sienna
+    'Horse': '#6A5ACD'     # Slate Blue
+}
+MARKET_EMOJIS = {
+    'Chicken': '🐔',
+    'Goat': '🐐',
+    'Sheep': '🐑',
+    'Pig': '🐖',
+    'Cow': '🐄',
+    'Horse': '🐎'
+}
+
+# Last rendered graph, keyed on (engine tick, event version)
+market_graph_cache = {'key': None, 'png': None}
+market_graph_lock = threading.Lock()
+market_graph_wakeup = threading.Event()
+# Chart data for client-side rendering, keyed the same way
+market_prices_cache = {'key': None, 'json': None, 'f32': None}
+
+def get_market_graph_key():
+    """Return (engine tick, event version) for the current market data."""
+    market_engine.advance()
+    return market_engine.tick, shared_state.get('market_version', 0)
+
+def get_event_marks():
+    """Return the latest chart-annotation event per animal."""
+    # EVENT_POINTS iterates newest first; keep the latest event per animal
+    event_marks = {}
+    for e in EVENT_POINTS:
+        event_marks.setdefault(e['animal'], e)
+    return event_marks
+
+def get_price_series():
+    """Recent prices per animal from the market engine, for the chart."""
+    history = market_engine.history(MARKET_CHART_POINTS, MARKET_CHART_STEP)
+    return dict(zip(market_engine.names, history))
+
+def pyplot():
+    """matplotlib.pyplot, imported on first use; only the opt-in PNG chart needs it."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+def render_market_graph(key):
+    """Render the market chart for ``key`` and return the PNG bytes."""
+    plt = pyplot()
     animals = get_available_animals()
-    n_points = 24
-    x = np.arange(n_points)
-    price_data = {}
-    event_marks = {e['animal']: e for e in EVENT_POINTS}
-    # Define colors and styles for each animal
-    colors = {
-        'Chicken': '#FFD700',  # Gold
-        'Goat': '#8FBC8F',     # Dark Sea Green
-        'Sheep': '#87CEEB',    # Sky Blue
-        'Pig': '#FF69B4',      # Hot Pink
-        'Cow': '#A0522D',      # Sienna
-        'Horse': '#6A5ACD'     # Slate Blue
-    }
-    emojis = {
-        'Chicken': '🐔',
-        'Goat': '🐐',
-        'Sheep': '🐑',
-        'Pig': '🐖',
-        'Cow': '🐄',
-        'Horse': '🐎'
-    }
-    # Generate price data with event effects
-    for animal in animals:
-        low, high = animal['base_price']
-        trend = np.linspace(low, high, n_points)
-        noise = np.random.normal(0, (high-low)*0.1, n_points)
-        seasonal = np.sin(np.linspace(0, 4*np.pi, n_points)) * (high-low)*0.05
-        prices = trend + noise + seasonal
-        # Apply event effect to last point if event is active
-        if animal['name'] in event_marks:
-            effect = event_marks[animal['name']]['effect']
-            prices[-1] = prices[-2] * (1 + effect)
-        prices = np.clip(prices, low, high)
-        price_data[animal['name']] = prices
+    event_marks = get_event_marks()
+    price_data = get_price_series()
+    x = list(range(len(next(iter(price_data.values())))))
     # Create figure with custom style
     plt.style.use('dark_background')
     fig, ax = plt.subplots(figsize=(10, 4), facecolor='#1a1a1a')
     # Plot each animal's price line and place emoji at the end
     for animal in animals:
         name = animal['name']
+        low, high = animal['base_price']
         y = price_data[name]
-        ax.plot(x, y, label=name, color=colors[name], linewidth=2, alpha=0.8)
+        ax.plot(x, y, label=name, color=MARKET_COLORS[name], linewidth=2, alpha=0.8)
         # Place emoji at the last point
-        ax.text(x[-1]+0.2, y[-1], emojis[name], fontsize=18, ha='left', va='center', fontweight='bold', fontname='Segoe UI Emoji')
+        ax.text(x[-1]+0.2, y[-1], MARKET_EMOJIS[name], fontsize=18, ha='left', va='center', fontweight='bold', fontname='Segoe UI Emoji')
         # If event, highlight last point
         if name in event_marks:
-            ax.scatter(x[-1], y[-1], s=180, color=colors[name], edgecolor='white', zorder=10)
-            ax.text(x[-1], y[-1]+(high-low)*0.08, f"{event_marks[name]['emoji']} {event_marks[name]['desc']}", color=colors[name], fontsize=10, ha='center', va='bottom', fontweight='bold', bbox=dict(facecolor='#222', edgecolor=colors[name], boxstyle='round,pad=0.2', alpha=0.8))
+            ax.scatter(x[-1], y[-1], s=180, color=MARKET_COLORS[name], edgecolor='white', zorder=10)
+            ax.text(x[-1], y[-1]+(high-low)*0.08, f"{event_marks[name]['emoji']} {event_marks[name]['desc']}", color=MARKET_COLORS[name], fontsize=10, ha='center', va='bottom', fontweight='bold', bbox=dict(facecolor='#222', edgecolor=MARKET_COLORS[name], boxstyle='round,pad=0.2', alpha=0.8))
     # Customize the plot
     ax.set_title('Animal Market Prices', color='white', pad=20, fontsize=14)
-    ax.set_xlabel('Hour', color='#999', labelpad=10)
+    ax.set_xlabel('Time', color='#999', labelpad=10)
     ax.set_ylabel('Price ($)', color='#999', labelpad=10)
     ax.grid(True, linestyle='--', alpha=0.2, color='#666')
     ax.spines['top'].set_visible(False)
@@ -1423,28 +1960,125 @@ def market_graph():
                       edgecolor='#333',
                       fontsize=10)
     plt.tight_layout()
-    # Save to static/market_graph.png with high DPI
-    out_path = os.path.join('static', 'market_graph.png')
-    plt.savefig(out_path, 
+    # Render into memory with high DPI
+    buf = io.BytesIO()
+    fig.savefig(buf,
+                format='png',
                 dpi=150,
                 bbox_inches='tight',
                 facecolor='#1a1a1a',
                 edgecolor='none',
                 transparent=False)
-    plt.close()
-    # Always serve with no-cache headers for live updates
-    response = send_file(out_path, mimetype='image/png')
-    response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
-    response.headers['Pragma'] = 'no-cache'
-    response.headers['Expires'] = '0'
+    plt.close(fig)
+    return buf.getvalue()
+
+def refresh_market_graph():
+    """Re-render the cached graph if the market data changed; return the cache entry."""
+    key = get_market_graph_key()
+    with market_graph_lock:
+        if market_graph_cache['key'] != key:
+            market_graph_cache['png'] = render_market_graph(key)
+            market_graph_cache['key'] = key
+        return dict(market_graph_cache)
+
+def get_market_prices(key=None):
+    """Return the chart data for ``key`` (default: current), cached per key."""
+    key = key or get_market_graph_key()
+    cached = dict(market_prices_cache)
+    if cached['key'] != key:
+        event_marks = get_event_marks()
+        price_data = get_price_series()
+        latest = market_engine.latest()
+        animals = get_available_animals()
+        payload = {
+            "version": "%s-%s" % key,
+            "points": len(next(iter(price_data.values()))),
+            "tick_seconds": MARKET_TICK_SECONDS * MARKET_CHART_STEP,
+            "animals": [{
+                "name": a['name'],
+                "color": MARKET_COLORS[a['name']],
+                "emoji": MARKET_EMOJIS[a['name']],
+                "low": a['base_price'][0],
+                "high": a['base_price'][1],
+                "latest": round(latest[a['name']], 2),
+                "prices": [round(float(p), 2) for p in price_data[a['name']]]
+            } for a in animals],
+            "events": list(event_marks.values())
+        }
+        f32 = b''.join(price_data[a['name']].astype('<f4').tobytes() for a in animals)
+        cached = {'key': key, 'json': payload, 'f32': f32}
+        market_prices_cache.update(cached)
+    return cached
+
+def market_graph_thread():
+    """Re-render the graph in the background whenever the market data changes."""
+    # Warm up: import matplotlib here rather than in the first request
+    pyplot()
+    while True:
+        # Wake on new market events, and at least once per price period
+        market_graph_wakeup.wait(timeout=MARKET_TICK_SECONDS * MARKET_CHART_STEP)
+        market_graph_wakeup.clear()
+        try:
+            refresh_market_graph()
+        except Exception:
+            logger.error("Market graph render failed", exc_info=True)
+
+# The server-rendered PNG is an opt-in fallback; clients draw /api/market_prices themselves
+MARKET_GRAPH_PNG = os.environ.get('MARKET_GRAPH_PNG', '').lower() in ('1', 'true', 'yes')
+
+@app.route('/api/market_prices')
+@metrics.instrumented('http')
+def api_market_prices():
+    """24-point price series per animal plus event annotations.
+
+    ``?format=f32`` returns the prices as a little-endian float32 matrix
+    (one row per animal, in X-Market-Animals order) instead of JSON.
+    """
+    cached = get_market_prices()
+    etag = '"prices-%s-%s"' % cached['key']
+    if request.if_none_match.contains(etag.strip('"')):
+        response = app.response_class(status=304)
+    elif request.args.get('format') == 'f32':
+        response = app.response_class(cached['f32'], mimetype='application/octet-stream')
+        response.headers['X-Market-Animals'] = ','.join(a['name'] for a in cached['json']['animals'])
+        response.headers['X-Market-Points'] = str(cached['json']['points'])
+    else:
+        response = jsonify(cached['json'])
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/static/market_graph.png')
+@metrics.instrumented('http')
+def market_graph():
+    if not MARKET_GRAPH_PNG:
+        return jsonify({"error": "Server-rendered graph is disabled; use /api/market_prices"}), 404
+    cached = dict(market_graph_cache)
+    if cached['png'] is None:
+        # First request: nothing to serve yet
+        cached = refresh_market_graph()
+    elif cached['key'] != get_market_graph_key():
+        # Serve the previous render while the background thread catches up
+        market_graph_wakeup.set()
+    etag = '"market-%s-%s"' % cached['key']
+    if request.if_none_match.contains(etag.strip('"')):
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(cached['png'], mimetype='image/png')
+    # Let clients revalidate cheaply instead of refetching the image
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = 'no-cache'
     return response
 
-# Start the event thread on app startup
-threading.Thread(target=market_event_thread, daemon=True).start()
+# System health monitoring. One Process object per worker, so cpu_percent
+# covers the time since the previous sample instead of always reading 0
+health_process = {'pid': None, 'process': None}
 
-# System health monitoring
 def get_system_health():
-    process = psutil.Process()
+    if health_process['pid'] != os.getpid():
+        # A forked worker must not reuse the parent's handle
+        health_process.update(pid=os.getpid(), process=psutil.Process())
+    process = health_process['process']
     memory_info = process.memory_info()
     return {
         'memory_usage': memory_info.rss / 1024 / 1024,  # MB
@@ -1453,13 +2087,15 @@ def get_system_health():
         'uptime': time.time() - process.create_time()
     }
 
-# Memory management
-def cleanup_memory():
-    gc.collect()
-    plt.close('all')  # Close any open matplotlib figures
+system_health = CachedSample(get_system_health, ttl=float(os.environ.get('HEALTH_SAMPLE_SECONDS', 10)))
+
+# Memory management: fewer inline collections, full ones on a background schedule
+memory_manager = MemoryManager(rss_limit_mb=int(os.environ.get('MEMORY_LIMIT_MB', 500)))
+memory_manager.install()
 
 # Add new routes for barn management
 @app.route('/api/barns/<user>')
+@metrics.instrumented('http')
 def api_user_barns(user):
     try:
         barns = load_barns()
@@ -1468,6 +2104,8 @@ def api_user_barns(user):
         return jsonify({"error": str(e)}), 500
 
 @socketio.on('create_barn')
+@metrics.instrumented('socket', 'create_barn')
+@lanes.serialized()
 def handle_create_barn(json_data):
     user = json_data.get('user')
     barn_name = json_data.get('name')
@@ -1492,7 +2130,7 @@ def handle_create_barn(json_data):
         save_barns(barns)
         
         # Notify all clients about the new barn
-        socketio.emit('barn_created', {
+        emit_to_pair(user, 'barn_created', {
             'user': user,
             'barn': {
                 "id": barn_id,
@@ -1505,6 +2143,8 @@ def handle_create_barn(json_data):
         emit('error', {'message': f'Error creating barn: {str(e)}'})
 
 @socketio.on('rename_barn')
+@metrics.instrumented('socket', 'rename_barn')
+@lanes.serialized()
 def handle_rename_barn(json_data):
     user = json_data.get('user')
     barn_id = json_data.get('barn_id')
@@ -1521,7 +2161,7 @@ def handle_rename_barn(json_data):
             if barn['id'] == barn_id:
                 barn['name'] = new_name
                 save_barns(barns)
-                socketio.emit('barn_renamed', {
+                emit_to_pair(user, 'barn_renamed', {
                     'user': user,
                     'barn_id': barn_id,
                     'new_name': new_name
@@ -1533,30 +2173,53 @@ def handle_rename_barn(json_data):
     except Exception as e:
         emit('error', {'message': f'Error renaming barn: {str(e)}'})
 
+# Threads do not survive a fork, so they are started per worker (gunicorn's
+# post_worker_init hook, or __main__ for the development server) rather than
+# when the module is imported
+background_threads_started = False
+
+def start_background_threads():
+    """Start the market, graph and memory threads for this process (once)."""
+    global background_threads_started
+    if background_threads_started:
+        return
+    background_threads_started = True
+    log_listener.start()  # no-op unless this is a freshly forked worker
+    threading.Thread(target=market_tick_thread, name="market-tick", daemon=True).start()
+    threading.Thread(target=fake_trade_thread, name="market-trades", daemon=True).start()
+    threading.Thread(target=market_event_thread, name="market-events", daemon=True).start()
+    if MARKET_GRAPH_PNG:
+        threading.Thread(target=market_graph_thread, name="market-graph", daemon=True).start()
+    memory_manager.start()
+
+# Startup allocations (modules, config, tables) never need collecting again
+memory_manager.freeze()
+
 if __name__ == '__main__':
     # Create data directory if it doesn't exist
     os.makedirs('data', exist_ok=True)
-    print("Data directory checked/created")
+    logger.info("Data directory checked/created")
     
     # Get port from environment variable (for Render.com) or use default
     port = int(os.environ.get('PORT', 5000))
-    print(f"Using port: {port}")
+    logger.info("Using port: %s", port)
     
     # Force development mode for local testing
     production_mode = False
-    print(f"RENDER env var: {os.environ.get('RENDER')}")
-    print(f"Production mode: {production_mode}")
+    logger.info("RENDER env var: %s", os.environ.get('RENDER'))
+    logger.info("Production mode: %s", production_mode)
     
     if production_mode:
         # Let gunicorn handle the app
-        print("Running in production mode")
+        logger.info("Running in production mode")
     else:
         # Development mode with debug enabled
-        print("Starting development server in verbose mode...")
+        logger.info("Starting development server in verbose mode...")
         # Explicitly set logger levels
         logging.getLogger('werkzeug').setLevel(logging.INFO)
         logging.getLogger('engineio').setLevel(logging.DEBUG)
         logging.getLogger('socketio').setLevel(logging.DEBUG)
         
         # Start server with eventlet
+        start_background_threads()
         socketio.run(app, host='0.0.0.0', port=port, debug=True, allow_unsafe_werkzeug=True) 
\ No newline at end of file
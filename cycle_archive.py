@@ -0,0 +1,94 @@
+"""Finished cycles, one immutable segment file each.
+
+``end_cycle`` moves a cycle's finished sessions out of the live document
+into ``<directory>/cycle-<id>.json``. ``index.json`` next to the segments
+lists every archived cycle's summary (dates, results, winner) so
+browsing history never has to open a segment. Segments are only read when
+a specific cycle is asked for, and the most recently used few are kept in
+memory.
+"""
+import os
+import json
+import threading
+from collections import OrderedDict
+
+from persistence import write_atomic
+
+
+class CycleArchive:
+    def __init__(self, directory, cache_size=4):
+        self.directory = directory
+        self.index_path = os.path.join(directory, 'index.json')
+        self.cache_size = cache_size
+        self._segments = OrderedDict()
+        self._index = None
+        self._index_mtime = None
+        self._lock = threading.Lock()
+
+    def segment_path(self, cycle_id):
+        return os.path.join(self.directory, f'cycle-{cycle_id}.json')
+
+    def archive(self, cycle_id, summary, sessions):
+        """Write the segment for ``cycle_id`` and add its summary to the index.
+
+        Rewriting a cycle that is already archived replaces it, so a
+        rollover interrupted before the live document was saved can simply
+        run again.
+        """
+        summary = dict(summary, id=cycle_id)
+        segment = dict(summary, sessions=sessions)
+        with self._lock:
+            write_atomic(self.segment_path(cycle_id), json.dumps(segment, default=str))
+            index = [c for c in self._read_index() if c['id'] != cycle_id]
+            index.append(summary)
+            write_atomic(self.index_path, json.dumps(index, default=str))
+            self._index = index
+            self._index_mtime = os.stat(self.index_path).st_mtime_ns
+            self._segments.pop(cycle_id, None)
+
+    def add_summaries(self, summaries):
+        """Index cycles that were never given a segment (legacy ``cycle_history``)."""
+        with self._lock:
+            index = self._read_index()
+            known = {c['id'] for c in index}
+            index.extend(s for s in summaries if s['id'] not in known)
+            write_atomic(self.index_path, json.dumps(index, default=str))
+            self._index = index
+            self._index_mtime = os.stat(self.index_path).st_mtime_ns
+
+    def cycles(self):
+        """Summaries of every archived cycle, oldest first."""
+        with self._lock:
+            return list(self._read_index())
+
+    def load(self, cycle_id):
+        """The full segment for ``cycle_id`` (with sessions), or None."""
+        with self._lock:
+            if cycle_id in self._segments:
+                self._segments.move_to_end(cycle_id)
+                return self._segments[cycle_id]
+            try:
+                with open(self.segment_path(cycle_id), 'r') as f:
+                    segment = json.load(f)
+            except FileNotFoundError:
+                # Legacy cycles only have a summary
+                segment = next((c for c in self._read_index() if c['id'] == cycle_id), None)
+                if segment is None:
+                    return None
+                segment = dict(segment, sessions=None)
+            self._segments[cycle_id] = segment
+            if len(self._segments) > self.cache_size:
+                self._segments.popitem(last=False)
+            return segment
+
+    def _read_index(self):
+        # Other workers may have archived a cycle; reread when the file changes
+        try:
+            mtime = os.stat(self.index_path).st_mtime_ns
+        except FileNotFoundError:
+            return []
+        if self._index is None or mtime != self._index_mtime:
+            with open(self.index_path, 'r') as f:
+                self._index = json.load(f)
+            self._index_mtime = mtime
+        return self._index
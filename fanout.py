@@ -0,0 +1,41 @@
+import threading
+
+
+class FanoutBatcher:
+    """Coalesce bursts of emits to the same room into one ``batch`` frame.
+
+    ``emit(event, payload, to)`` queues the event; ``window`` seconds after
+    the first queued event for a room, everything queued for that room is
+    sent as ``send('batch', [[event, payload], ...], to)``, in order. A
+    lone event is sent as itself. With ``window`` 0 every emit goes out
+    immediately, which is the default.
+    """
+
+    def __init__(self, send, window=0.0):
+        self.send = send
+        self.window = window
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def emit(self, event, payload, to=None):
+        if self.window <= 0:
+            self.send(event, payload, to)
+            return
+        with self._lock:
+            frames = self._pending.get(to)
+            if frames is None:
+                frames = self._pending[to] = []
+                timer = threading.Timer(self.window, self.flush, args=(to,))
+                timer.daemon = True
+                timer.start()
+            frames.append([event, payload])
+
+    def flush(self, to):
+        with self._lock:
+            frames = self._pending.pop(to, None)
+        if not frames:
+            return
+        if len(frames) == 1:
+            self.send(frames[0][0], frames[0][1], to)
+        else:
+            self.send('batch', frames, to)
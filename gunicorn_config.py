@@ -6,7 +6,14 @@ bind = "0.0.0.0:10000"
 backlog = 2048
 
 # Worker processes - reduced for better stability
-workers = 2  # Reduced from CPU count to prevent resource exhaustion
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))  # Reduced from CPU count to prevent resource exhaustion
+
+# Timers, market feed and market events must be shared between workers; default
+# to the SQLite backend when there is more than one. Emits also need a Socket.IO
+# message queue (SOCKETIO_MESSAGE_QUEUE=redis://...) to reach clients on other
+# workers, and the load balancer must keep each client on one worker.
+if workers > 1:
+    os.environ.setdefault('CHICFOCUS_SHARED_STATE', 'sqlite:///data/shared.db')
 worker_class = "eventlet"
 worker_connections = 1000
 timeout = 120
@@ -36,4 +43,10 @@ forwarded_allow_ips = '*'
 proxy_allow_ips = '*'
 graceful_timeout = 120
 websockets_ping_interval = 30  # Reduced ping frequency
-websockets_ping_timeout = 300  # Increased timeout 
\ No newline at end of file
+websockets_ping_timeout = 300  # Increased timeout 
+
+def post_worker_init(worker):
+    # preload_app imports the app once in the master; its background threads
+    # have to be started in each worker after the fork
+    from app import start_background_threads
+    start_background_threads()
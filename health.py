@@ -0,0 +1,50 @@
+import time
+import threading
+
+
+class Heartbeats:
+    """Last-seen times of background loops, for the readiness probe.
+
+    Each loop calls ``beat(name)`` once per iteration; ``check()`` reports
+    which ones have not been seen within their ``max_age``. Nothing here
+    does I/O, so probes can call it as often as they like.
+    """
+
+    def __init__(self):
+        self._max_age = {}
+        self._seen = {}
+
+    def register(self, name, max_age):
+        self._max_age[name] = max_age
+
+    def beat(self, name):
+        self._seen[name] = time.monotonic()
+
+    def check(self):
+        """``{name: {'age': seconds or None, 'ok': bool}}`` for every registered loop."""
+        now = time.monotonic()
+        report = {}
+        for name, max_age in self._max_age.items():
+            seen = self._seen.get(name)
+            age = None if seen is None else now - seen
+            report[name] = {'age': None if age is None else round(age, 1), 'ok': age is not None and age <= max_age}
+        return report
+
+
+class CachedSample:
+    """Call ``sample()`` at most once per ``ttl`` seconds and serve the cached result in between."""
+
+    def __init__(self, sample, ttl):
+        self.sample = sample
+        self.ttl = ttl
+        self._value = None
+        self._taken = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._taken is None or now - self._taken >= self.ttl:
+                self._value = self.sample()
+                self._taken = now
+            return dict(self._value, sampled_ago=round(now - self._taken, 1))
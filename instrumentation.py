@@ -0,0 +1,169 @@
+"""Latency histograms for handlers and hot sections, in Prometheus text format.
+
+    metrics = Metrics('chicfocus')
+
+    @app.route('/api/thing')
+    @metrics.instrumented('http')
+    def thing(): ...
+
+    with metrics.timer('load_data'):
+        ...
+
+Handlers are recorded as ``<prefix>_handler_seconds{kind, name}`` and
+sections as ``<prefix>_section_seconds{section}``, each with count, sum,
+errors and p50/p90/p99/p999 quantiles. Quantiles come from an HDR-style
+histogram: 16 linear sub-buckets per power of two of microseconds, so any
+reported value is within about 6% of the true one, whatever the range,
+and recording is a couple of integer operations.
+"""
+import json
+import time
+import functools
+import threading
+from contextlib import contextmanager
+
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+class Histogram:
+    """Log-linear histogram of durations (recorded in microseconds)."""
+
+    SUB_BITS = 4  # 2 ** 4 linear buckets per doubling
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0.0
+        self.errors = 0
+        self.max = 0.0
+
+    @classmethod
+    def bucket(cls, micros):
+        # Exact below 2 ** (SUB_BITS + 1); above, keep the top SUB_BITS + 1 bits
+        if micros < 2 << cls.SUB_BITS:
+            return micros
+        shift = micros.bit_length() - cls.SUB_BITS - 1
+        return (shift << cls.SUB_BITS) + (micros >> shift)
+
+    @classmethod
+    def upper_bound(cls, bucket):
+        """Largest value (microseconds) that lands in ``bucket``."""
+        if bucket < 2 << cls.SUB_BITS:
+            return bucket
+        shift = (bucket >> cls.SUB_BITS) - 1
+        mantissa = (bucket & ((1 << cls.SUB_BITS) - 1)) + (1 << cls.SUB_BITS)
+        return ((mantissa + 1) << shift) - 1
+
+    def record(self, seconds, error=False):
+        micros = int(seconds * 1e6)
+        index = self.bucket(micros)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        if error:
+            self.errors += 1
+
+    def quantile(self, q):
+        """Upper bound (seconds) of the bucket holding the ``q`` quantile."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self.upper_bound(index) / 1e6, self.max)
+        return self.max
+
+
+class Metrics:
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self._handlers = {}  # (kind, name) -> Histogram
+        self._sections = {}  # section -> Histogram
+        self._lock = threading.Lock()
+
+    def observe(self, table, key, seconds, error=False):
+        with self._lock:
+            histogram = table.get(key)
+            if histogram is None:
+                histogram = table[key] = Histogram()
+            histogram.record(seconds, error)
+
+    def instrumented(self, kind, name=None):
+        """Decorator recording the wrapped handler's latency and uncaught errors.
+
+        HTTP responses with a 5xx status also count as errors.
+        """
+        def decorator(handler):
+            key = (kind, name or handler.__name__)
+
+            @functools.wraps(handler)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                error = True
+                try:
+                    result = handler(*args, **kwargs)
+                    status = result[1] if isinstance(result, tuple) and len(result) > 1 else getattr(result, 'status_code', 200)
+                    error = isinstance(status, int) and status >= 500
+                    return result
+                finally:
+                    self.observe(self._handlers, key, time.perf_counter() - started, error)
+            return wrapper
+        return decorator
+
+    @contextmanager
+    def timer(self, section):
+        """Record the time spent in the block under ``section``."""
+        started = time.perf_counter()
+        error = True
+        try:
+            yield
+            error = False
+        finally:
+            self.observe(self._sections, section, time.perf_counter() - started, error)
+
+    def timed_json(self, section='json_encode'):
+        """A ``json``-like module whose ``dumps`` is timed (for Socket.IO's ``json=``)."""
+        metrics = self
+
+        class TimedJSON:
+            @staticmethod
+            def dumps(*args, **kwargs):
+                with metrics.timer(section):
+                    return json.dumps(*args, **kwargs)
+
+            loads = staticmethod(json.loads)
+        return TimedJSON
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            handlers = {key: self._snapshot(h) for key, h in self._handlers.items()}
+            sections = {key: self._snapshot(h) for key, h in self._sections.items()}
+        lines = []
+        self._render_family(lines, f'{self.prefix}_handler', 'Socket.IO handler and HTTP route latency',
+                            {'kind="%s",name="%s"' % key: h for key, h in sorted(handlers.items())})
+        self._render_family(lines, f'{self.prefix}_section', 'Time spent in instrumented sections',
+                            {'section="%s"' % key: h for key, h in sorted(sections.items())})
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _snapshot(histogram):
+        return {'count': histogram.count, 'sum': histogram.total, 'errors': histogram.errors,
+                'quantiles': [(q, histogram.quantile(q)) for q in QUANTILES]}
+
+    @staticmethod
+    def _render_family(lines, name, help_text, series):
+        lines.append(f'# HELP {name}_seconds {help_text}')
+        lines.append(f'# TYPE {name}_seconds summary')
+        for labels, h in series.items():
+            for q, value in h['quantiles']:
+                lines.append(f'{name}_seconds{{{labels},quantile="{q}"}} {value:.6f}')
+            lines.append(f'{name}_seconds_sum{{{labels}}} {h["sum"]:.6f}')
+            lines.append(f'{name}_seconds_count{{{labels}}} {h["count"]}')
+        lines.append(f'# HELP {name}_errors_total Calls that raised (or returned a 5xx)')
+        lines.append(f'# TYPE {name}_errors_total counter')
+        for labels, h in series.items():
+            lines.append(f'{name}_errors_total{{{labels}}} {h["errors"]}')
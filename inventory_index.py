@@ -0,0 +1,101 @@
+import heapq
+import bisect
+import itertools
+from collections import Counter, defaultdict
+
+
+def _newest_before(positions, end):
+    """Walk an ascending position list backwards from ``end`` (exclusive)."""
+    for i in range(bisect.bisect_left(positions, end) - 1, -1, -1):
+        yield positions[i]
+
+
+class _UserInventory:
+    """Index over one user's inventory list."""
+
+    def __init__(self, inventory):
+        self.inventory = inventory
+        self.size = 0
+        self.by_barn = defaultdict(list)   # barn_id -> positions, oldest first
+        self.barn_counts = Counter()
+        self.per_day = Counter()           # 'YYYY-MM-DD' -> animals raised that day
+
+    def add(self, animal):
+        pos = self.size
+        barn_id = animal.get('barn_id', 'default')
+        self.by_barn[barn_id].append(pos)
+        self.barn_counts[barn_id] += 1
+        self.per_day[animal.get('timestamp', '')[:10]] += 1
+        self.size += 1
+
+
+class InventoryIndex:
+    """Per-barn and per-day lookups over ``animals[user]["inventory"]``.
+
+    Animals are only ever appended, so the index follows the list by
+    indexing whatever was added since the last call; it is rebuilt when the
+    store loads a new document or folds in another process's changes
+    (``store.generation``). Animals whose barn no longer exists are counted
+    in the default barn, as the barn view has always shown them.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._doc = None
+        self._generation = None
+        self._users = {}
+
+    def _entry(self, animals, user):
+        if animals is not self._doc or self.store.generation != self._generation:
+            self._doc = animals
+            self._generation = self.store.generation
+            self._users = {}
+        inventory = animals.get(user, {}).get("inventory", [])
+        entry = self._users.get(user)
+        if entry is None or entry.inventory is not inventory or entry.size > len(inventory):
+            entry = self._users[user] = _UserInventory(inventory)
+        while entry.size < len(inventory):
+            entry.add(inventory[entry.size])
+        return entry
+
+    def version(self, animals, user):
+        """``(seq, size)``; changes whenever the user's inventory does.
+
+        ``seq`` is the store's saved version (see ``StateStore.version``), so
+        it is the same in every worker, or None while changes are unsaved.
+        """
+        return self.store.version(), self._entry(animals, user).size
+
+    def count_on(self, animals, user, day):
+        """Number of animals the user raised on ``day`` (a date)."""
+        return self._entry(animals, user).per_day[day.isoformat()]
+
+    def barn_counts(self, animals, user, barn_ids):
+        """``{barn_id: count}`` for ``barn_ids``; unknown barns count towards 'default'."""
+        entry = self._entry(animals, user)
+        counts = {barn_id: 0 for barn_id in barn_ids}
+        for barn_id, count in entry.barn_counts.items():
+            key = barn_id if barn_id in counts else 'default'
+            counts[key] = counts.get(key, 0) + count
+        return counts
+
+    def page(self, animals, user, barn_ids, barn_id=None, before=None, limit=50):
+        """Newest-first page of the user's animals, optionally only one barn.
+
+        ``before`` is the cursor returned with the previous page. Returns
+        ``(animals, next_cursor)``; ``next_cursor`` is None on the last page.
+        """
+        entry = self._entry(animals, user)
+        end = entry.size if before is None else min(before, entry.size)
+        if barn_id is None:
+            positions = range(end - 1, -1, -1)
+        else:
+            barns = [barn_id]
+            if barn_id == 'default':
+                barns += [b for b in entry.by_barn if b not in barn_ids]
+            positions = heapq.merge(*(_newest_before(entry.by_barn.get(b, []), end) for b in barns), reverse=True)
+        positions = list(itertools.islice(positions, limit + 1))
+        page = [entry.inventory[pos] for pos in positions[:limit]]
+        # The cursor is the position of the oldest animal shown
+        next_cursor = positions[limit - 1] if len(positions) > limit else None
+        return page, next_cursor
@@ -0,0 +1,124 @@
+import time
+import functools
+import threading
+from contextlib import contextmanager
+
+# Lane for structures shared between users (active_duels, weekly_chaos_chicken, the cycle)
+GLOBAL = 'global'
+
+
+class MutationLanes:
+    """Serialize state mutations per user, with one extra lane for shared state.
+
+    Handlers that load, mutate and save the documents hold the lanes for the
+    users they touch, so two events for the same user run one after the
+    other while other users' events proceed. GLOBAL is only taken around the
+    code that touches shared structures.
+
+    User lanes are acquired in sorted order and GLOBAL always last, which
+    rules out deadlocks: a handler holding user lanes may take GLOBAL later
+    (``with lanes.hold(GLOBAL)`` inside it), but must not take a new user
+    lane while holding GLOBAL. Lanes are reentrant, so a handler may call
+    helpers that take the same lanes again.
+
+    With a shared ``backend`` (several gunicorn workers) each lane is also a
+    lease in shared state, held from the outermost acquisition to the
+    outermost release; ``before_release()`` runs just before leases are
+    given up, so the next worker to take one sees the changes. Without a
+    shared backend the lanes only serialize handlers within this process.
+
+    ``users`` names the user lanes that exist; holding any other lane is an
+    error, so client-supplied names can't grow the lock table or the leases.
+    """
+
+    def __init__(self, backend=None, owner=None, ttl=30, poll=0.005, before_release=None, users=None):
+        self.backend = backend if backend is not None and backend.shared else None
+        self.users = frozenset(users) if users is not None else None
+        self.owner = owner
+        self.ttl = ttl
+        self.poll = poll
+        self.before_release = before_release
+        self._locks = {}
+        self._guard = threading.Lock()
+        self._held = threading.local()  # lane -> depth, per (green) thread
+
+    def _lock(self, lane):
+        with self._guard:
+            lock = self._locks.get(lane)
+            if lock is None:
+                lock = self._locks[lane] = threading.RLock()
+            return lock
+
+    @staticmethod
+    def order(lanes):
+        """Distinct lanes in acquisition order: users sorted, then GLOBAL."""
+        lanes = set(lane for lane in lanes if lane)
+        return sorted(lanes - {GLOBAL}) + ([GLOBAL] if GLOBAL in lanes else [])
+
+    @contextmanager
+    def hold(self, *lanes):
+        """Hold the given lanes (user names and/or GLOBAL) for the block."""
+        for lane in lanes:
+            if lane and lane != GLOBAL and self.users is not None and lane not in self.users:
+                raise ValueError(f"unknown lane {lane!r}")
+        depth = self._depth()
+        acquired = []
+        try:
+            for lane in self.order(lanes):
+                lock = self._lock(lane)
+                lock.acquire()
+                if depth.get(lane, 0) == 0 and self.backend is not None:
+                    try:
+                        self._lease(lane)
+                    except BaseException:
+                        lock.release()
+                        raise
+                depth[lane] = depth.get(lane, 0) + 1
+                acquired.append(lane)
+            yield
+        finally:
+            try:
+                if self.backend is not None and self.before_release and any(depth.get(lane) == 1 for lane in acquired):
+                    self.before_release()
+            finally:
+                for lane in reversed(acquired):
+                    depth[lane] -= 1
+                    if depth[lane] == 0:
+                        del depth[lane]
+                        if self.backend is not None:
+                            self.backend.release_lease('lane:' + lane, self.owner)
+                    self._lock(lane).release()
+
+    def held(self):
+        """Lanes the current (green) thread holds."""
+        return list(self._depth())
+
+    def _depth(self):
+        depth = getattr(self._held, 'depth', None)
+        if depth is None:
+            depth = self._held.depth = {}
+        return depth
+
+    def _lease(self, lane):
+        # The local lock already keeps this worker's other handlers out; wait for other workers
+        while not self.backend.acquire_lease('lane:' + lane, self.owner, self.ttl):
+            time.sleep(self.poll)
+
+    def serialized(self, *lanes, related=None):
+        """Decorator for handlers taking ``json_data``: hold its user's lane (and ``lanes``).
+
+        ``related(user)`` may name further lanes to hold, e.g. the partner's.
+        An unknown user gets no lane; the handler's own validation rejects it.
+        """
+        def decorator(handler):
+            @functools.wraps(handler)
+            def wrapper(*args, **kwargs):
+                json_data = args[0] if args else None
+                user = json_data.get('user') if isinstance(json_data, dict) else None
+                if not isinstance(user, str) or (self.users is not None and user not in self.users):
+                    user = None
+                extra = related(user) if related and user else ()
+                with self.hold(user, *extra, *lanes):
+                    return handler(*args, **kwargs)
+            return wrapper
+        return decorator
@@ -0,0 +1,121 @@
+"""Logging that never writes from the request path.
+
+Every logger feeds a ``QueueHandler``; one listener thread formats and
+writes the records: plain text to the console and JSON lines to a
+size-rotated file. Under eventlet the listener is a real OS thread (taken
+from ``eventlet.patcher.original``), so a slow disk or terminal stalls the
+listener, not the hub. Chatty loggers (the engine.io/socket.io packet
+logs) can be sampled down to one record in N below WARNING.
+"""
+import json
+import atexit
+import logging
+import logging.handlers
+
+try:
+    from eventlet import patcher
+    _queue = patcher.original('queue')
+    _threading = patcher.original('threading')
+except ImportError:
+    import queue as _queue
+    import threading as _threading
+
+# Attributes every LogRecord has; anything else came from ``extra=``
+_RECORD_FIELDS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, extras and traceback."""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S') + '.%03d' % record.msecs,
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'thread': record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Let through one record in ``every`` below WARNING; warnings and errors always pass."""
+
+    def __init__(self, every):
+        super().__init__()
+        self.every = max(1, int(every))
+        self._seen = 0
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        self._seen += 1
+        return (self._seen - 1) % self.every == 0
+
+
+class _Listener(logging.handlers.QueueListener):
+    # QueueListener would start a (green) thread from the patched threading module.
+    # Starting again is a no-op while the thread runs, and restarts it in a forked child.
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = _threading.Thread(target=self._monitor, name='log-listener', daemon=True)
+        self._thread.start()
+
+
+def parse_sampling(spec):
+    """``'engineio.server=100,socketio.server=10'`` -> ``{'engineio.server': 100, ...}``."""
+    rates = {}
+    for part in filter(None, (p.strip() for p in (spec or '').split(','))):
+        name, _, every = part.partition('=')
+        rates[name.strip()] = int(every)
+    return rates
+
+
+def setup_logging(level=logging.INFO, log_file='app.log', max_bytes=1024 * 1024, backup_count=5, sampling=None):
+    """Route all logging through a queue to a console handler and a rotating JSON file.
+
+    Returns the started listener; call ``stop()`` on it to flush at exit.
+    """
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    handlers = [console]
+    if log_file:
+        rotating = logging.handlers.RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count)
+        rotating.setFormatter(JsonFormatter())
+        handlers.append(rotating)
+    for handler in handlers:
+        # Only the listener thread uses these, so they get a real lock
+        handler.lock = _threading.RLock()
+
+    log_queue = _queue.Queue(-1)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level)
+
+    for name, every in (sampling or {}).items():
+        logging.getLogger(name).addFilter(SamplingFilter(every))
+
+    listener = _Listener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    # Write out whatever is still queued on a normal exit
+    atexit.register(lambda: listener._thread is not None and listener.stop())
+    return listener
+
+
+def logger_levels(names=()):
+    """``{logger: level name}`` for the root logger, ``names`` and every configured logger."""
+    loggers = {'root': logging.getLogger()}
+    loggers.update((name, logging.getLogger(name)) for name in names)
+    loggers.update((name, logger) for name, logger in logging.root.manager.loggerDict.items()
+                   if isinstance(logger, logging.Logger) and logger.level != logging.NOTSET)
+    return {name: logging.getLevelName(logger.level) for name, logger in sorted(loggers.items())}
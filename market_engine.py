@@ -0,0 +1,128 @@
+import time
+import threading
+
+import numpy as np
+
+
+class MarketEngine:
+    """Animal prices advanced on a fixed tick, with a rolling history.
+
+    Prices for all animals are updated together. Each tick draws one normal
+    variate per animal from ``default_rng([seed, tick])``, and the log price
+    is an exponentially weighted sum of the last ``memory`` draws (a truncated
+    AR(1) process), so the price at a tick depends only on the seed and the
+    tick number. Every worker computes the same series no matter when it
+    started, and nothing has to be shared between them.
+
+    Events are multiplicative shocks ``(1 + effect)`` on one animal for the
+    ticks in ``[start, end)``. An event that arrives after its start tick is
+    applied to the stored history as well.
+
+    History lives in a preallocated ``(animals, capacity)`` ring buffer.
+    ``latest()`` is O(1) and ``history()`` only copies the requested window.
+    """
+
+    def __init__(self, animals, tick_seconds=10.0, capacity=8640, seed=0, memory=128, persistence=0.97):
+        self.names = [a['name'] for a in animals]
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.tick_seconds = tick_seconds
+        self.capacity = capacity
+        self.seed = seed
+        self.low = np.array([a['base_price'][0] for a in animals], dtype=float)
+        self.high = np.array([a['base_price'][1] for a in animals], dtype=float)
+        self.mid = (self.low + self.high) / 2
+        # Scale the noise so one standard deviation spans about half the price range
+        spread = (self.high - self.low) / (self.high + self.low)
+        self.sigma = spread * np.sqrt(1 - persistence ** 2) / 2
+        self.memory = memory
+        self._powers = persistence ** np.arange(memory)
+        self._noise = np.zeros((memory, len(self.names)))
+        self._prices = np.zeros((len(self.names), capacity))
+        self._events = {}
+        self.tick = None  # last tick written to the buffer
+        self._lock = threading.Lock()
+
+    def current_tick(self, now=None):
+        return int((time.time() if now is None else now) // self.tick_seconds)
+
+    def advance(self, now=None):
+        """Compute every tick up to ``now``; returns the number of ticks written."""
+        target = self.current_tick(now)
+        with self._lock:
+            if self.tick is None:
+                # Cold start: warm up the noise window, then fill the whole buffer
+                first = target - self.capacity + 1
+                for t in range(first - self.memory, first):
+                    self._draw(t)
+                self.tick = first - 1
+            elif target - self.tick > self.capacity:
+                # Slept through more than the buffer holds; skip the gap
+                self.tick = target - self.capacity
+                for t in range(self.tick - self.memory + 1, self.tick + 1):
+                    self._draw(t)
+            written = 0
+            while self.tick < target:
+                self.tick += 1
+                self._prices[:, self.tick % self.capacity] = self._price_at(self.tick)
+                written += 1
+            if written:
+                self._prune()
+            return written
+
+    def add_event(self, event_id, animal, effect, start, end):
+        """Register a shock on ``animal`` for ticks ``[start, end)``; repeats are ignored."""
+        if animal not in self.index:
+            return False
+        with self._lock:
+            if event_id in self._events:
+                return False
+            row = self.index[animal]
+            self._events[event_id] = (row, 1 + effect, start, end)
+            if self.tick is not None:
+                # Ticks already written that fall inside the event get the shock too
+                first = max(start, self.tick - self.capacity + 1)
+                last = min(end, self.tick + 1)
+                if first < last:
+                    slots = np.arange(first, last) % self.capacity
+                    self._prices[row, slots] = self._clip(row, self._prices[row, slots] * (1 + effect))
+            self._prune()
+            return True
+
+    def latest(self):
+        """Return ``{animal: price}`` for the most recent tick."""
+        with self._lock:
+            column = self._prices[:, self.tick % self.capacity]
+            return dict(zip(self.names, column.tolist()))
+
+    def history(self, points, step=1):
+        """Return an ``(animals, points)`` array ending at the latest tick, ``step`` ticks apart."""
+        points = min(points, (self.capacity - 1) // step + 1)
+        with self._lock:
+            ticks = self.tick - step * np.arange(points - 1, -1, -1)
+            return self._prices[:, ticks % self.capacity]
+
+    def _draw(self, t):
+        self._noise[t % self.memory] = np.random.default_rng([self.seed, t]).standard_normal(len(self.names))
+
+    def _price_at(self, t):
+        self._draw(t)
+        # Slot j holds tick t - ((t - j) mod memory); weight it by persistence ** age
+        ages = (t - np.arange(self.memory)) % self.memory
+        log_price = (self._powers[ages] @ self._noise) * self.sigma
+        prices = np.clip(self.mid * np.exp(log_price), self.low, self.high)
+        for row, factor, start, end in self._events.values():
+            if start <= t < end:
+                prices[row] *= factor
+        return self._clip(slice(None), prices)
+
+    def _clip(self, rows, prices):
+        # Shocks may push prices outside the normal range, but only so far
+        return np.clip(prices, self.low[rows] / 2, self.high[rows] * 2)
+
+    def _prune(self):
+        oldest = self.tick - self.capacity if self.tick is not None else None
+        if oldest is None:
+            return
+        for event_id, (_, _, _, end) in list(self._events.items()):
+            if end <= oldest:
+                del self._events[event_id]
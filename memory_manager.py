@@ -0,0 +1,117 @@
+"""Garbage collection policy for the server process.
+
+CPython's default thresholds run a young collection every 700 net
+allocations and a full one every hundred of those, inline in whatever
+request happens to allocate. Here the young generations collect less
+often, full collections never run automatically, and a background thread
+runs them when enough young collections have happened since the last one
+(a proxy for the allocation rate), when RSS crosses a limit, or at least
+every ``max_interval`` seconds. Every collection's pause is measured via
+``gc.callbacks`` and reported by ``stats()``.
+"""
+import gc
+import time
+import threading
+from collections import deque
+
+import psutil
+
+
+class MemoryManager:
+    def __init__(self, thresholds=(10000, 20, 1000000), check_interval=30, max_interval=600,
+                 young_budget=500, rss_limit_mb=500, history=256):
+        self.thresholds = thresholds
+        self.check_interval = check_interval
+        self.max_interval = max_interval
+        self.young_budget = young_budget
+        self.rss_limit_mb = rss_limit_mb
+        self._pauses = deque(maxlen=history)  # (generation, seconds) of recent collections
+        self._totals = [[0, 0.0, 0.0] for _ in range(3)]  # per generation: count, total, max
+        self._started = None
+        self._last_full = time.monotonic()
+        self._young_at_full = 0
+        self._full_reasons = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self.heartbeat = None  # monotonic time the scheduling thread last checked in
+
+    def install(self):
+        """Apply the thresholds and start measuring collection pauses."""
+        gc.set_threshold(*self.thresholds)
+        if self._on_gc not in gc.callbacks:
+            gc.callbacks.append(self._on_gc)
+
+    def freeze(self):
+        """Move everything allocated so far (modules, config) out of future collections.
+
+        Call once startup is done; with a preloaded app this also keeps
+        forked workers from touching, and so copying, the parent's pages.
+        """
+        gc.collect()
+        gc.freeze()
+
+    def start(self):
+        """Start the background thread that schedules full collections."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def collect(self, reason='manual'):
+        """Run a full collection now."""
+        with self._lock:
+            gc.collect()
+            self._last_full = time.monotonic()
+            self._young_at_full = gc.get_stats()[0]['collections']
+            self._full_reasons[reason] = self._full_reasons.get(reason, 0) + 1
+
+    def due(self):
+        """Why a full collection should run now, or None."""
+        young = gc.get_stats()[0]['collections'] - self._young_at_full
+        if young >= self.young_budget:
+            return 'allocation'
+        if psutil.Process().memory_info().rss / 1024 / 1024 > self.rss_limit_mb:
+            return 'rss'
+        if time.monotonic() - self._last_full >= self.max_interval:
+            return 'interval'
+        return None
+
+    def stats(self):
+        """Thresholds, collection counts and pause times (ms) per generation."""
+        with self._lock:
+            # The callback appends without the lock; copy before iterating
+            recent = sorted(seconds for _, seconds in list(self._pauses))
+            totals = [list(t) for t in self._totals]
+            reasons = dict(self._full_reasons)
+        return {
+            'thresholds': gc.get_threshold(),
+            'pending': gc.get_count(),
+            'frozen': gc.get_freeze_count(),
+            'full_collections': reasons,
+            'generations': [{'collections': count, 'pause_total_ms': round(total * 1000, 3),
+                             'pause_max_ms': round(longest * 1000, 3)}
+                            for count, total, longest in totals],
+            'recent_pause_p50_ms': round(recent[len(recent) // 2] * 1000, 3) if recent else None,
+            'recent_pause_p99_ms': round(recent[int(len(recent) * 0.99)] * 1000, 3) if recent else None,
+        }
+
+    def _on_gc(self, phase, info):
+        if phase == 'start':
+            self._started = time.perf_counter()
+        elif self._started is not None:
+            seconds = time.perf_counter() - self._started
+            self._started = None
+            generation = info['generation']
+            # Runs inside the collector; plain appends and sums only
+            self._pauses.append((generation, seconds))
+            totals = self._totals[generation]
+            totals[0] += 1
+            totals[1] += seconds
+            totals[2] = max(totals[2], seconds)
+
+    def _run(self):
+        while True:
+            self.heartbeat = time.monotonic()
+            time.sleep(self.check_interval)
+            reason = self.due()
+            if reason:
+                self.collect(reason)
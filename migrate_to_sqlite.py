@@ -0,0 +1,33 @@
+import os
+import sys
+
+from persistence import JournaledDocument
+from sqlite_store import SQLiteDocument
+
+# The JSON documents under data/ and the name each gets in the database
+DOCUMENTS = [
+    ('data/chickens.json', 'chickens'),
+    ('data/barns.json', 'barns'),
+    ('data/animals.json', 'animals'),
+]
+
+def missing():
+    raise FileNotFoundError
+
+def migrate(db_path):
+    """Import every JSON document (snapshot plus journal tail) into db_path.
+
+    The sources are only read: no journal or lock file is created next to them.
+    """
+    for path, name in DOCUMENTS:
+        if not os.path.exists(path):
+            print(f"Skipping {path}: not found")
+            continue
+        doc = JournaledDocument(path, missing).read()
+        SQLiteDocument(db_path, name, missing).import_document(doc)
+        print(f"Imported {path} into {db_path} as '{name}'")
+    print("Done. Start the server with CHICFOCUS_STORAGE=sqlite to use it.")
+
+if __name__ == "__main__":
+    # Stop the server first so the JSON files are not changing underneath
+    migrate(sys.argv[1] if len(sys.argv) > 1 else os.environ.get('CHICFOCUS_SQLITE_PATH', 'data/chicfocus.db'))
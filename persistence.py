@@ -0,0 +1,410 @@
+"""Crash-safe storage for the JSON documents under data/.
+
+Each document is a snapshot file (the familiar ``chickens.json`` etc.) plus an
+append-only journal next to it (``chickens.json.journal``). A commit diffs the
+in-memory document against the last persisted state and appends one JSON line
+of ops; the snapshot is only rewritten, atomically, when the journal is
+compacted.
+
+Ops are dicts ``{"op": "set", "path": [...], "value": ...}`` or
+``{"op": "del", "path": [...]}``. Paths are lists of dict keys and list
+indexes. A ``set`` at index ``len(list)`` appends, so every op assigns an
+absolute value and replaying a journal over a newer snapshot is harmless.
+
+With ``shared=True`` several processes (gunicorn workers) may open the same
+document: appends and compactions happen under an flock on ``<name>.lock``
+and ``refresh()`` folds in whatever the other processes appended.
+
+A record may also carry ``events``: typed, domain-level descriptions of the
+change (``{"type": "session_completed", "user": ...}``) for read models.
+With a ``log_dir``, compaction moves the old journal there instead of
+discarding it, together with the snapshot it started from, so history can
+be replayed (see event_log.py). Only the newest ``log_segments`` segments
+are kept.
+"""
+import os
+import glob
+import json
+import time
+import shutil
+import logging
+import datetime
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process mode only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class PersistenceError(Exception):
+    """Raised when a snapshot cannot be read and no safe recovery exists."""
+
+
+def diff_ops(old, new, path=()):
+    """Return the ops that turn ``old`` into ``new``."""
+    if type(old) is dict and type(new) is dict:
+        ops = []
+        for key in old:
+            if key not in new:
+                ops.append({"op": "del", "path": list(path) + [key]})
+        for key, value in new.items():
+            if key not in old:
+                ops.append({"op": "set", "path": list(path) + [key], "value": value})
+            elif type(old[key]) is not type(value) or old[key] != value:
+                ops.extend(diff_ops(old[key], value, path + (key,)))
+        return ops
+    if type(old) is list and type(new) is list and len(new) >= len(old):
+        ops = []
+        for i in range(len(old)):
+            if type(old[i]) is not type(new[i]) or old[i] != new[i]:
+                ops.extend(diff_ops(old[i], new[i], path + (i,)))
+        for i in range(len(old), len(new)):
+            ops.append({"op": "set", "path": list(path) + [i], "value": new[i]})
+        return ops
+    if type(old) is not type(new) or old != new:
+        return [{"op": "set", "path": list(path), "value": new}]
+    return []
+
+
+def apply_ops(doc, ops, strict=True):
+    """Apply ops to ``doc`` in place and return the (possibly new) root.
+
+    With ``strict=False`` ops whose parent no longer exists are skipped,
+    which is what journal replay over a newer snapshot needs.
+    """
+    for op in ops:
+        path = op["path"]
+        if not path:
+            if op["op"] == "set":
+                doc = op["value"]
+            continue
+        parent = doc
+        try:
+            for key in path[:-1]:
+                parent = parent[key]
+        except (KeyError, IndexError, TypeError):
+            if strict:
+                raise
+            continue
+        key = path[-1]
+        if op["op"] == "set":
+            if type(parent) is list:
+                if key == len(parent):
+                    parent.append(op["value"])
+                elif key < len(parent):
+                    parent[key] = op["value"]
+                elif strict:
+                    raise IndexError(f"set past end of list at {path}")
+            else:
+                parent[key] = op["value"]
+        elif op["op"] == "del":
+            if type(parent) is list:
+                if key < len(parent):
+                    del parent[key]
+            else:
+                parent.pop(key, None)
+    return doc
+
+
+def _rebase_appends(ops, old_doc, new_doc):
+    """Shift list appends in ``ops`` (made against ``old_doc``) to the end of ``new_doc``'s lists."""
+    rebased = []
+    for op in ops:
+        path = op["path"]
+        if op["op"] == "set" and path and type(path[-1]) is int:
+            old_list = _resolve(old_doc, path[:-1])
+            new_list = _resolve(new_doc, path[:-1])
+            if type(old_list) is list and type(new_list) is list and path[-1] >= len(old_list):
+                op = dict(op, path=path[:-1] + [len(new_list) + path[-1] - len(old_list)])
+        rebased.append(op)
+    return rebased
+
+
+def _resolve(doc, path):
+    try:
+        for key in path:
+            doc = doc[key]
+    except (KeyError, IndexError, TypeError):
+        return None
+    return doc
+
+
+def write_atomic(path, payload):
+    """Write ``payload`` to ``path`` so readers see either the old or new file."""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    _fsync_dir(directory)
+
+
+def _fsync_dir(directory):
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class JournaledDocument:
+    """Snapshot file plus append-only journal for one JSON document."""
+
+    def __init__(self, path, default_factory, sync_interval=1.0, compact_bytes=256 * 1024, shared=False, log_dir=None,
+                 log_segments=64):
+        if shared and fcntl is None:
+            raise PersistenceError("Shared documents need fcntl (POSIX only)")
+        self.path = path
+        self.journal_path = path + '.journal'
+        self.default_factory = default_factory
+        self.sync_interval = sync_interval
+        self.compact_bytes = compact_bytes
+        self.shared = shared
+        self.log_dir = log_dir
+        self.log_segments = log_segments
+        self.seq = 0
+        self._base_seq = 0  # seq the current journal starts after
+        # Bumped whenever another process's changes are folded in
+        self.generation = 0
+        self.needs_sync = False
+        self._shadow = None
+        self._journal = None
+        self._journal_ino = None
+        self._offset = 0
+        self._last_sync = 0.0
+        self._lock_file = None
+        self._lock_pid = None
+
+    def load(self):
+        """Read the snapshot, replay the journal tail and return the document."""
+        with self._locked():
+            if os.path.exists(self.path):
+                doc = self._read_snapshot()
+            else:
+                doc = self.default_factory()
+                write_atomic(self.path, self._serialize_snapshot(doc))
+            doc = self._replay(doc)
+            self._shadow = json.loads(json.dumps(doc, default=str))
+            self._open_journal()
+        return doc
+
+    def read(self):
+        """The snapshot with the journal replayed, without creating, repairing or locking any file.
+
+        For tools (like the SQLite migration) that must not touch their source.
+        """
+        return self._replay(self._read_snapshot(), repair=False)
+
+    def commit(self, doc, events=()):
+        """Append the changes since the last commit; return the number of ops.
+
+        ``events`` are stored with the record as-is; they are written even
+        when the document itself did not change.
+        """
+        with self._locked():
+            self._catch_up(doc)
+            ops = diff_ops(self._shadow, doc)
+            if not ops and not events:
+                return 0
+            self.seq += 1
+            record = {"seq": self.seq, "at": datetime.datetime.now().isoformat(), "ops": ops}
+            if events:
+                record["events"] = list(events)
+            line = json.dumps(record, default=str, separators=(',', ':'))
+            self._journal.write(line + '\n')
+            self._journal.flush()
+            self._offset = self._journal.tell()
+            self.needs_sync = True
+            # Keep the shadow independent of the live document
+            self._shadow = apply_ops(self._shadow, json.loads(line)["ops"])
+            if time.time() - self._last_sync >= self.sync_interval:
+                self.sync()
+            if self._offset >= self.compact_bytes:
+                self._compact()
+        return len(ops)
+
+    def refresh(self, doc):
+        """Fold changes appended by other processes into ``doc`` in place."""
+        if not self.shared:
+            return 0
+        with self._locked():
+            return self._catch_up(doc)
+
+    def sync(self):
+        """fsync the journal if there are appended bytes not yet on disk."""
+        if self.needs_sync and self._journal is not None:
+            os.fsync(self._journal.fileno())
+            self.needs_sync = False
+        self._last_sync = time.time()
+
+    def compact(self):
+        """Fold the journal into a fresh snapshot and start an empty journal."""
+        with self._locked():
+            self._compact()
+
+    def _compact(self):
+        self.sync()
+        if self.log_dir:
+            self._retain_journal()
+        write_atomic(self.path, self._serialize_snapshot(self._shadow))
+        # A crash here replays the old journal over the new snapshot; ops are
+        # absolute assignments, so that converges to the same document.
+        write_atomic(self.journal_path, json.dumps({"base_seq": self.seq}) + '\n')
+        self._base_seq = self.seq
+        self._open_journal()
+        logger.info("Compacted %s at seq %d", self.path, self.seq)
+
+    def _retain_journal(self):
+        """Keep the journal about to be compacted, and the snapshot it starts from, in ``log_dir``."""
+        os.makedirs(self.log_dir, exist_ok=True)
+        prefix = os.path.join(self.log_dir, f'{os.path.basename(self.path)}.{self._base_seq:010d}')
+        # The snapshot on disk is the state the current journal starts from
+        for source, target in ((self.path, prefix + '.base.json'), (self.journal_path, prefix + '.jsonl')):
+            if os.path.exists(target):
+                os.remove(target)  # left behind by a compaction that did not finish
+            try:
+                # Both files are replaced, not rewritten, so a hard link keeps their contents
+                os.link(source, target)
+            except OSError:
+                shutil.copyfile(source, target)
+        self._prune_log()
+        _fsync_dir(self.log_dir)
+
+    def _prune_log(self):
+        """Drop the oldest segments (and their snapshots) beyond ``log_segments``."""
+        name = glob.escape(os.path.basename(self.path))
+        segments = sorted(glob.glob(os.path.join(self.log_dir, name + '.*.jsonl')))
+        expired = segments[:-self.log_segments] if self.log_segments else segments
+        if not expired:
+            return
+        for segment in expired:
+            for stale in (segment, segment[:-len('.jsonl')] + '.base.json'):
+                if os.path.exists(stale):
+                    os.remove(stale)
+        logger.info("Pruned %d journal segments of %s", len(expired), self.path)
+
+    def close(self):
+        if self._journal is not None:
+            self.sync()
+            self._journal.close()
+            self._journal = None
+
+    def _serialize_snapshot(self, doc):
+        return json.dumps(doc, indent=2, default=str)
+
+    def _read_snapshot(self):
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except ValueError as e:
+            # Snapshots are only ever replaced atomically, so this is outside
+            # damage; refuse to start rather than reinitialize everyone.
+            raise PersistenceError(f"Snapshot {self.path} is unreadable: {e}")
+
+    def _open_journal(self):
+        if self._journal is not None:
+            self._journal.close()
+        if not os.path.exists(self.journal_path):
+            write_atomic(self.journal_path, json.dumps({"base_seq": self.seq}) + '\n')
+            self._base_seq = self.seq
+        self._journal = open(self.journal_path, 'a')
+        self._journal_ino = os.fstat(self._journal.fileno()).st_ino
+        self._offset = self._journal.tell()
+
+    @contextmanager
+    def _locked(self):
+        if not self.shared:
+            yield
+            return
+        if self._lock_pid != os.getpid():
+            # flock is per open file description, so a forked worker needs its own
+            self._lock_file = open(self.path + '.lock', 'a')
+            self._lock_pid = os.getpid()
+            if self._journal is not None:
+                self._journal = None
+                self._open_journal()
+        fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _catch_up(self, doc):
+        if not self.shared:
+            return 0
+        try:
+            st = os.stat(self.journal_path)
+        except FileNotFoundError:
+            return 0
+        if st.st_ino == self._journal_ino and st.st_size == self._offset:
+            return 0
+        if st.st_ino != self._journal_ino:
+            # Another process compacted: diff our view against the new snapshot + journal
+            fresh = self._replay(self._read_snapshot())
+            ops = diff_ops(self._shadow, json.loads(json.dumps(fresh, default=str)))
+            self._open_journal()
+        else:
+            ops = []
+            with open(self.journal_path, 'rb') as f:
+                f.seek(self._offset)
+                for raw in f:
+                    if not raw.endswith(b'\n'):
+                        break
+                    record = json.loads(raw)
+                    if "ops" in record:
+                        ops.extend(record["ops"])
+                        self.seq = max(self.seq, record["seq"])
+                    self._offset += len(raw)
+        if ops:
+            # Changes made here but not committed yet win over the other process's,
+            # except list appends, which are moved behind the ones it added
+            local_ops = diff_ops(self._shadow, doc)
+            old_shadow = self._shadow
+            self._shadow = apply_ops(json.loads(json.dumps(old_shadow)), json.loads(json.dumps(ops)))
+            apply_ops(doc, json.loads(json.dumps(ops)), strict=False)
+            apply_ops(doc, _rebase_appends(local_ops, old_shadow, self._shadow), strict=False)
+            self.generation += 1
+        return len(ops)
+
+    def _replay(self, doc, repair=True):
+        if not os.path.exists(self.journal_path):
+            return doc
+        good_offset = 0
+        replayed = 0
+        with open(self.journal_path, 'rb') as f:
+            for raw in f:
+                if not raw.endswith(b'\n'):
+                    break  # torn write at the tail
+                try:
+                    record = json.loads(raw)
+                except ValueError:
+                    break
+                if "base_seq" in record:
+                    self.seq = max(self.seq, record["base_seq"])
+                    self._base_seq = record["base_seq"]
+                else:
+                    doc = apply_ops(doc, record["ops"], strict=False)
+                    self.seq = max(self.seq, record["seq"])
+                    replayed += 1
+                good_offset += len(raw)
+            size = f.seek(0, os.SEEK_END)
+        if size > good_offset:
+            logger.warning("%s %d trailing bytes of %s", "Discarding" if repair else "Ignoring",
+                           size - good_offset, self.journal_path)
+            if repair:
+                with open(self.journal_path, 'r+b') as f:
+                    f.truncate(good_offset)
+        if replayed:
+            logger.info("Replayed %d journal entries into %s", replayed, self.path)
+        return doc
@@ -0,0 +1,93 @@
+class _UserPoints:
+    """Running score state for one user's session list."""
+
+    def __init__(self, sessions):
+        self.sessions = sessions
+        self.size = 0
+        self.scores = []        # score per position, counted once the session completes
+        self.pending = set()    # positions neither completed nor aborted yet
+        self.total = 0
+        self.recent_tasks = ()  # task names of the last two sessions
+        self.boss_run = 0       # consecutive boss-tier sessions at the end of the list
+
+
+class PointsEngine:
+    """Session points with the bonus rules from the desktop app.
+
+    A session scores its tier's points, -1 when it is the third session in
+    a row on the same task, +2 when the last three sessions switched tasks,
+    and +3 when it is the third (or later) boss-tier session in a row.
+    Those windows only look backwards, so each session's score is fixed
+    when it is appended and is simply added to the running total once it
+    completes. ``total()`` only looks at sessions appended or still in
+    progress since the last call, so it does not grow with history.
+    """
+
+    def __init__(self, store, chicken_types, boss_tier=5):
+        self.store = store
+        self.chicken_types = chicken_types
+        self.boss_tier = boss_tier
+        self._doc = None
+        self._generation = None
+        self._users = {}
+
+    def total(self, data, user):
+        """Points from the user's completed sessions plus their stored bonus points."""
+        return data["users"][user]["points"] + self._catch_up(data, user).total
+
+    def rebuild(self, data, user=None):
+        """Drop the running state (for ``user`` or everyone) and recompute it from history."""
+        if user is None:
+            self._users = {}
+        else:
+            self._users.pop(user, None)
+        for name in ([user] if user else data["users"]):
+            self._catch_up(data, name)
+
+    def _catch_up(self, data, user):
+        if data is not self._doc or self.store.generation != self._generation:
+            self._doc = data
+            self._generation = self.store.generation
+            self._users = {}
+        sessions = data["users"][user]["sessions"]
+        state = self._users.get(user)
+        if state is None or state.sessions is not sessions or state.size > len(sessions):
+            state = self._users[user] = _UserPoints(sessions)
+        while state.size < len(sessions):
+            self._append(state, sessions[state.size])
+        for pos in list(state.pending):
+            session = sessions[pos]
+            if session.get("completed", False):
+                state.total += state.scores[pos]
+                state.pending.discard(pos)
+            elif session.get("aborted", False):
+                state.pending.discard(pos)
+        return state
+
+    def _append(self, state, session):
+        task = session["task_name"]
+        points = self.chicken_types.get(session["tier"], {}).get("points", 0)
+        if len(state.recent_tasks) == 2:
+            window = state.recent_tasks + (task,)
+            # Repeat penalty: same task three times in a row
+            if len(set(window)) == 1:
+                points -= 1
+            # Switch bonus: tasks changed within the last three sessions
+            else:
+                points += 2
+        if session["tier"] >= self.boss_tier:
+            state.boss_run += 1
+            # Boss streak: three or more boss-tier sessions in a row
+            if state.boss_run >= 3:
+                points += 3
+        else:
+            state.boss_run = 0
+        score = max(0, points)
+        pos = state.size
+        state.scores.append(score)
+        state.recent_tasks = (state.recent_tasks + (task,))[-2:]
+        if session.get("completed", False):
+            state.total += score
+        elif not session.get("aborted", False):
+            state.pending.add(pos)
+        state.size += 1
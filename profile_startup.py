@@ -0,0 +1,52 @@
+import os
+import re
+import sys
+import time
+import subprocess
+
+# Cold-start report: how long `import app` takes and which imports dominate it.
+#   python profile_startup.py            # top 20 imports by cumulative time
+#   python profile_startup.py 40 1500    # top 40, exit 1 if the import takes over 1500 ms
+
+IMPORTTIME_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)')
+
+def profile(module='app'):
+    """Import ``module`` in a fresh interpreter; return (wall seconds, [(cumulative us, self us, depth, name)])."""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True, env=env)
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        sys.stderr.write(result.stderr[-2000:])
+        raise SystemExit(f"import {module} failed")
+    imports = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            own, cumulative, indent, name = match.groups()
+            imports.append((int(cumulative), int(own), len(indent) // 2, name))
+    return elapsed, imports
+
+def report(top=20, budget_ms=None):
+    elapsed, imports = profile()
+    own_module = next((i for i in imports if i[3] == 'app'), None)
+    print(f"Interpreter start + import app: {elapsed * 1000:.0f} ms")
+    if own_module:
+        print(f"import app: {own_module[0] / 1000:.0f} ms cumulative, {own_module[1] / 1000:.0f} ms in app.py itself")
+    print(f"\nTop {top} imports by cumulative time:")
+    for cumulative, own, depth, name in sorted(imports, reverse=True)[:top]:
+        print(f"{cumulative / 1000:9.1f} ms {own / 1000:9.1f} ms self  {'  ' * depth}{name}")
+    # Dependencies that should only load on first use
+    lazy = [name for name in ('matplotlib', 'matplotlib.pyplot') if any(i[3] == name for i in imports)]
+    if lazy:
+        print(f"\nWarning: imported at startup but meant to be lazy: {', '.join(lazy)}")
+    if budget_ms is not None and own_module and own_module[0] / 1000 > budget_ms:
+        print(f"\nimport app exceeds the {budget_ms} ms budget")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    top = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    budget = float(sys.argv[2]) if len(sys.argv) > 2 else None
+    sys.exit(report(top, budget))
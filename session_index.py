@@ -0,0 +1,104 @@
+import datetime
+from collections import Counter, defaultdict
+
+
+class _UserSessions:
+    """Index over one user's session list."""
+
+    def __init__(self, sessions):
+        self.sessions = sessions
+        self.size = 0
+        self.positions = {}           # id(session) -> index in the list
+        self.started = []             # parsed timestamp per position
+        self.active = []              # positions neither completed nor aborted, oldest first
+        self.active_by_tier = defaultdict(list)
+        self.per_day = Counter()
+        self.completed_per_day = Counter()
+        for session in sessions:
+            self.add(session)
+
+    def add(self, session):
+        pos = self.size
+        started = datetime.datetime.fromisoformat(session["timestamp"])
+        self.positions[id(session)] = pos
+        self.started.append(started)
+        self.per_day[started.date()] += 1
+        if session.get("completed", False):
+            self.completed_per_day[started.date()] += 1
+        elif not session.get("aborted", False):
+            self.active.append(pos)
+            self.active_by_tier[session["tier"]].append(pos)
+        self.size += 1
+
+    def finish(self, session):
+        pos = self.positions[id(session)]
+        if pos not in self.active:
+            return
+        self.active.remove(pos)
+        self.active_by_tier[session["tier"]].remove(pos)
+        if session.get("completed", False):
+            self.completed_per_day[self.started[pos].date()] += 1
+
+
+class SessionIndex:
+    """O(1) lookups over ``data["users"][user]["sessions"]``.
+
+    Handlers call ``add()`` after appending a session and ``finish()`` after
+    marking one completed or aborted. Everything else is derived once, with
+    timestamps parsed at insert time. A user's index is rebuilt from the list
+    when the store loads a new document, when another process's changes were
+    folded in (``store.generation``), or when the list no longer matches.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._doc = None
+        self._generation = None
+        self._users = {}
+
+    def _entry(self, data, user, expected_size=None):
+        if data is not self._doc or self.store.generation != self._generation:
+            self._doc = data
+            self._generation = self.store.generation
+            self._users = {}
+        sessions = data["users"][user]["sessions"]
+        entry = self._users.get(user)
+        if expected_size is None:
+            expected_size = len(sessions)
+        if entry is None or entry.sessions is not sessions or entry.size != expected_size:
+            entry = self._users[user] = _UserSessions(sessions[:expected_size])
+            entry.sessions = sessions
+        return entry
+
+    def add(self, data, user, session):
+        """Index ``session``, which was just appended to the user's list."""
+        sessions = data["users"][user]["sessions"]
+        self._entry(data, user, len(sessions) - 1).add(session)
+
+    def finish(self, data, user, session):
+        """Update the index after ``session`` was completed or aborted."""
+        self._entry(data, user).finish(session)
+
+    def active(self, data, user):
+        """The user's oldest session that is neither completed nor aborted."""
+        entry = self._entry(data, user)
+        return entry.sessions[entry.active[0]] if entry.active else None
+
+    def active_of_tier(self, data, user, tier):
+        """The user's in-progress sessions of ``tier``, oldest first."""
+        entry = self._entry(data, user)
+        return [entry.sessions[pos] for pos in entry.active_by_tier.get(tier, ())]
+
+    def started_at(self, data, user, session):
+        """Parsed ``timestamp`` of one of the user's sessions."""
+        entry = self._entry(data, user)
+        return entry.started[entry.positions[id(session)]]
+
+    def count_on(self, data, user, day, completed=False):
+        """Number of sessions the user started (or completed) on ``day``."""
+        entry = self._entry(data, user)
+        return (entry.completed_per_day if completed else entry.per_day)[day]
+
+    def completed_days(self, data, user):
+        """``{date: completed session count}`` for the user."""
+        return dict(self._entry(data, user).completed_per_day)
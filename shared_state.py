@@ -0,0 +1,254 @@
+"""State that has to be identical in every gunicorn worker.
+
+``LocalBackend`` keeps everything in the current process (single worker, the
+default). ``SQLiteBackend`` keeps it in a WAL-mode SQLite file that every
+worker on the node opens, so timers, the market feed and market events look
+the same no matter which worker a client lands on. Values are stored as JSON.
+
+``SharedDict`` and ``SharedList`` wrap a backend with the dict/deque-style
+calls app.py already used for its module-level globals.
+"""
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import deque
+
+
+class LocalBackend:
+    """In-process backend for a single worker."""
+
+    shared = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+        self._hashes = {}
+        self._lists = {}
+        self._leases = {}
+
+    def get(self, key, default=None):
+        return self._values.get(key, default)
+
+    def set(self, key, value):
+        self._values[key] = value
+
+    def incr(self, key):
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + 1
+            return self._values[key]
+
+    def hash_get(self, name, field, default=None):
+        return self._hashes.get(name, {}).get(field, default)
+
+    def hash_set(self, name, field, value):
+        self._hashes.setdefault(name, {})[field] = value
+
+    def hash_delete(self, name, field):
+        self._hashes.get(name, {}).pop(field, None)
+
+    def hash_all(self, name):
+        return dict(self._hashes.get(name, {}))
+
+    def list_push(self, name, value, maxlen):
+        with self._lock:
+            items = self._lists.setdefault(name, deque(maxlen=maxlen))
+            items.append(value)
+
+    def list_items(self, name):
+        """Return the list oldest first."""
+        return list(self._lists.get(name, ()))
+
+    def acquire_lease(self, name, owner, ttl):
+        with self._lock:
+            holder, expires = self._leases.get(name, (None, 0))
+            if holder not in (None, owner) and expires > time.time():
+                return False
+            self._leases[name] = (owner, time.time() + ttl)
+            return True
+
+    def release_lease(self, name, owner):
+        with self._lock:
+            if self._leases.get(name, (None, 0))[0] == owner:
+                del self._leases[name]
+
+
+class SQLiteBackend:
+    """Backend shared by every worker on the node through one SQLite file."""
+
+    shared = True
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn_pid = None
+        self._connection = None
+
+    @property
+    def _conn(self):
+        # gunicorn forks after import (preload_app); never share a connection across processes
+        if self._conn_pid != os.getpid():
+            self._connection = self._connect()
+            self._conn_pid = os.getpid()
+        return self._connection
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS hashes (name TEXT, field TEXT, value TEXT, PRIMARY KEY (name, field));
+            CREATE TABLE IF NOT EXISTS lists (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, value TEXT);
+            CREATE INDEX IF NOT EXISTS lists_name ON lists (name, id);
+            CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, owner TEXT, expires REAL);
+        """)
+        return conn
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def get(self, key, default=None):
+        rows = self._execute("SELECT value FROM kv WHERE key = ?", (key,))
+        return json.loads(rows[0][0]) if rows else default
+
+    def set(self, key, value):
+        self._execute("INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)", (key, json.dumps(value, default=str)))
+
+    def incr(self, key):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+                value = (json.loads(row[0]) if row else 0) + 1
+                self._conn.execute("INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+                self._conn.execute("COMMIT")
+                return value
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def hash_get(self, name, field, default=None):
+        rows = self._execute("SELECT value FROM hashes WHERE name = ? AND field = ?", (name, field))
+        return json.loads(rows[0][0]) if rows else default
+
+    def hash_set(self, name, field, value):
+        self._execute("INSERT OR REPLACE INTO hashes (name, field, value) VALUES (?, ?, ?)",
+                      (name, field, json.dumps(value, default=str)))
+
+    def hash_delete(self, name, field):
+        self._execute("DELETE FROM hashes WHERE name = ? AND field = ?", (name, field))
+
+    def hash_all(self, name):
+        rows = self._execute("SELECT field, value FROM hashes WHERE name = ?", (name,))
+        return {field: json.loads(value) for field, value in rows}
+
+    def list_push(self, name, value, maxlen):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("INSERT INTO lists (name, value) VALUES (?, ?)", (name, json.dumps(value, default=str)))
+                self._conn.execute("""DELETE FROM lists WHERE name = ? AND id NOT IN
+                                      (SELECT id FROM lists WHERE name = ? ORDER BY id DESC LIMIT ?)""",
+                                   (name, name, maxlen))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def list_items(self, name):
+        """Return the list oldest first."""
+        rows = self._execute("SELECT value FROM lists WHERE name = ? ORDER BY id", (name,))
+        return [json.loads(value) for (value,) in rows]
+
+    def acquire_lease(self, name, owner, ttl):
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT owner, expires FROM leases WHERE name = ?", (name,)).fetchone()
+                if row and row[0] != owner and row[1] > now:
+                    self._conn.execute("COMMIT")
+                    return False
+                self._conn.execute("INSERT OR REPLACE INTO leases (name, owner, expires) VALUES (?, ?, ?)",
+                                   (name, owner, now + ttl))
+                self._conn.execute("COMMIT")
+                return True
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def release_lease(self, name, owner):
+        self._execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, owner))
+
+
+def create_backend(url):
+    """Build a backend from a setting like ``local`` or ``sqlite:///data/shared.db``."""
+    if not url or url == 'local':
+        return LocalBackend()
+    if url.startswith('sqlite:///'):
+        return SQLiteBackend(url[len('sqlite:///'):])
+    raise ValueError(f"Unknown shared state backend: {url}")
+
+
+class SharedDict:
+    """Dict-style view over one backend hash."""
+
+    def __init__(self, backend, name):
+        self.backend = backend
+        self.name = name
+
+    def __getitem__(self, field):
+        value = self.backend.hash_get(self.name, field, _MISSING)
+        if value is _MISSING:
+            raise KeyError(field)
+        return value
+
+    def get(self, field, default=None):
+        return self.backend.hash_get(self.name, field, default)
+
+    def __setitem__(self, field, value):
+        self.backend.hash_set(self.name, field, value)
+
+    def __delitem__(self, field):
+        self.backend.hash_delete(self.name, field)
+
+    def pop(self, field, default=None):
+        value = self.get(field, default)
+        self.backend.hash_delete(self.name, field)
+        return value
+
+    def __contains__(self, field):
+        return self.backend.hash_get(self.name, field, _MISSING) is not _MISSING
+
+    def __len__(self):
+        return len(self.backend.hash_all(self.name))
+
+    def items(self):
+        return self.backend.hash_all(self.name).items()
+
+
+class SharedList:
+    """Bounded, append-only list; iterates newest first like the old deques."""
+
+    def __init__(self, backend, name, maxlen):
+        self.backend = backend
+        self.name = name
+        self.maxlen = maxlen
+
+    def push(self, value):
+        self.backend.list_push(self.name, value, self.maxlen)
+
+    def __iter__(self):
+        return iter(reversed(self.backend.list_items(self.name)))
+
+    def __len__(self):
+        return len(self.backend.list_items(self.name))
+
+
+_MISSING = object()
@@ -0,0 +1,381 @@
+"""SQLite storage for the game documents (``CHICFOCUS_STORAGE=sqlite``).
+
+A drop-in alternative to persistence.JournaledDocument: the same
+load/commit/refresh/sync/close interface, but each document is spread over
+tables with one row per session, pause, duel, barn or inventory item. A
+commit diffs the document against what was last written and rewrites only
+the rows the ops touch. Everything not covered by a table (stats, cycle
+fields, cash, ...) lives in ``meta``, one row per top-level key.
+
+Every commit also appends its ops and typed events to ``changes``, which
+is what other workers read in ``refresh()`` and what replaces the journal
+as the event history. Only the last ``retain_changes`` rows are kept, like
+the journal segments in persistence.JournaledDocument; a worker that falls
+further behind rebuilds its view from the tables.
+"""
+import os
+import json
+import sqlite3
+import logging
+import datetime
+import threading
+
+from persistence import diff_ops, apply_ops, _rebase_appends
+
+logger = logging.getLogger(__name__)
+
+
+class Table:
+    """Rows for the items at ``pattern``: ``*`` matches a dict key, ``#`` a list index."""
+
+    def __init__(self, name, pattern, keys, columns=(), indexes=()):
+        self.name = name
+        self.pattern = tuple(pattern)
+        self.keys = keys
+        self.columns = columns
+        self.indexes = indexes
+
+    def ddl(self):
+        wildcards = [p for p in self.pattern if p in ('*', '#')]
+        cols = [f"{k} {'INTEGER' if w == '#' else 'TEXT'} NOT NULL" for k, w in zip(self.keys, wildcards)]
+        cols += list(self.columns)
+        statements = [f"CREATE TABLE IF NOT EXISTS {self.name} ({', '.join(cols)}, body TEXT NOT NULL, "
+                      f"PRIMARY KEY ({', '.join(self.keys)}))"]
+        for index in self.indexes:
+            statements.append(f"CREATE INDEX IF NOT EXISTS {self.name}_{'_'.join(index)} ON {self.name} ({', '.join(index)})")
+        return statements
+
+    def key_values(self, path):
+        return [k for k, p in zip(path, self.pattern) if p in ('*', '#')]
+
+
+SCHEMAS = {
+    'chickens': [
+        Table('users', ('users', '*'), ('user',)),
+        Table('sessions', ('users', '*', 'sessions', '#'), ('user', 'pos'),
+              ('id', 'tier', 'timestamp', 'completed', 'aborted'), [('user', 'timestamp'), ('id',)]),
+        Table('pauses', ('users', '*', 'sessions', '#', 'pauses', '#'), ('user', 'session_pos', 'pos')),
+        Table('duels', ('active_duels', '#'), ('pos',), ('id', 'user1', 'user2', 'tier'), [('id',)]),
+    ],
+    'barns': [
+        Table('barns', ('users', '*', 'barns', '#'), ('user', 'pos'), ('id', 'name'), [('user', 'id')]),
+    ],
+    'animals': [
+        Table('inventory', ('*', 'inventory', '#'), ('user', 'pos'),
+              ('name', 'barn_id', 'timestamp'), [('user', 'barn_id'), ('user', 'timestamp')]),
+    ],
+}
+
+
+def _matches(pattern, path):
+    for p, k in zip(pattern, path):
+        if p == '*':
+            if type(k) is not str:
+                return False
+        elif p == '#':
+            if type(k) is not int:
+                return False
+        elif p != k:
+            return False
+    return True
+
+
+def _resolve(doc, path):
+    try:
+        for key in path:
+            doc = doc[key]
+    except (KeyError, IndexError, TypeError):
+        return None
+    return doc
+
+
+class SQLiteDocument:
+    """One JSON document stored as rows in a shared SQLite database."""
+
+    needs_sync = False  # every commit is a SQLite transaction
+
+    def __init__(self, db_path, name, default_factory, shared=False, sync_interval=1.0, retain_changes=10000):
+        self.db_path = db_path
+        self.name = name
+        self.path = f"{db_path}#{name}"
+        self.default_factory = default_factory
+        self.shared = shared
+        self.sync_interval = sync_interval
+        self.retain_changes = retain_changes
+        self.tables = SCHEMAS.get(name, [])
+        self.seq = 0
+        self.generation = 0
+        self._shadow = None
+        self._lock = threading.RLock()
+        self._conn_pid = None
+        self._connection = None
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @property
+    def _conn(self):
+        # Never share a connection with a forked worker
+        if self._conn_pid != os.getpid():
+            self._connection = self._connect()
+            self._conn_pid = os.getpid()
+        return self._connection
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (doc TEXT NOT NULL, key TEXT NOT NULL, body TEXT NOT NULL, PRIMARY KEY (doc, key))")
+        conn.execute("CREATE TABLE IF NOT EXISTS changes (doc TEXT NOT NULL, seq INTEGER NOT NULL, at TEXT, "
+                     "ops TEXT NOT NULL, events TEXT, PRIMARY KEY (doc, seq))")
+        for table in self.tables:
+            for statement in table.ddl():
+                conn.execute(statement)
+        return conn
+
+    def _transaction(self):
+        return _Transaction(self)
+
+    # -- backend interface -------------------------------------------------
+
+    def load(self):
+        """Assemble the document from its rows (creating it on first use)."""
+        with self._transaction() as conn:
+            self.seq = self._max_seq(conn)
+            meta = conn.execute("SELECT key, body FROM meta WHERE doc = ?", (self.name,)).fetchall()
+            if not meta:
+                doc = self.default_factory()
+                self._write_all(conn, doc)
+            else:
+                doc = self._assemble(conn, meta)
+            self._shadow = json.loads(json.dumps(doc, default=str))
+        return doc
+
+    def commit(self, doc, events=()):
+        """Write the rows changed since the last commit; return the number of ops."""
+        with self._transaction() as conn:
+            self._catch_up(conn, doc)
+            ops = diff_ops(self._shadow, doc)
+            if not ops and not events:
+                return 0
+            new_shadow = apply_ops(json.loads(json.dumps(self._shadow, default=str)), json.loads(json.dumps(ops, default=str)))
+            self._write_ops(conn, ops, new_shadow)
+            self.seq += 1
+            conn.execute("INSERT INTO changes (doc, seq, at, ops, events) VALUES (?, ?, ?, ?, ?)",
+                         (self.name, self.seq, datetime.datetime.now().isoformat(),
+                          json.dumps(ops, default=str), json.dumps(list(events), default=str) if events else None))
+            self._shadow = new_shadow
+            # Prune in batches rather than on every commit
+            if self.retain_changes and self.seq % max(1, self.retain_changes // 8) == 0:
+                conn.execute("DELETE FROM changes WHERE doc = ? AND seq <= ?",
+                             (self.name, self.seq - self.retain_changes))
+        return len(ops)
+
+    def refresh(self, doc):
+        """Fold changes committed by other processes into ``doc`` in place."""
+        if not self.shared:
+            return 0
+        with self._lock:
+            # Cheap check first; only open a transaction when something changed
+            if self._max_seq(self._conn) == self.seq:
+                return 0
+            with self._transaction() as conn:
+                return self._catch_up(conn, doc)
+
+    def sync(self):
+        pass
+
+    def close(self):
+        if self._connection is not None and self._conn_pid == os.getpid():
+            self._connection.close()
+            self._connection = None
+            self._conn_pid = None
+
+    def import_document(self, doc):
+        """Replace every row of this document with ``doc`` (used by the migration)."""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM meta WHERE doc = ?", (self.name,))
+            for table in self.tables:
+                conn.execute(f"DELETE FROM {table.name}")
+            self._write_all(conn, doc)
+            self.seq = self._max_seq(conn)
+            self._shadow = json.loads(json.dumps(doc, default=str))
+
+    def events(self, types=None, since=0):
+        """Yield typed events (with their change's ``seq``) after ``since``, oldest first.
+
+        The same shape as event_log.EventLog.events for the JSON backend.
+        """
+        rows = self._conn.execute("SELECT seq, events FROM changes WHERE doc = ? AND seq > ? AND events IS NOT NULL "
+                                  "ORDER BY seq", (self.name, since)).fetchall()
+        for seq, body in rows:
+            for event in json.loads(body):
+                if types is None or event["type"] in types:
+                    yield dict(event, seq=seq)
+
+    # -- reading -----------------------------------------------------------
+
+    def _max_seq(self, conn):
+        return conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes WHERE doc = ?", (self.name,)).fetchone()[0]
+
+    def _assemble(self, conn, meta):
+        doc = {key: json.loads(body) for key, body in meta}
+        # Parents before children; rows come back in key order so list items append in place
+        for table in sorted(self.tables, key=lambda t: len(t.pattern)):
+            rows = conn.execute(f"SELECT {', '.join(table.keys)}, body FROM {table.name} ORDER BY {', '.join(table.keys)}")
+            for row in rows:
+                keys, body = list(row[:-1]), json.loads(row[-1])
+                path = [keys.pop(0) if p in ('*', '#') else p for p in table.pattern]
+                parent = _resolve(doc, path[:-1])
+                if type(parent) is list:
+                    if path[-1] == len(parent):
+                        parent.append(body)
+                    else:
+                        logger.warning("Skipping out-of-order row %s in %s", path, table.name)
+                elif type(parent) is dict:
+                    parent[path[-1]] = body
+        return doc
+
+    def _catch_up(self, conn, doc):
+        rows = conn.execute("SELECT seq, ops FROM changes WHERE doc = ? AND seq > ? ORDER BY seq",
+                            (self.name, self.seq)).fetchall()
+        if not rows:
+            return 0
+        if rows[0][0] > self.seq + 1:
+            # The changes this process missed were pruned: diff against the rows instead
+            meta = conn.execute("SELECT key, body FROM meta WHERE doc = ?", (self.name,)).fetchall()
+            ops = diff_ops(self._shadow, self._assemble(conn, meta))
+            self.seq = rows[-1][0]
+        else:
+            ops = []
+            for seq, raw in rows:
+                ops.extend(json.loads(raw))
+                self.seq = seq
+        # Same merge as the journal: uncommitted local changes win, local appends move behind
+        local_ops = diff_ops(self._shadow, doc)
+        old_shadow = self._shadow
+        self._shadow = apply_ops(json.loads(json.dumps(old_shadow)), json.loads(json.dumps(ops)))
+        apply_ops(doc, json.loads(json.dumps(ops)), strict=False)
+        apply_ops(doc, _rebase_appends(local_ops, old_shadow, self._shadow), strict=False)
+        self.generation += 1
+        return len(ops)
+
+    # -- writing -----------------------------------------------------------
+
+    def _strip(self, value, path):
+        """``value`` (at ``path``) with every table-backed collection emptied."""
+        covered = [t.pattern for t in self.tables
+                   if len(t.pattern) > len(path) and _matches(t.pattern[:len(path)], path)]
+        if not covered:
+            return value
+        if any(len(p) == len(path) + 1 for p in covered):
+            return type(value)() if type(value) in (dict, list) else value
+        if type(value) is dict:
+            return {k: self._strip(v, path + (k,)) for k, v in value.items()}
+        if type(value) is list:
+            return [self._strip(v, path + (i,)) for i, v in enumerate(value)]
+        return value
+
+    def _write_all(self, conn, doc):
+        for key in doc:
+            self._write_meta(conn, key, doc)
+        self._write_subtree(conn, (), doc)
+
+    def _write_meta(self, conn, key, doc):
+        if key in doc:
+            conn.execute("INSERT OR REPLACE INTO meta (doc, key, body) VALUES (?, ?, ?)",
+                         (self.name, key, json.dumps(self._strip(doc[key], (key,)), default=str)))
+        else:
+            conn.execute("DELETE FROM meta WHERE doc = ? AND key = ?", (self.name, key))
+
+    def _write_row(self, conn, table, path, item):
+        values = table.key_values(path)
+        values += [item.get(c) if type(item) is dict else None for c in table.columns]
+        columns = list(table.keys) + list(table.columns) + ['body']
+        conn.execute(f"INSERT OR REPLACE INTO {table.name} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                     values + [json.dumps(self._strip(item, tuple(path)), default=str)])
+
+    def _write_subtree(self, conn, prefix, doc):
+        """Rewrite every row at or below ``prefix``."""
+        for table in self.tables:
+            if len(table.pattern) < len(prefix) or not _matches(table.pattern[:len(prefix)], prefix):
+                continue
+            keys = table.key_values(prefix)
+            where = ' AND '.join(f"{k} = ?" for k in table.keys[:len(keys)])
+            conn.execute(f"DELETE FROM {table.name}" + (f" WHERE {where}" if where else ''), keys)
+            for path, item in self._walk(_resolve(doc, prefix), table.pattern[len(prefix):], tuple(prefix)):
+                self._write_row(conn, table, path, item)
+
+    def _walk(self, value, rest, path):
+        if value is None:
+            return
+        if not rest:
+            yield path, value
+            return
+        head, tail = rest[0], rest[1:]
+        if head == '*' and type(value) is dict:
+            for k, v in value.items():
+                yield from self._walk(v, tail, path + (k,))
+        elif head == '#' and type(value) is list:
+            for i, v in enumerate(value):
+                yield from self._walk(v, tail, path + (i,))
+        elif head not in ('*', '#') and type(value) is dict and head in value:
+            yield from self._walk(value[head], tail, path + (head,))
+
+    def _write_ops(self, conn, ops, doc):
+        rows, subtrees, meta = set(), set(), set()
+        for op in ops:
+            path = tuple(op["path"])
+            owner = max((t for t in self.tables
+                         if len(t.pattern) <= len(path) and _matches(t.pattern, path[:len(t.pattern)])),
+                        key=lambda t: len(t.pattern), default=None)
+            if owner is None:
+                # Above every row: the top-level meta entry and whatever rows hang below
+                if path:
+                    meta.add(path[0])
+                else:
+                    meta.update(doc)
+                subtrees.add(path)
+                continue
+            row = path[:len(owner.pattern)]
+            if len(path) == len(row) or any(len(t.pattern) == len(path) + 1 and _matches(t.pattern[:-1], path)
+                                            for t in self.tables):
+                # The whole item or one of its table-backed collections was replaced
+                subtrees.add(row)
+            rows.add((owner, row))
+        for key in meta:
+            self._write_meta(conn, key, doc)
+        for prefix in sorted(subtrees, key=len):
+            if any(prefix[:len(p)] == p for p in subtrees if len(p) < len(prefix)):
+                continue  # already covered by a shorter prefix
+            self._write_subtree(conn, prefix, doc)
+        for table, row in rows:
+            item = _resolve(doc, row)
+            if item is None:
+                self._write_subtree(conn, row, doc)  # the item is gone: drop it and its children
+            else:
+                self._write_row(conn, table, row, item)
+
+
+class _Transaction:
+    """``BEGIN IMMEDIATE`` ... ``COMMIT`` on the document's connection, under its lock."""
+
+    def __init__(self, document):
+        self.document = document
+
+    def __enter__(self):
+        self.document._lock.acquire()
+        try:
+            conn = self.document._conn
+            conn.execute("BEGIN IMMEDIATE")
+        except Exception:
+            self.document._lock.release()
+            raise
+        return conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.document._conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.document._lock.release()
+        return False
@@ -0,0 +1,139 @@
+import time
+import atexit
+import datetime
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class StateStore:
+    """Keep a parsed JSON document in memory and persist it in the background.
+
+    Handlers get the same dict back from every ``get()`` and mutate it in place;
+    ``save()`` only marks the document dirty. A single flusher thread waits for
+    the first dirty mark, sleeps ``flush_delay`` seconds so a burst of mutations
+    is coalesced, then hands the document to the backend once. The backend
+    (see persistence.JournaledDocument) decides what actually hits the disk.
+    """
+
+    def __init__(self, backend, flush_delay=0.5):
+        self.backend = backend
+        self.flush_delay = flush_delay
+        self.flush_count = 0
+        self.last_error = None  # why the last background flush failed, until one succeeds
+        self._dirty_since = None
+        self._doc = None
+        self._events = []
+        self._dirty = False
+        self._lock = threading.RLock()
+        self._wakeup = threading.Event()
+        self._flusher = None
+        atexit.register(self.close)
+
+    @property
+    def path(self):
+        return self.backend.path
+
+    def get(self):
+        """Return the cached document, loading it from the backend on first use.
+
+        With a shared backend, changes other workers persisted are folded into
+        the cached document first.
+        """
+        with self._lock:
+            if self._doc is None:
+                self._doc = self.backend.load()
+            elif self.backend.shared:
+                self.backend.refresh(self._doc)
+            return self._doc
+
+    def version(self):
+        """The backend's seq for the saved document, the same in every worker.
+
+        None while this process has changes that are not saved yet.
+        """
+        with self._lock:
+            return None if self._dirty else self.backend.seq
+
+    @property
+    def generation(self):
+        """Changes whenever the document was modified by another process."""
+        return self.backend.generation
+
+    def save(self, doc=None):
+        """Mark the document dirty and schedule a background flush."""
+        with self._lock:
+            if doc is not None and doc is not self._doc:
+                self._doc = doc
+            if not self._dirty:
+                self._dirty_since = time.monotonic()
+            self._dirty = True
+        self._ensure_flusher()
+        self._wakeup.set()
+
+    def record(self, type, **fields):
+        """Log a typed event; it is persisted with the next flush."""
+        with self._lock:
+            self._events.append(dict(fields, type=type, at=datetime.datetime.now().isoformat()))
+        self.save()
+
+    def flush(self):
+        """Persist the document now if it has unsaved changes."""
+        with self._lock:
+            if not self._dirty or self._doc is None:
+                return False
+            self._dirty = False
+            events, self._events = self._events, []
+            try:
+                self.backend.commit(self._doc, events)
+            except Exception:
+                self._dirty = True
+                self._events = events + self._events
+                raise
+            self.flush_count += 1
+            return True
+
+    def close(self):
+        """Flush pending changes and make them durable (used at exit)."""
+        with self._lock:
+            self.flush()
+            self.backend.close()
+
+    @property
+    def dirty(self):
+        return self._dirty
+
+    def lag(self):
+        """Seconds the oldest unsaved change has been waiting (0 when clean)."""
+        since = self._dirty_since
+        return time.monotonic() - since if self._dirty and since is not None else 0.0
+
+    def _ensure_flusher(self):
+        if self._flusher is not None and self._flusher.is_alive():
+            return
+        with self._lock:
+            if self._flusher is not None and self._flusher.is_alive():
+                return
+            self._flusher = threading.Thread(target=self._run, name=f"flush:{self.path}", daemon=True)
+            self._flusher.start()
+
+    def _run(self):
+        while True:
+            # With appended-but-unsynced journal bytes, wake up in time to fsync them
+            timeout = self.backend.sync_interval if self.backend.needs_sync else None
+            if not self._wakeup.wait(timeout):
+                with self._lock:
+                    self.backend.sync()
+                continue
+            # Give the rest of the burst a chance to land before writing
+            time.sleep(self.flush_delay)
+            self._wakeup.clear()
+            try:
+                self.flush()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error("Background flush of %s failed", self.path, exc_info=True)
+                self._wakeup.set()
+                time.sleep(self.flush_delay)
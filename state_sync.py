@@ -0,0 +1,112 @@
+import json
+import threading
+from collections import deque
+
+from persistence import diff_ops
+
+
+def _plain(value):
+    return json.loads(json.dumps(value, default=str))
+
+
+class StateSync:
+    """Versioned client view of the game state.
+
+    ``publish()`` rebuilds the view, diffs it against the last published one
+    and returns a patch ``{"seq", "base", "ops"}`` (ops use the same set/del
+    format as the persistence journal). Recent patches are kept so a client
+    that is a few versions behind can catch up without a full snapshot.
+
+    With a ``partition`` (the view's "users" entry), only the entries named
+    with ``touch()`` since the last publish are rebuilt and diffed, next to
+    the small top-level fields: ``build_view(keys)`` returns the view with
+    just those entries under ``partition``. The whole view is diffed on the
+    first publish, after ``touch()`` with no keys, and whenever
+    ``generation()`` changes (another process modified the document).
+    """
+
+    def __init__(self, build_view, history=50, partition=None, generation=None):
+        self.build_view = build_view
+        self.partition = partition
+        self.generation = generation
+        self.seq = 0
+        self._view = None
+        self._generation = None
+        self._touched = set()
+        self._touched_all = True
+        self._patches = deque(maxlen=history)
+        self._lock = threading.RLock()
+
+    def touch(self, *keys):
+        """Mark partition entries as changed; no keys means anything may have."""
+        with self._lock:
+            if keys:
+                self._touched.update(keys)
+            else:
+                self._touched_all = True
+
+    def publish(self):
+        """Return the patch for changes since the last publish, or None."""
+        with self._lock:
+            full = self._view is None or self.partition is None or self._touched_all
+            if not full:
+                view, ops = self._partial(sorted(self._touched))
+                # Building the view folds in other processes' changes, so check afterwards
+                full = self.generation is not None and self.generation() != self._generation
+            if full:
+                # Read first: a change folded in while building is diffed again next time
+                generation = self.generation() if self.generation else None
+                view = _plain(self.build_view(None))
+                ops = diff_ops(self._view, view) if self._view is not None else None
+                self._generation = generation
+            self._touched.clear()
+            self._touched_all = False
+            if ops is None:
+                self._view = view
+                self.seq += 1
+                return None
+            if not ops:
+                return None
+            self._view = view
+            self.seq += 1
+            patch = {"seq": self.seq, "base": self.seq - 1, "ops": ops}
+            self._patches.append(patch)
+            return patch
+
+    def _partial(self, keys):
+        # The published view is never mutated (patches in the history share
+        # its objects): build a new top level around the untouched entries
+        fresh = self.build_view(keys)
+        entries = dict(self._view[self.partition])
+        before = {k: v for k, v in self._view.items() if k != self.partition}
+        view = _plain({k: v for k, v in fresh.items() if k != self.partition})
+        ops = diff_ops(before, view)
+        for key in keys:
+            if key in fresh[self.partition]:
+                value = _plain(fresh[self.partition][key])
+                if key in entries:
+                    ops.extend(diff_ops(entries[key], value, (self.partition, key)))
+                else:
+                    ops.append({"op": "set", "path": [self.partition, key], "value": value})
+                entries[key] = value
+            elif key in entries:
+                ops.append({"op": "del", "path": [self.partition, key]})
+                del entries[key]
+        view[self.partition] = entries
+        return view, ops
+
+    def snapshot(self):
+        """Return ``(seq, view)`` for the last published state."""
+        with self._lock:
+            if self._view is None:
+                self.publish()
+            return self.seq, self._view
+
+    def patches_since(self, seq):
+        """Patches that bring a client at ``seq`` up to date, or None if too far behind."""
+        with self._lock:
+            if seq == self.seq:
+                return []
+            if not self._patches or seq is None or seq > self.seq or seq < self._patches[0]["base"]:
+                return None
+            return [p for p in self._patches if p["seq"] > seq]
@@ -11,8 +11,57 @@ const socket = io({
     pingTimeout: 180000  // Match server settings
 });
 
+// Compact wire encoding (see wire.py): asked for on connect/identify, and
+// used by the server from its 'identified' reply on. Handlers registered
+// with socket.on always see decoded payloads.
+const WIRE_ENCODING = 'compact';
+const WIRE_SCHEMA = 1;
+let wireDecoder = null;
+socket.auth = { encoding: WIRE_ENCODING, schema: WIRE_SCHEMA };
+
+function makeWireDecoder(keys, timeKeys) {
+    const digits = '0123456789'.split('');
+    const chars = '0123456789abcdefghijklmnopqrstuvwxyz'.split('');
+    const codes = digits.concat(...digits.map(d => chars.map(c => d + c)));
+    const byCode = {};
+    keys.forEach((key, i) => { byCode[codes[i]] = key; });
+    const times = new Set(timeKeys);
+    const decodeKey = k => k[0] === '!' ? k.slice(1) : (byCode[k] || k);
+    const decodeTime = v => typeof v === 'number' ? new Date(v).toISOString() : v;
+    function decode(value) {
+        if (Array.isArray(value)) return value.map(decode);
+        if (value === null || typeof value !== 'object') return value;
+        const out = {};
+        for (const [k, v] of Object.entries(value)) {
+            const key = decodeKey(k);
+            if (key === 'path' && Array.isArray(v)) {
+                out[key] = v.map(p => typeof p === 'string' ? decodeKey(p) : p);
+            } else {
+                out[key] = times.has(key) ? decodeTime(v) : decode(v);
+            }
+        }
+        // State patch op setting a timestamp
+        if (Array.isArray(out.path) && times.has(out.path[out.path.length - 1]) && 'value' in out) {
+            out.value = decodeTime(out.value);
+        }
+        return out;
+    }
+    return decode;
+}
+
+const socketOn = socket.on.bind(socket);
+socket.on = (event, handler) => socketOn(event, (...args) => handler(...(wireDecoder ? args.map(wireDecoder) : args)));
+
+socketOn('identified', (data) => {
+    wireDecoder = data.encoding === 'compact' ? makeWireDecoder(data.keys, data.time_keys) : null;
+});
+// A new connection starts out in JSON until it is identified again
+socketOn('disconnect', () => { wireDecoder = null; });
+
 // State variables
 let currentUser = null;
+let clientState = null;  // last full state received from the server
+let stateSeq = null;     // its sequence number, sent back on reconnect
 let partnerUser = null;
 let activeTimers = {
     'luu': { isRunning: false, isPaused: false, isBreak: false },
@@ -24,6 +73,9 @@ socket.on('connect', () => {
     console.log('Socket connected! ID:', socket.id);
     document.body.classList.add('socket-connected');
     
+    // Rooms do not survive a reconnect; rejoin and fetch what was missed
+    if (marketOpen) joinMarket();
+
     // If we were disconnected and reconnected, try to get the latest data
     if (currentUser) {
         console.log('Reconnected, requesting data refresh...');
@@ -94,9 +146,11 @@ socket.on('error', (error) => {
 function selectUser(user) {
     currentUser = user;
     partnerUser = user === 'luu' ? '4keni' : 'luu';
+    identify(user);
     
     // Hide modal, show app
     document.getElementById('user-modal').classList.add('hidden');
+    if (clientState) renderState(clientState);
     document.getElementById('main-app').classList.remove('hidden');
     
     // Both sides are visible, but highlight current user's content
@@ -118,6 +172,7 @@ function logout() {
     document.getElementById('main-app').classList.add('hidden');
     currentUser = null;
     partnerUser = null;
+    identify(null);
 }
 
 // Session management
@@ -413,7 +468,71 @@ socket.on('session_complete', (data) => {
     }
 });
 
+// Apply server state ops ({op: 'set'|'del', path: [...], value}) in place
+function applyStateOps(doc, ops) {
+    for (const op of ops) {
+        const path = op.path;
+        if (path.length === 0) {
+            if (op.op === 'set') doc = op.value;
+            continue;
+        }
+        let parent = doc;
+        for (let i = 0; i < path.length - 1; i++) {
+            parent = parent[path[i]];
+        }
+        const key = path[path.length - 1];
+        if (op.op === 'set') {
+            parent[key] = op.value;  // index == length appends to arrays
+        } else if (Array.isArray(parent)) {
+            parent.splice(key, 1);
+        } else {
+            delete parent[key];
+        }
+    }
+    return doc;
+}
+
+function setStateSeq(seq) {
+    stateSeq = seq;
+    // Reconnects send this so the server can reply with only the missed patches
+    socket.auth = { state_seq: seq, user: currentUser, encoding: WIRE_ENCODING, schema: WIRE_SCHEMA };
+}
+
+// Sockets only receive their player's and pair's events once they identify;
+// reconnects identify through socket.auth
+function identify(user) {
+    socket.auth = { state_seq: stateSeq, user: user, encoding: WIRE_ENCODING, schema: WIRE_SCHEMA };
+    if (socket.connected) socket.emit('identify', { user: user, encoding: WIRE_ENCODING, schema: WIRE_SCHEMA });
+}
+
+// The server may coalesce a burst of events into one frame of [event, data] pairs;
+// each listener decodes its own payload
+socketOn('batch', (frames) => {
+    frames.forEach(([event, data]) => {
+        socket.listeners(event).forEach(handler => handler(data));
+    });
+});
+
 socket.on('full_update', (data) => {
+    clientState = data;
+    if (data.state_seq !== undefined) setStateSeq(data.state_seq);
+    renderState(data);
+});
+
+socket.on('state_patch', (patch) => {
+    if (clientState === null || patch.base !== stateSeq) {
+        // Missed a version; ask for whatever brings us up to date
+        if (clientState === null || patch.seq > stateSeq) {
+            socket.emit('request_state', { since: clientState === null ? null : stateSeq });
+        }
+        return;
+    }
+    clientState = applyStateOps(clientState, patch.ops);
+    setStateSeq(patch.seq);
+    renderState(clientState);
+});
+
+function renderState(data) {
     if (!currentUser) return;
     
     // Update points and sessions
@@ -430,7 +549,7 @@ socket.on('full_update', (data) => {
     
     // Update chaos chicken UI
     updateChaosChickenUI(data);
-});
+}
 
 socket.on('cycle_complete', (data) => {
     let message;
@@ -443,8 +562,12 @@ socket.on('cycle_complete', (data) => {
 });
 
 // --- Market Events Frontend Logic ---
+// Events and feed items are pushed over the socket while the market tab is
+// open; marketSeq is the newest item seen, used to catch up after a reconnect
 let lastEventTime = null;
 let eventPopupTimeout = null;
+let marketSeq = null;
+let marketOpen = false;
 
 function showMarketEventPopup(event) {
     // Remove any existing popup
@@ -470,25 +593,139 @@ function showMarketEventPopup(event) {
     }, 5000);
 }
 
-function pollMarketEvents() {
-    fetch('/api/market_events')
+function noteMarketSeq(item) {
+    if (item.seq !== undefined && (marketSeq === null || item.seq > marketSeq)) marketSeq = item.seq;
+}
+
+function handleMarketEvent(event) {
+    if (lastEventTime === event.time) return;
+    lastEventTime = event.time;
+    showMarketEventPopup(event);
+    // Redraw the chart with the new event annotation
+    loadMarketChart();
+}
+
+socket.on('market_event', (event) => {
+    noteMarketSeq(event);
+    handleMarketEvent(event);
+});
+
+socket.on('market_feed_item', (item) => {
+    noteMarketSeq(item);
+    mergeMarketFeed([item]);
+});
+
+function joinMarket() {
+    socket.emit('join_market');
+    const since = marketSeq === null ? '' : '?since=' + marketSeq;
+    fetch('/api/market_events' + since)
         .then(res => res.json())
         .then(events => {
-            if (events.length > 0) {
-                const latest = events[0];
-                if (lastEventTime !== latest.time) {
-                    lastEventTime = latest.time;
-                    showMarketEventPopup(latest);
-                    // Refresh chart image
-                    const img = document.getElementById('market-graph-img');
-                    if (img) img.src = '/static/market_graph.png?v=' + Date.now();
-                }
-            }
+            events.forEach(noteMarketSeq);
+            if (events.length > 0) handleMarketEvent(events[0]);
         });
+    fetch('/api/market_feed' + since)
+        .then(res => res.json())
+        .then(items => {
+            items.forEach(noteMarketSeq);
+            mergeMarketFeed(items);
+        });
+}
+
+// The graph is cached server-side (ETag); bucket the URL by minute so an open
+// tab revalidates at most once a minute instead of on every call
+function marketGraphUrl() {
+    return '/static/market_graph.png?v=' + Math.floor(Date.now() / 60000);
+}
+
+// The chart is drawn here from /api/market_prices; the server-rendered PNG
+// is only used where canvas is unavailable (and the server has it enabled)
+function loadMarketChart() {
+    const canvas = document.getElementById('market-graph-canvas');
+    if (!canvas || !canvas.getContext) {
+        const img = document.getElementById('market-graph-img');
+        if (img) {
+            img.style.display = '';
+            img.src = marketGraphUrl();
+        }
+        return;
+    }
+    fetch('/api/market_prices')
+        .then(res => res.json())
+        .then(data => drawMarketChart(canvas, data));
+}
+
+function drawMarketChart(canvas, data) {
+    const ctx = canvas.getContext('2d');
+    const ratio = window.devicePixelRatio || 1;
+    const width = canvas.clientWidth || 800;
+    const height = canvas.clientHeight || 320;
+    canvas.width = width * ratio;
+    canvas.height = height * ratio;
+    ctx.setTransform(ratio, 0, 0, ratio, 0, 0);
+    ctx.fillStyle = '#1a1a1a';
+    ctx.fillRect(0, 0, width, height);
+
+    const pad = {left: 50, right: 40, top: 40, bottom: 30};
+    const lows = data.animals.map(a => a.low);
+    const highs = data.animals.map(a => a.high);
+    const minY = Math.min(...lows);
+    const maxY = Math.max(...highs);
+    const xAt = i => pad.left + i * (width - pad.left - pad.right) / Math.max(1, data.points - 1);
+    const yAt = v => height - pad.bottom - (v - minY) * (height - pad.top - pad.bottom) / Math.max(1, maxY - minY);
+
+    // Grid and axes
+    ctx.strokeStyle = 'rgba(102,102,102,0.3)';
+    ctx.setLineDash([4, 4]);
+    ctx.fillStyle = '#999';
+    ctx.font = '11px sans-serif';
+    for (let step = 0; step <= 4; step++) {
+        const value = minY + (maxY - minY) * step / 4;
+        const y = yAt(value);
+        ctx.beginPath();
+        ctx.moveTo(pad.left, y);
+        ctx.lineTo(width - pad.right, y);
+        ctx.stroke();
+        ctx.fillText('$' + Math.round(value), 5, y + 4);
+    }
+    ctx.setLineDash([]);
+    ctx.fillStyle = '#fff';
+    ctx.font = '14px sans-serif';
+    ctx.fillText('Animal Market Prices', pad.left, 22);
+
+    const events = {};
+    data.events.forEach(e => { events[e.animal] = e; });
+    data.animals.forEach(animal => {
+        const last = animal.prices.length - 1;
+        ctx.strokeStyle = animal.color;
+        ctx.globalAlpha = 0.8;
+        ctx.lineWidth = 2;
+        ctx.beginPath();
+        animal.prices.forEach((price, i) => {
+            if (i === 0) ctx.moveTo(xAt(i), yAt(price));
+            else ctx.lineTo(xAt(i), yAt(price));
+        });
+        ctx.stroke();
+        ctx.globalAlpha = 1;
+        ctx.font = '16px sans-serif';
+        ctx.fillText(animal.emoji, xAt(last) + 6, yAt(animal.prices[last]) + 6);
+        // Highlight the last point of animals with an active event
+        const event = events[animal.name];
+        if (event) {
+            ctx.fillStyle = animal.color;
+            ctx.strokeStyle = '#fff';
+            ctx.beginPath();
+            ctx.arc(xAt(last), yAt(animal.prices[last]), 7, 0, 2 * Math.PI);
+            ctx.fill();
+            ctx.stroke();
+            ctx.font = 'bold 11px sans-serif';
+            ctx.textAlign = 'right';
+            ctx.fillText(`${event.emoji} ${event.desc}`, xAt(last), yAt(animal.prices[last]) - 12);
+            ctx.textAlign = 'left';
+        }
+    });
 }
 
-// Start polling when market tab is open
-let marketEventInterval = null;
 function showMarketTab() {
     document.getElementById('main-app').classList.add('hidden');
     document.getElementById('market-tab').style.display = 'block';
@@ -504,12 +741,12 @@ function showMarketTab() {
                     <span class="market-price-emoji">${getAnimalEmoji(animal.name)}</span>
                     <div class="market-price-info">
                         <div class="market-price-name">${animal.name}</div>
-                        <div class="market-price-value">$${animal.base_price[0]} - $${animal.base_price[1]}</div>
+                        <div class="market-price-value">$${animal.price} <small>($${animal.base_price[0]} - $${animal.base_price[1]})</small></div>
                     </div>
                 `;
                 pricesContainer.appendChild(priceItem);
             });
-            document.getElementById('market-graph-img').src = '/static/market_graph.png?v=' + Date.now();
+            loadMarketChart();
             const legend = document.querySelector('.market-graph-legend');
             legend.innerHTML = animals.map(animal => 
                 `<div style="display:flex;align-items:center;gap:0.5rem;margin-bottom:0.25rem;">
@@ -518,19 +755,18 @@ function showMarketTab() {
                 </div>`
             ).join('');
         });
-    // Start polling for events
-    if (!marketEventInterval) {
-        pollMarketEvents();
-        marketEventInterval = setInterval(pollMarketEvents, 5000);
+    // Live events and feed items from here on
+    if (!marketOpen) {
+        marketOpen = true;
+        joinMarket();
     }
 }
 function hideMarketTab() {
     document.getElementById('main-app').classList.remove('hidden');
     document.getElementById('market-tab').style.display = 'none';
-    // Stop polling
-    if (marketEventInterval) {
-        clearInterval(marketEventInterval);
-        marketEventInterval = null;
+    if (marketOpen) {
+        marketOpen = false;
+        socket.emit('leave_market');
     }
 }
 
@@ -548,6 +784,14 @@ function getAnimalEmoji(name) {
 
 // --- Market Feed Frontend Logic ---
 let lastFeedIds = [];
+let marketFeed = [];
+function mergeMarketFeed(items) {
+    const known = new Set(marketFeed.map(item => item.id));
+    marketFeed = marketFeed.concat(items.filter(item => !known.has(item.id)))
+        .sort((a, b) => (b.seq || 0) - (a.seq || 0))
+        .slice(0, 30);
+    renderMarketFeed(marketFeed);
+}
 function renderMarketFeed(feed) {
     const feedContainer = document.getElementById('market-feed');
     if (!feedContainer) return;
@@ -569,33 +813,6 @@ function renderMarketFeed(feed) {
     lastFeedIds = latest.map(item => item.id);
 }
 
-function pollMarketFeed() {
-    fetch('/api/market_feed')
-        .then(res => res.json())
-        .then(feed => {
-            renderMarketFeed(feed);
-        });
-}
-
-// Patch showMarketTab/hideMarketTab to start/stop feed polling
-let marketFeedInterval = null;
-const originalShowMarketTab = showMarketTab;
-showMarketTab = function() {
-    originalShowMarketTab();
-    pollMarketFeed();
-    if (!marketFeedInterval) {
-        marketFeedInterval = setInterval(pollMarketFeed, 4000);
-    }
-};
-const originalHideMarketTab = hideMarketTab;
-hideMarketTab = function() {
-    originalHideMarketTab();
-    if (marketFeedInterval) {
-        clearInterval(marketFeedInterval);
-        marketFeedInterval = null;
-    }
-};
-
 // Chaos Chicken Challenge Functions
 function startChaosChicken(user) {
     if (!socket.connected) {
@@ -0,0 +1,108 @@
+"""JournaledDocument and EventLog: diffs, replay, torn writes, compaction and retention."""
+import os
+import sys
+import glob
+import json
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from persistence import JournaledDocument, diff_ops, apply_ops  # noqa: E402
+from event_log import EventLog  # noqa: E402
+
+
+def _default():
+    return {"users": {"luu": {"sessions": [], "stats": {"streak": 0}}}, "winner": None}
+
+
+@pytest.mark.parametrize("old, new", [
+    ({"a": 1, "b": {"c": [1, 2]}}, {"a": 2, "b": {"c": [1, 2, 3]}, "d": None}),
+    ({"a": [1, 2, 3]}, {"a": [1]}),
+    ({"a": {"b": 1}}, {"a": [1]}),
+    ({"a": 1, "gone": True}, {"a": 1}),
+])
+def test_diff_then_apply_reproduces_the_new_document(old, new):
+    ops = diff_ops(old, new)
+    assert apply_ops(json.loads(json.dumps(old)), ops) == new
+    assert diff_ops(new, new) == []
+
+
+def test_commits_survive_a_reload_and_a_torn_tail(tmp_path):
+    path = str(tmp_path / 'chickens.json')
+    doc = JournaledDocument(path, _default)
+    data = doc.load()
+    data["users"]["luu"]["sessions"].append({"id": "s1"})
+    assert doc.commit(data, [{"type": "session_started", "user": "luu"}]) == 1
+    data["users"]["luu"]["stats"]["streak"] = 2
+    doc.commit(data)
+    doc.close()
+    with open(path + '.journal', 'a') as f:
+        f.write('{"seq": 3, "ops": [{"op": "set", "pa')  # crash mid-append
+
+    reopened = JournaledDocument(path, _default)
+    assert reopened.load() == data
+    assert reopened.seq == 2
+    # The torn record was cut off, so the next commit appends cleanly
+    data["winner"] = "luu"
+    reopened.commit(data)
+    reopened.close()
+    assert JournaledDocument(path, _default).load() == data
+
+
+def test_another_process_changes_are_folded_in(tmp_path):
+    path = str(tmp_path / 'chickens.json')
+    first = JournaledDocument(path, _default, shared=True)
+    second = JournaledDocument(path, _default, shared=True)
+    a, b = first.load(), second.load()
+    a["users"]["luu"]["sessions"].append({"id": "from-a"})
+    first.commit(a)
+    # b has an append of its own that is not committed yet
+    b["users"]["luu"]["sessions"].append({"id": "from-b"})
+    assert second.refresh(b)
+    assert [s["id"] for s in b["users"]["luu"]["sessions"]] == ["from-a", "from-b"]
+    assert second.generation == 1
+    second.commit(b)
+    first.refresh(a)
+    assert a == b
+
+
+def test_compaction_keeps_a_bounded_replayable_history(tmp_path):
+    path = str(tmp_path / 'chickens.json')
+    log_dir = str(tmp_path / 'log')
+    doc = JournaledDocument(path, _default, compact_bytes=400, log_dir=log_dir, log_segments=3)
+    data = doc.load()
+    for i in range(60):
+        data["users"]["luu"]["stats"]["streak"] = i
+        doc.commit(data, [{"type": "tick", "i": i}])
+    doc.close()
+
+    segments = glob.glob(os.path.join(log_dir, 'chickens.json.*.jsonl'))
+    assert len(segments) == 3
+    assert len(glob.glob(os.path.join(log_dir, 'chickens.json.*.base.json'))) == 3
+    assert JournaledDocument(path, _default).load() == data
+
+    log = EventLog(path, log_dir)
+    base_seq, base = log.base()
+    ticks = [e["i"] for e in log.events({'tick'})]
+    # Contiguous from the oldest kept segment up to the last commit
+    assert ticks == list(range(base_seq, 60))
+    assert log.state_at(seq=base_seq)["users"]["luu"]["stats"]["streak"] == base_seq - 1
+    assert log.state_at(seq=base_seq + 5)["users"]["luu"]["stats"]["streak"] == base_seq + 4
+    assert log.state_at() == data
+    assert log.fold(lambda n, e: n + 1, 0, types={'tick'}, since=50) == 10
+
+
+def test_read_leaves_the_source_untouched(tmp_path):
+    path = str(tmp_path / 'chickens.json')
+    doc = JournaledDocument(path, _default)
+    data = doc.load()
+    data["winner"] = "4keni"
+    doc.commit(data)
+    doc.close()
+    with open(path + '.journal', 'a') as f:
+        f.write('{"torn')
+    before = {p: open(p, 'rb').read() for p in (path, path + '.journal')}
+    assert JournaledDocument(path, _default).read() == data
+    assert {p: open(p, 'rb').read() for p in before} == before
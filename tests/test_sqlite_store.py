@@ -0,0 +1,77 @@
+"""SQLiteDocument: row round-trips, change retention and catching up across processes."""
+import os
+import sys
+import sqlite3
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sqlite_store import SQLiteDocument  # noqa: E402
+
+
+def _default():
+    return {
+        "users": {u: {"points": 0, "sessions": [], "stats": {"streak": 0}} for u in ('luu', '4keni')},
+        "cycle_start": "2026-10-12T00:00:00",
+        "active_duels": [],
+    }
+
+
+def _session(i):
+    return {"id": f"s{i}", "tier": 1, "timestamp": f"2026-10-12T00:{i % 60:02d}:00", "completed": False,
+            "pauses": [{"pause_start": "a", "pause_end": None}]}
+
+
+def test_round_trip_through_rows(tmp_path):
+    db = str(tmp_path / 'game.db')
+    doc = SQLiteDocument(db, 'chickens', _default)
+    data = doc.load()
+    data["users"]["luu"]["sessions"].append(_session(1))
+    data["users"]["luu"]["stats"]["streak"] = 3
+    data["active_duels"].append({"id": "d1", "user1": "luu", "user2": "4keni", "tier": 2})
+    assert doc.commit(data, [{"type": "session_started", "user": "luu"}])
+    data["users"]["luu"]["sessions"][0]["pauses"][0]["pause_end"] = "b"
+    data["users"]["luu"]["sessions"][0]["completed"] = True
+    del data["active_duels"][0]
+    doc.commit(data)
+    doc.close()
+
+    reopened = SQLiteDocument(db, 'chickens', _default).load()
+    assert reopened == data
+    rows = sqlite3.connect(db).execute("SELECT user, pos, completed FROM sessions").fetchall()
+    assert rows == [('luu', 0, 1)]
+    assert [e["type"] for e in SQLiteDocument(db, 'chickens', _default).events()] == ['session_started']
+
+
+def test_changes_are_pruned_to_the_retention(tmp_path):
+    db = str(tmp_path / 'game.db')
+    doc = SQLiteDocument(db, 'chickens', _default, retain_changes=16)
+    data = doc.load()
+    for i in range(100):
+        data["users"]["luu"]["stats"]["streak"] = i
+        doc.commit(data, [{"type": "tick", "i": i}])
+    seqs = [row[0] for row in sqlite3.connect(db).execute("SELECT seq FROM changes ORDER BY seq")]
+    assert seqs[-1] == 100
+    assert 16 <= len(seqs) <= 16 + 16 // 8
+    assert [e["i"] for e in doc.events()] == [seq - 1 for seq in seqs]
+
+
+def test_a_worker_behind_the_pruned_history_rebuilds(tmp_path):
+    db = str(tmp_path / 'game.db')
+    writer = SQLiteDocument(db, 'chickens', _default, shared=True, retain_changes=8)
+    reader = SQLiteDocument(db, 'chickens', _default, shared=True, retain_changes=8)
+    data, seen = writer.load(), reader.load()
+    # Only the next change is within reach when the reader refreshes early
+    data["users"]["4keni"]["points"] = 1
+    writer.commit(data)
+    assert reader.refresh(seen) and seen == data
+    for i in range(40):
+        data["users"]["luu"]["sessions"].append(_session(i))
+        writer.commit(data)
+    assert sqlite3.connect(db).execute("SELECT MIN(seq) FROM changes").fetchone()[0] > reader.seq + 1
+    # Uncommitted local changes survive the rebuild
+    seen["users"]["4keni"]["stats"]["streak"] = 7
+    assert reader.refresh(seen)
+    assert seen["users"]["luu"]["sessions"] == data["users"]["luu"]["sessions"]
+    assert seen["users"]["4keni"]["stats"]["streak"] == 7
+    assert reader.seq == writer.seq
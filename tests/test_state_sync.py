@@ -0,0 +1,108 @@
+"""StateSync: versioned patches, catch-up and publishing only touched users."""
+import os
+import sys
+import copy
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from persistence import apply_ops  # noqa: E402
+from state_sync import StateSync  # noqa: E402
+
+
+class _Game:
+    """A document plus a view builder that records which users it was asked for."""
+
+    def __init__(self):
+        self.doc = {"users": {"luu": {"points": 0, "sessions": []}, "4keni": {"points": 0, "sessions": []}},
+                    "winner": None}
+        self.generation = 0
+        self.built = []
+
+    def build_view(self, users):
+        self.built.append(None if users is None else list(users))
+        view = dict(self.doc)
+        view["users"] = {u: v for u, v in self.doc["users"].items() if users is None or u in users}
+        return view
+
+
+def _sync(game, history=50):
+    return StateSync(game.build_view, history=history, partition="users", generation=lambda: game.generation)
+
+
+def test_patches_rebuild_the_published_view():
+    game = _Game()
+    sync = _sync(game)
+    seq, start = sync.snapshot()
+    client = copy.deepcopy(start)
+    game.doc["users"]["luu"]["sessions"].append({"id": "s1"})
+    sync.touch("luu")
+    first = sync.publish()
+    game.doc["users"]["luu"]["sessions"][0]["completed"] = True
+    game.doc["winner"] = "luu"
+    sync.touch("luu")
+    second = sync.publish()
+    assert (first["base"], first["seq"], second["base"], second["seq"]) == (seq, seq + 1, seq + 1, seq + 2)
+    for patch in sync.patches_since(seq):
+        client = apply_ops(client, copy.deepcopy(patch["ops"]))
+    assert client == sync.snapshot()[1] == game.doc
+    # Nothing new: no patch, and an up-to-date client needs none
+    assert sync.publish() is None
+    assert sync.patches_since(sync.seq) == []
+
+
+def test_only_touched_users_are_rebuilt():
+    game = _Game()
+    sync = _sync(game)
+    sync.publish()
+    game.doc["users"]["luu"]["points"] = 5
+    game.doc["users"]["4keni"]["points"] = 7  # changed without a touch
+    sync.touch("luu")
+    patch = sync.publish()
+    assert game.built[-1] == ["luu"]
+    assert patch["ops"] == [{"op": "set", "path": ["users", "luu", "points"], "value": 5}]
+    # Deferred, not lost: it goes out once 4keni is touched
+    sync.touch("4keni")
+    assert sync.publish()["ops"] == [{"op": "set", "path": ["users", "4keni", "points"], "value": 7}]
+
+
+def test_full_rebuild_on_untargeted_touch_or_new_generation():
+    game = _Game()
+    sync = _sync(game)
+    sync.publish()
+    game.doc["users"]["4keni"]["points"] = 1
+    sync.touch()
+    assert sync.publish()["ops"] == [{"op": "set", "path": ["users", "4keni", "points"], "value": 1}]
+    assert game.built[-1] is None
+    # Another process changed the document: every user is diffed again
+    game.doc["users"]["4keni"]["points"] = 2
+    game.generation += 1
+    sync.touch("luu")
+    assert sync.publish()["ops"] == [{"op": "set", "path": ["users", "4keni", "points"], "value": 2}]
+    assert game.built[-1] is None
+
+
+def test_published_patches_never_change_afterwards():
+    game = _Game()
+    sync = _sync(game)
+    seq = sync.snapshot()[0]
+    game.doc["users"]["luu"]["sessions"].append({"id": "s1", "completed": False})
+    sync.touch("luu")
+    first = copy.deepcopy(sync.publish())
+    game.doc["users"]["luu"]["sessions"][0]["completed"] = True
+    sync.touch("luu")
+    sync.publish()
+    assert sync.patches_since(seq)[0] == first
+
+
+def test_clients_too_far_behind_need_a_snapshot():
+    game = _Game()
+    sync = _sync(game, history=2)
+    seq = sync.snapshot()[0]
+    for points in range(1, 4):
+        game.doc["users"]["luu"]["points"] = points
+        sync.touch("luu")
+        sync.publish()
+    assert sync.patches_since(seq) is None
+    assert sync.patches_since(None) is None
+    assert [p["seq"] for p in sync.patches_since(sync.seq - 2)] == [sync.seq - 1, sync.seq]
@@ -0,0 +1,62 @@
+"""TimerScheduler: deadlines, pause/resume, tokens and non-blocking expiries."""
+import os
+import sys
+import time
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from timer_scheduler import TimerScheduler  # noqa: E402
+
+
+def _wait_for(predicate, timeout=5):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_expiry_carries_the_token_and_paused_timers_wait():
+    fired = []
+    scheduler = TimerScheduler(lambda running: None, lambda *args: fired.append(args), tick_interval=0.05)
+    scheduler.start('luu', 0.1, False, 'a')
+    scheduler.start('4keni', 0.1, True, 'b')
+    assert scheduler.pause('4keni')
+    assert _wait_for(lambda: fired == [('luu', False, 'a')])
+    time.sleep(0.2)
+    assert fired == [('luu', False, 'a')]
+    assert scheduler.resume('4keni')
+    assert _wait_for(lambda: ('4keni', True, 'b') in fired)
+
+
+def test_cancel_with_a_stale_token_keeps_the_newer_timer():
+    scheduler = TimerScheduler(lambda running: None, lambda *args: None)
+    scheduler.start('luu', 60, False, 'old')
+    scheduler.start('luu', 60, False, 'new')
+    assert not scheduler.cancel('luu', 'old')
+    assert scheduler.snapshot()['luu']['token'] == 'new'
+    assert scheduler.cancel('luu', 'new')
+    assert 'luu' not in scheduler
+
+
+def test_a_blocked_expiry_does_not_stall_other_timers():
+    release = threading.Event()
+    fired = []
+
+    def on_expire(user, is_break, token):
+        if user == 'luu':
+            release.wait(5)
+        fired.append(user)
+
+    scheduler = TimerScheduler(lambda running: None, on_expire, tick_interval=0.05)
+    scheduler.start('luu', 0.05, False)
+    scheduler.start('4keni', 0.2, False)
+    try:
+        assert _wait_for(lambda: fired == ['4keni'])
+        assert scheduler.healthy()
+    finally:
+        release.set()
+    assert _wait_for(lambda: fired == ['4keni', 'luu'])
@@ -0,0 +1,69 @@
+"""Compact wire encoding: key codes, escaping and timestamps."""
+import os
+import sys
+import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import wire  # noqa: E402
+
+_KEYS = {wire.encode_key(key): key for key in wire.KEYS}
+
+
+def _decode(payload, path_time=False):
+    # The same rules as the decoder in static/app.js
+    if isinstance(payload, dict):
+        path = payload.get(wire.encode_key('path'))
+        out = {}
+        for code, value in payload.items():
+            key = code[1:] if code.startswith('!') else _KEYS.get(code, code)
+            if key == 'path' and isinstance(value, list):
+                value = [_KEYS.get(p, p[1:] if p.startswith('!') else p) if isinstance(p, str) else p for p in value]
+            elif key in wire.TIME_KEYS or (key == 'value' and isinstance(path, list) and path
+                                           and _KEYS.get(path[-1]) in wire.TIME_KEYS):
+                value = _iso(value)
+            else:
+                value = _decode(value)
+            out[key] = value
+        return out
+    if isinstance(payload, list):
+        return [_decode(item) for item in payload]
+    return payload
+
+
+def _iso(value):
+    if isinstance(value, int):
+        return datetime.datetime.fromtimestamp(value / 1000).isoformat(timespec='microseconds').replace('.000000', '')
+    return value
+
+
+def test_codes_are_short_and_unique():
+    codes = [wire.encode_key(key) for key in wire.KEYS]
+    assert len(set(codes)) == len(codes)
+    assert all(1 <= len(code) <= 2 and code[0].isdigit() for code in codes)
+
+
+def test_round_trip_of_a_state_patch():
+    patch = {"seq": 4, "base": 3, "ops": [
+        {"op": "set", "path": ["users", "luu", "sessions", 2, "pause_start"], "value": "2026-10-18T09:30:00"},
+        {"op": "set", "path": ["users", "luu", "stats", "custom_stat"], "value": {"3": "tier three", "!x": 1}},
+        {"op": "del", "path": ["active_duels", 0]},
+    ]}
+    encoded = wire.encode(patch)
+    assert encoded[wire.encode_key('ops')][0][wire.encode_key('value')] == int(
+        datetime.datetime(2026, 10, 18, 9, 30).timestamp() * 1000)
+    # Keys that look like codes, or start with the escape, are escaped
+    assert encoded[wire.encode_key('ops')][1][wire.encode_key('value')] == {"!3": "tier three", "!!x": 1}
+    assert _decode(encoded) == patch
+
+
+def test_plain_values_and_unknown_keys_pass_through():
+    payload = {"user": "luu", "task_name": "2026-10-18T09:30:00", "note": [1, "two", None],
+               "timestamp": "not a date"}
+    encoded = wire.encode(payload)
+    assert encoded["note"] == [1, "two", None]
+    assert encoded[wire.encode_key('task_name')] == "2026-10-18T09:30:00"
+    assert encoded[wire.encode_key('timestamp')] == "not a date"
+    assert _decode(encoded) == payload
+    assert wire.encode_for('json', payload) is payload
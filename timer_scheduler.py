@@ -0,0 +1,189 @@
+import time
+import heapq
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class _Timer:
+    __slots__ = ('user', 'duration', 'is_break', 'token', 'deadline', 'remaining', 'paused', 'generation')
+
+    def __init__(self, user, duration, is_break, token):
+        self.user = user
+        self.duration = duration
+        self.is_break = is_break
+        self.token = token
+        self.deadline = None
+        self.remaining = duration
+        self.paused = False
+        self.generation = 0
+
+
+class TimerScheduler:
+    """Run every focus and break timer from one background thread.
+
+    Deadlines sit in a heap; pausing, resuming or cancelling bumps the
+    timer's generation and (on resume) pushes a fresh entry, so stale heap
+    entries are simply skipped when they surface. Each tick, ``on_tick`` is
+    called with the running timers; when a deadline passes, ``on_expire`` is
+    called with the user, whether it was a break and the token the timer was
+    started with, so the caller can tell it apart from a later timer for the
+    same user. ``on_tick`` runs on the scheduler thread; each ``on_expire``
+    is handed to ``spawn`` (a new thread by default) so a handler waiting on
+    locks or I/O never holds up the other timers.
+    """
+
+    def __init__(self, on_tick, on_expire, tick_interval=1.0, spawn=None):
+        self.on_tick = on_tick
+        self.on_expire = on_expire
+        self.tick_interval = tick_interval
+        self.spawn = spawn or self._thread_spawn
+        self._timers = {}
+        self._heap = []
+        self._lock = threading.RLock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self.heartbeat = None  # monotonic time of the loop's last iteration
+
+    def start(self, user, duration, is_break=False, token=None):
+        """Start (or restart) the user's timer for ``duration`` seconds."""
+        with self._lock:
+            previous = self._timers.get(user)
+            timer = _Timer(user, duration, is_break, token)
+            if previous is not None:
+                timer.generation = previous.generation + 1
+            self._timers[user] = timer
+            self._schedule(timer, time.monotonic())
+        self._ensure_thread()
+        self._wakeup.set()
+
+    def pause(self, user):
+        """Freeze the user's timer; returns False if it is not running."""
+        with self._lock:
+            timer = self._timers.get(user)
+            if timer is None or timer.paused:
+                return False
+            timer.remaining = max(0.0, timer.deadline - time.monotonic())
+            timer.paused = True
+            timer.generation += 1
+            return True
+
+    def resume(self, user):
+        """Continue a paused timer; returns False if there is nothing to resume."""
+        with self._lock:
+            timer = self._timers.get(user)
+            if timer is None or not timer.paused:
+                return False
+            timer.paused = False
+            self._schedule(timer, time.monotonic())
+        self._wakeup.set()
+        return True
+
+    def cancel(self, user, token=None):
+        """Drop the user's timer without firing it (only if it has ``token``, when given)."""
+        with self._lock:
+            timer = self._timers.get(user)
+            if timer is None or (token is not None and timer.token != token):
+                return False
+            del self._timers[user]
+            return True
+
+    def remaining(self, user):
+        """Seconds left on the user's timer, or None if there is none."""
+        with self._lock:
+            timer = self._timers.get(user)
+            if timer is None:
+                return None
+            if timer.paused:
+                return timer.remaining
+            return max(0.0, timer.deadline - time.monotonic())
+
+    def snapshot(self):
+        """Return ``{user: {'remaining', 'is_break', 'paused', 'token'}}`` for every timer."""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                user: {
+                    'remaining': timer.remaining if timer.paused else max(0.0, timer.deadline - now),
+                    'is_break': timer.is_break,
+                    'paused': timer.paused,
+                    'token': timer.token
+                } for user, timer in self._timers.items()
+            }
+
+    def __contains__(self, user):
+        return user in self._timers
+
+    def __len__(self):
+        return len(self._timers)
+
+    def healthy(self):
+        """False if timers are pending but the loop has stalled or died."""
+        if not self._timers:
+            return True
+        if self._thread is None or not self._thread.is_alive() or self.heartbeat is None:
+            return False
+        return time.monotonic() - self.heartbeat <= max(5.0, 5 * self.tick_interval)
+
+    def _schedule(self, timer, now):
+        timer.generation += 1
+        timer.deadline = now + timer.remaining
+        heapq.heappush(self._heap, (timer.deadline, timer.generation, timer.user))
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="timer-scheduler", daemon=True)
+                self._thread.start()
+
+    def _pop_expired(self, now):
+        expired = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                deadline, generation, user = heapq.heappop(self._heap)
+                timer = self._timers.get(user)
+                if timer is None or timer.generation != generation or timer.paused:
+                    continue  # stale entry left behind by pause/resume/cancel/restart
+                del self._timers[user]
+                expired.append(timer)
+        return expired
+
+    @staticmethod
+    def _thread_spawn(func, *args):
+        threading.Thread(target=func, args=args, name="timer-expiry", daemon=True).start()
+
+    def _expire(self, timer):
+        try:
+            self.on_expire(timer.user, timer.is_break, timer.token)
+        except Exception:
+            logger.error("Timer expiry handler failed for %s", timer.user, exc_info=True)
+
+    def _run(self):
+        next_tick = time.monotonic()
+        while True:
+            now = self.heartbeat = time.monotonic()
+            for timer in self._pop_expired(now):
+                try:
+                    self.spawn(self._expire, timer)
+                except Exception:
+                    logger.error("Could not dispatch the expiry of %s", timer.user, exc_info=True)
+            if now >= next_tick:
+                running = {user: info for user, info in self.snapshot().items() if not info['paused']}
+                if running:
+                    try:
+                        self.on_tick(running)
+                    except Exception:
+                        logger.error("Timer tick handler failed", exc_info=True)
+                next_tick = now + self.tick_interval
+            with self._lock:
+                next_deadline = self._heap[0][0] if self._heap else None
+                idle = not self._timers
+            if idle:
+                # Nothing to tick; sleep until a timer is started
+                self._wakeup.wait()
+                next_tick = time.monotonic()
+            else:
+                wake_at = next_tick if next_deadline is None else min(next_tick, next_deadline)
+                self._wakeup.wait(max(0.0, wake_at - time.monotonic()))
+            self._wakeup.clear()
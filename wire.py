@@ -0,0 +1,90 @@
+"""Compact wire encoding for Socket.IO payloads.
+
+Clients that ask for it (``encoding: 'compact'`` with a matching
+``schema``) get every payload with the common keys replaced by one- or
+two-character codes from ``KEYS`` and ISO timestamps sent as epoch
+milliseconds. Everyone else keeps the plain JSON payloads.
+
+Codes are a digit followed by at most one more character, so they cannot
+clash with the application's own keys; a key that happens to look like a
+code (e.g. a numeric tier) is sent with a ``!`` prefix. State patch paths
+are encoded like keys. ``static/app.js`` has the matching decoder, and
+``SCHEMA`` must change whenever ``KEYS`` or ``TIME_KEYS`` do.
+"""
+import re
+import string
+import datetime
+
+SCHEMA = 1
+
+ENCODINGS = ('json', 'compact')
+
+# Order is part of the schema: append only, and bump SCHEMA when changing it
+KEYS = (
+    'op', 'path', 'value', 'seq', 'base', 'ops', 'state_seq',
+    'users', 'user', 'points', 'current_points', 'sessions', 'sessions_today', 'stats',
+    'id', 'task_name', 'tier', 'animal', 'name', 'duration', 'base_price', 'description',
+    'timestamp', 'start_time', 'completion_time', 'abort_time', 'completed', 'aborted',
+    'pauses', 'pause_start', 'pause_end', 'total_pause_duration', 'chicken_name', 'barn_id',
+    'streak', 'longest_streak', 'momentum_multiplier', 'weekly_chickens', 'weekly_tier3_count',
+    'lifetime_tier3_count', 'mystery_egg_used_date', 'mystery_egg_effect', 'unlocked_skins',
+    'current_skin', 'unlocked_themes', 'current_theme', 'temp_theme_unlock_date', 'achievements',
+    'cycle_start', 'days_remaining', 'winner', 'loser', 'active_duels', 'user1', 'user2',
+    'user1_time', 'user2_time', 'weekly_chaos_chicken', 'offered', 'offered_to', 'offered_date',
+    'accepted_date', 'completion_date', 'completed_by', 'challenge_type', 'challenge_params',
+    'required_tier', 'is_break', 'time', 'effect', 'effect_type', 'type', 'message', 'partner',
+    'success', 'points_earned', 'barn', 'new_name', 'status', 'sid',
+)
+
+# Keys whose ISO datetime values are sent as epoch milliseconds
+TIME_KEYS = frozenset({
+    'timestamp', 'start_time', 'completion_time', 'abort_time', 'pause_start', 'pause_end',
+    'cycle_start', 'offered_date', 'accepted_date', 'completion_date', 'user1_time', 'user2_time',
+})
+
+_CODES = list(string.digits) + [d + c for d in string.digits for c in string.digits + string.ascii_lowercase]
+_KEY_CODES = dict(zip(KEYS, _CODES))
+_CODE_RE = re.compile(r'^[0-9][0-9a-z]?$')
+_DATETIME_RE = re.compile(r'^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(\.\d+)?$')
+
+
+def encode_key(key):
+    code = _KEY_CODES.get(key)
+    if code is not None:
+        return code
+    if _CODE_RE.match(key) or key.startswith('!'):
+        return '!' + key
+    return key
+
+
+def _encode_time(value):
+    if isinstance(value, str) and _DATETIME_RE.match(value):
+        # Naive timestamps are the server's local time
+        return int(datetime.datetime.fromisoformat(value).timestamp() * 1000)
+    return value
+
+
+def encode(payload):
+    """Compact form of a JSON-compatible payload."""
+    if isinstance(payload, dict):
+        path = payload.get('path')
+        # A state patch op setting a timestamp carries it in 'value'
+        time_value = isinstance(path, list) and bool(path) and path[-1] in TIME_KEYS
+        out = {}
+        for key, value in payload.items():
+            key = str(key)
+            if key == 'path' and isinstance(value, list):
+                value = [encode_key(p) if isinstance(p, str) else p for p in value]
+            elif key in TIME_KEYS or (key == 'value' and time_value):
+                value = _encode_time(value)
+            else:
+                value = encode(value)
+            out[encode_key(key)] = value
+        return out
+    if isinstance(payload, (list, tuple)):
+        return [encode(item) for item in payload]
+    return payload
+
+
+def encode_for(encoding, payload):
+    return encode(payload) if encoding == 'compact' else payload